@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Runs the participation extractor on every recording folder (or zipped
+recording, as downloaded from adobe connect) under a root folder, spreading
+the sessions across a pool of worker processes.
+
+usage: Adobe_Connect_Batch_Reports.py recordings_root/ reports_root/ [--workers N] [--no-plots]
+                                     [--cache-folder cache/] [--profile] [--columnar npz|parquet] [--timelines]
+                                     [--bin-seconds 60] [--chat-analytics] [--timezone Greenwich]
+                                     [--class-timezone US/Pacific] [--roster roster.csv]
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import os
+import time
+import traceback
+import zipfile
+
+from Adobe_Connect_Participation_Extractor import (COLUMNAR_FORMATS, DEFAULT_SOURCE_TIMEZONE,
+                                                   RECORDING_ARCHIVE_EXTENSION,
+                                                   get_recording_archive_names, get_results_summary,
+                                                   get_summary_plots, save_report_csv)
+
+
+def find_recording_folders(recordings_root_path, skipped_folder_paths=()):
+    '''
+    any folder or zip file that contains an indexstream.xml is treated as a
+    recording. paths are returned with a trailing slash because the
+    extractor adds file names straight onto the folder path (or zip path).
+    skipped_folder_paths are folders under the root not to look in, such as
+    a reports root or cache folder kept inside the recordings root
+    '''
+    skipped_folder_paths = {os.path.realpath(folder_path) for folder_path in skipped_folder_paths if folder_path}
+    recording_folder_paths = []
+    for folder_path, folder_names, file_names in os.walk(recordings_root_path):
+        # walk folders in a fixed order so the manifest is the same every run
+        folder_names[:] = sorted(
+            folder_name for folder_name in folder_names
+            if os.path.realpath(os.path.join(folder_path, folder_name)) not in skipped_folder_paths)
+        if "indexstream.xml" in file_names:
+            recording_folder_paths.append(os.path.join(folder_path, ""))
+        for file_name in sorted(file_names):
+            if file_name.lower().endswith(RECORDING_ARCHIVE_EXTENSION) and is_recording_archive(
+                    os.path.join(folder_path, file_name)):
+                recording_folder_paths.append(os.path.join(folder_path, file_name, ""))
+    return recording_folder_paths
+
+
+def is_recording_archive(archive_path):
+    # only the list of members at the end of the zip is read
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            return "indexstream.xml" in get_recording_archive_names(archive)
+    except zipfile.BadZipFile:
+        return False
+
+
+def get_report_folder_path(recording_folder_path, recordings_root_path, reports_root_path):
+    # each report folder mirrors where the recording sits under the root, session.zip gets a session folder
+    relative_path = os.path.relpath(recording_folder_path, recordings_root_path)
+    if relative_path.lower().endswith(RECORDING_ARCHIVE_EXTENSION):
+        relative_path = relative_path[:-len(RECORDING_ARCHIVE_EXTENSION)]
+    return os.path.join(reports_root_path, relative_path, "")
+
+
+def get_session_report(recording_folder_path, report_folder_path, make_plots=True, cache_folder_path=None,
+                       profile=False, columnar_format=None, timelines=False, timeline_bin_seconds=None,
+                       chat_analytics=False, source_timezone=DEFAULT_SOURCE_TIMEZONE, target_timezone=None,
+                       roster_file_path=None):
+    '''
+    runs one session and returns its manifest row. any error is caught and
+    recorded here so that one bad recording does not stop the batch. the
+    sessions are already spread across the cpus, so each one reads its chat
+    files one after another. profile, columnar_format, timelines,
+    timeline_bin_seconds, chat_analytics, source_timezone, target_timezone
+    and roster_file_path are passed on to get_results_summary
+    '''
+    start_time = time.time()
+    try:
+        os.makedirs(report_folder_path, exist_ok=True)
+        results, headers = get_results_summary(recording_folder_path, report_folder_path,
+                                               cache_folder_path=cache_folder_path, chat_workers=1,
+                                               profile=profile, columnar_format=columnar_format,
+                                               timelines=timelines, timeline_bin_seconds=timeline_bin_seconds,
+                                               chat_analytics=chat_analytics, source_timezone=source_timezone,
+                                               target_timezone=target_timezone, roster_file_path=roster_file_path)
+        if make_plots:
+            get_summary_plots(results, headers, report_folder_path, profile=profile)
+        status, participant_count, error = "ok", len(results) - 1, ""
+    except Exception as exception:
+        status, participant_count = "failed", 0
+        error = traceback.format_exception_only(type(exception), exception)[-1].strip()
+    return [recording_folder_path, report_folder_path, status, participant_count,
+            round(time.time() - start_time, 3), error]
+
+
+def get_failed_session_row(session_arguments, exception):
+    recording_folder_path, report_folder_path = session_arguments[:2]
+    return [recording_folder_path, report_folder_path, "failed", 0, 0,
+            traceback.format_exception_only(type(exception), exception)[-1].strip()]
+
+
+def get_isolated_session_report(session_arguments):
+    '''
+    runs one session in a process of its own, so that a session that kills
+    its process (a crash in a C library or running out of memory) only
+    fails itself
+    '''
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        try:
+            return executor.submit(get_session_report, *session_arguments).result()
+        except Exception as exception:
+            return get_failed_session_row(session_arguments, exception)
+
+
+def get_batch_reports(recordings_root_path, reports_root_path, workers=None, make_plots=True,
+                      cache_folder_path=None, profile=False, columnar_format=None, timelines=False,
+                      timeline_bin_seconds=None, chat_analytics=False, source_timezone=DEFAULT_SOURCE_TIMEZONE,
+                      target_timezone=None, roster_file_path=None):
+    '''
+    workers is the number of worker processes, None uses one per CPU.
+    cache_folder_path is a parsed event cache shared by all of the sessions,
+    None keeps a cache inside each session's report folder. roster_file_path
+    is one roster used for every session (a batch of one class's sessions).
+    the reports root and cache folder are not searched for recordings when
+    they are inside the recordings root. the manifest lists every recording
+    that was found in the order it was found, with whether its report was
+    made and why not if it failed
+    '''
+    recording_folder_paths = find_recording_folders(recordings_root_path, [reports_root_path, cache_folder_path])
+    report_folder_paths = [get_report_folder_path(recording_folder_path, recordings_root_path, reports_root_path)
+                           for recording_folder_path in recording_folder_paths]
+
+    session_arguments = [(recording_folder_path, report_folder_path, make_plots, cache_folder_path, profile,
+                          columnar_format, timelines, timeline_bin_seconds, chat_analytics, source_timezone,
+                          target_timezone, roster_file_path)
+                         for recording_folder_path, report_folder_path in zip(recording_folder_paths,
+                                                                              report_folder_paths)]
+
+    manifest = [None] * len(session_arguments)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(get_session_report, *arguments) for arguments in session_arguments]
+        for index, future in enumerate(futures):
+            try:
+                manifest[index] = future.result()
+            except BrokenProcessPool:
+                # a worker died outright, which breaks the pool for every session that had not finished
+                pass
+            except Exception as exception:
+                manifest[index] = get_failed_session_row(session_arguments[index], exception)
+
+    # the sessions the broken pool took down are run again each in its own process, so only the one that
+    # kills its worker fails
+    unfinished_indexes = [index for index, row in enumerate(manifest) if row is None]
+    if unfinished_indexes:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            rows = executor.map(get_isolated_session_report,
+                                [session_arguments[index] for index in unfinished_indexes])
+            for index, row in zip(unfinished_indexes, rows):
+                manifest[index] = row
+
+    headers = [
+        "Recording Folder",
+        "Report Folder",
+        "Status",
+        "Participants",
+        "Seconds",
+        "Error"
+    ]
+    manifest.insert(0, headers)
+
+    os.makedirs(reports_root_path, exist_ok=True)
+    save_report_csv(manifest, os.path.join(reports_root_path, "batch_manifest.csv"))
+
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="make participation reports for every recording under a folder")
+    parser.add_argument("recordings_root_path")
+    parser.add_argument("reports_root_path")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--no-plots", dest="make_plots", action="store_false",
+                        help="only write the csv reports")
+    parser.add_argument("--cache-folder", dest="cache_folder_path", default=None,
+                        help="parsed event cache shared by all sessions (default: one inside each report folder)")
+    parser.add_argument("--profile", action="store_true",
+                        help="save the time and memory of each stage in each report folder")
+    parser.add_argument("--columnar", dest="columnar_format", choices=COLUMNAR_FORMATS, default=None,
+                        help="also save each report as columns (parquet needs pyarrow)")
+    parser.add_argument("--timelines", action="store_true",
+                        help="save the camera, pause, microphone and chat intervals of each session")
+    parser.add_argument("--bin-seconds", dest="timeline_bin_seconds", type=float, default=None,
+                        help="save each participant's activity in bins this many seconds long")
+    parser.add_argument("--chat-analytics", dest="chat_analytics", action="store_true",
+                        help="save the characters, words, answers and burstiness of each participant's chat")
+    parser.add_argument("--timezone", dest="source_timezone", default=DEFAULT_SOURCE_TIMEZONE,
+                        help="timezone of the start date in indexstream.xml")
+    parser.add_argument("--class-timezone", dest="target_timezone", default=None,
+                        help="count chat messages from midnight here (default: the --timezone)")
+    parser.add_argument("--roster", dest="roster_file_path", default=None,
+                        help="class roster csv used for every session, students who never joined get a row of zeroes")
+    args = parser.parse_args()
+    if args.cache_folder_path is not None:
+        args.cache_folder_path = os.path.join(args.cache_folder_path, "")
+
+    manifest = get_batch_reports(args.recordings_root_path, args.reports_root_path, args.workers, args.make_plots,
+                                 args.cache_folder_path, args.profile, args.columnar_format, args.timelines,
+                                 args.timeline_bin_seconds, args.chat_analytics, args.source_timezone,
+                                 args.target_timezone, args.roster_file_path)
+    failed = [row for row in manifest[1:] if row[2] != "ok"]
+    print("%d sessions, %d failed" % (len(manifest) - 1, len(failed)))
+    for row in failed:
+        print(row[0], row[5])
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Makes participation reports while a class is still being recorded. The
+recording folder is checked every few seconds, only the messages added to
+indexstream.xml, the ftstage file and the ftchat files since the last check
+are read, and running camera, microphone and chat totals are updated from
+them. Every interval the participation report csv is rewritten, with
+cameras and microphones that are still on counted up to the latest time in
+the recording. Once the recording has stopped the final report is made with
+get_results_summary.
+
+Microphone totals pair every start with the next later stop of the same id,
+the same as get_results_summary. Cameras and pauses pair each start with the
+next stop of the same id, which is how a well behaved recording reads. The
+final report uses the full camera rules of get_results_summary (dropped
+connections, stray pause stops...), so interim figures can differ a little
+from it.
+
+usage: Adobe_Connect_Live_Report.py recording_folder/ report_folder/ [--interval 60] [--poll 5] [--once]
+                                   [--timezone Greenwich] [--class-timezone US/Pacific]
+"""
+
+import argparse
+from collections import Counter, defaultdict
+import glob
+import os
+import time
+from xml.etree.ElementTree import XMLPullParser
+
+from Adobe_Connect_Participation_Extractor import (DEFAULT_SOURCE_TIMEZONE, EVENT_STORE_INDEX_TYPES,
+                                                   assign_zeroes_for_no_participation,
+                                                   get_camera_contributions_from_minutes, get_chat_message_events,
+                                                   get_chat_start_timestamp, get_ftstage_file_path,
+                                                   get_ftstage_message_events, get_identity_index, get_message_events,
+                                                   get_microphone_contributions_from_milliseconds,
+                                                   get_participation_grades, get_results_by_name_from_results_by_id,
+                                                   get_results_summary, get_results_table, get_student_ids_and_pids,
+                                                   save_report_csv)
+
+
+def get_tail(file_path):
+    # how far a file has been read, and the parser holding the message it stopped in the middle of
+    return {
+        'file_path': file_path,
+        'offset': 0,
+        'parser': XMLPullParser(events=('start', 'end')),
+        'depth': 0,
+        'root': None,
+        'is_first_message': True
+    }
+
+
+def iter_new_messages(tail):
+    '''
+    yields each top level message that has been completed since the file was
+    last read. the bytes after the last complete message stay in the parser
+    until the rest of the message is written
+    '''
+    with open(tail['file_path'], 'rb') as infile:
+        infile.seek(tail['offset'])
+        new_bytes = infile.read()
+    tail['offset'] += len(new_bytes)
+    tail['parser'].feed(new_bytes)
+
+    for event, element in tail['parser'].read_events():
+        if event == 'start':
+            if tail['root'] is None:
+                tail['root'] = element
+            tail['depth'] += 1
+            continue
+        tail['depth'] -= 1
+        if tail['depth'] == 1:
+            yield element
+            tail['root'].clear()
+
+
+def get_empty_live_state(recording_folder_path, source_timezone=DEFAULT_SOURCE_TIMEZONE, target_timezone=None):
+    '''
+    the running totals are in milliseconds by id (pid for chat), with the
+    times each camera, pause and microphone that is on now was turned on.
+    chat is counted from the start of the class day in target_timezone, like
+    get_results_summary
+    '''
+    return {
+        'recording_folder_path': recording_folder_path,
+        'source_timezone': source_timezone,
+        'target_timezone': target_timezone,
+        'tails': {},
+        'index': {event_type: [] for event_type in EVENT_STORE_INDEX_TYPES},
+        'identity_event_counts': None,
+        'identities': None,
+        'now': 0,
+        'camera_on_since': {},
+        'camera_milliseconds': defaultdict(int),
+        'paused_since': {},
+        'paused_milliseconds': defaultdict(int),
+        'mic_on_since': {},
+        'mic_milliseconds': defaultdict(int),
+        'chat_start_timestamp': None,
+        'chat_counts': Counter(),
+        'events': 0
+    }
+
+
+def add_interval(on_since, milliseconds, student_id, stop_time):
+    # pairs the stop with every open start of student_id before it, later starts wait for the next stop
+    start_times = on_since.pop(student_id, [])
+    milliseconds[student_id] += sum(stop_time - start_time for start_time in start_times if start_time < stop_time)
+    still_open = [start_time for start_time in start_times if start_time >= stop_time]
+    if still_open:
+        on_since[student_id] = still_open
+
+
+def add_index_stream_event(live_state, event):
+    if event.type in live_state['index']:
+        live_state['index'][event.type].append(event)
+        if event.type == 'startDate':
+            live_state['chat_start_timestamp'] = get_chat_start_timestamp(event.value, live_state['source_timezone'],
+                                                                          live_state['target_timezone'])
+    elif event.type == 'streamAdded':
+        live_state['camera_on_since'].setdefault(event.id, [event.time])
+    elif event.type in ('streamRemoved', 'userDeleted'):
+        # every id with a camera event gets a total, like get_camera_minutes_vectorized
+        live_state['camera_milliseconds'][event.id] += 0
+        add_interval(live_state['camera_on_since'], live_state['camera_milliseconds'], event.id, event.time)
+    elif event.value:
+        # like get_microphone_milliseconds_vectorized every start counts, even one before the last has stopped
+        live_state['mic_on_since'].setdefault(event.id, []).append(event.time)
+    else:
+        add_interval(live_state['mic_on_since'], live_state['mic_milliseconds'], event.id, event.time)
+
+
+def add_ftstage_event(live_state, event):
+    if event.type == 'updateVideoPauseStatus' and event.value:
+        live_state['paused_since'].setdefault(event.id, [event.time])
+    else:
+        add_interval(live_state['paused_since'], live_state['paused_milliseconds'], event.id, event.time)
+    live_state['now'] = max(live_state['now'], event.time)
+
+
+def get_live_file_paths(recording_folder_path):
+    # indexstream.xml first, it has the start date the chat messages are compared with
+    file_paths = [recording_folder_path + "indexstream.xml"]
+    try:
+        # the same ftstage file get_results_summary reads
+        file_paths.append(get_ftstage_file_path(recording_folder_path))
+    except IndexError:
+        # it has not been written yet
+        pass
+    return file_paths + sorted(glob.glob(recording_folder_path + "ftchat*.xml"))
+
+
+def update_live_state(live_state):
+    '''
+    reads the messages added to the recording files since the last update
+    and returns how many events were in them. if a file got shorter it was
+    rewritten rather than added to, and the whole recording is read again
+    '''
+    recording_folder_path = live_state['recording_folder_path']
+    for file_path, tail in live_state['tails'].items():
+        if os.path.exists(file_path) and os.path.getsize(file_path) < tail['offset']:
+            empty_live_state = get_empty_live_state(recording_folder_path, live_state['source_timezone'],
+                                                    live_state['target_timezone'])
+            live_state.clear()
+            live_state.update(empty_live_state)
+            break
+
+    events_before = live_state['events']
+    for file_path in get_live_file_paths(recording_folder_path):
+        if not os.path.exists(file_path):
+            continue
+        file_name = os.path.basename(file_path)
+        # chat messages can only be checked against the start of class once the start date is known
+        if file_name.startswith("ftchat") and live_state['chat_start_timestamp'] is None:
+            continue
+        tail = live_state['tails'].setdefault(file_path, get_tail(file_path))
+
+        for message in iter_new_messages(tail):
+            if file_name == "indexstream.xml":
+                index_events = get_message_events(message, tail['is_first_message'])
+                tail['is_first_message'] = tail['is_first_message'] and message.tag != 'Message'
+                if message.get('time') is not None:
+                    live_state['now'] = max(live_state['now'], int(message.get('time')))
+                for event in index_events:
+                    add_index_stream_event(live_state, event)
+                live_state['events'] += len(index_events)
+            elif file_name.startswith("ftstage"):
+                ftstage_events = get_ftstage_message_events(message)
+                for event in ftstage_events:
+                    add_ftstage_event(live_state, event)
+                live_state['events'] += len(ftstage_events)
+            else:
+                chat_messages = get_chat_message_events(message)
+                for chat_message in chat_messages:
+                    if chat_message.time > live_state['chat_start_timestamp']:
+                        live_state['chat_counts'][chat_message.pid] += 1
+                live_state['events'] += len(chat_messages)
+    return live_state['events'] - events_before
+
+
+def get_running_totals(on_since, milliseconds, student_ids, now):
+    # milliseconds by id, with the intervals that are still open closed at now
+    totals = {student_id: milliseconds.get(student_id, 0) for student_id in student_ids}
+    for student_id, total in milliseconds.items():
+        totals[student_id] = total
+    for student_id, start_times in on_since.items():
+        totals[student_id] = totals.get(student_id, 0) + sum(max(now - start_time, 0) for start_time in start_times)
+    return totals
+
+
+def get_live_identities(live_state):
+    '''
+    the identity index of the participants read so far, or None until the
+    instructor has been added. it is only worked out again when an
+    indexstream event it is built from has been read since the last time
+    '''
+    index_events = live_state['index']
+    identity_event_counts = tuple(len(events) for events in index_events.values())
+    if identity_event_counts != live_state['identity_event_counts']:
+        live_state['identity_event_counts'] = identity_event_counts
+        live_state['identities'] = None
+        # the instructor may not have been added yet
+        if index_events['myID'] and index_events['myID'][0].id in get_student_ids_and_pids(index_events)[0]:
+            live_state['identities'] = get_identity_index(index_events)
+    return live_state['identities']
+
+
+def get_live_results(live_state):
+    '''
+    the report rows for the recording so far, or None until the start date,
+    the instructor and at least some class time have been read. every
+    participant gets a camera and microphone total (0 if they have not been
+    on), which get_results_summary only does once they have left
+    '''
+    index_events = live_state['index']
+    if not index_events['startDate'] or live_state['now'] <= 0:
+        return None
+    identities = get_live_identities(live_state)
+    if identities is None:
+        return None
+    student_ids, student_pids = identities['student_ids'], identities['student_pids']
+    instructor_id, instructor_name = identities['instructor_id'], identities['instructor_name']
+    participant_names = identities['participant_names']
+
+    if index_events['__stop__']:
+        end_of_class_time = index_events['__stop__'][-1].time
+    else:
+        end_of_class_time = live_state['now']
+    now = end_of_class_time
+
+    camera_milliseconds = get_running_totals(live_state['camera_on_since'], live_state['camera_milliseconds'],
+                                             student_ids, now)
+    paused_milliseconds = get_running_totals(live_state['paused_since'], live_state['paused_milliseconds'],
+                                             student_ids, now)
+    (
+        student_time_on_camera,
+        student_minutes_with_camera_paused,
+        student_fraction_of_class_on_camera,
+        student_fraction_of_instructor_time_on_camera
+    ) = get_camera_contributions_from_minutes({k: v / 1000 / 60 for k, v in camera_milliseconds.items()},
+                                              {k: v / 1000 / 60 for k, v in paused_milliseconds.items()},
+                                              end_of_class_time, student_ids, instructor_id)
+
+    (
+        student_minutes_on_microphone,
+        student_fraction_of_class_on_microphone,
+        student_fraction_of_instructor_mic
+    ) = get_microphone_contributions_from_milliseconds(
+        get_running_totals(live_state['mic_on_since'], live_state['mic_milliseconds'], student_ids, now),
+        end_of_class_time, student_ids, instructor_id)
+
+    # the same counts and fractions as get_chat_contributions_from_messages, from the running counts. a chat
+    # file can be written ahead of indexstream.xml, so senders that have not been added yet are left out
+    message_count = Counter({pid: count for pid, count in live_state['chat_counts'].items() if pid in student_pids})
+    assign_zeroes_for_no_participation(student_pids, message_count)
+    total_message_count = sum(live_state['chat_counts'].values())
+    fraction_of_chats = {k: v / total_message_count if total_message_count else 0 for k, v in message_count.items()}
+    student_message_count = get_results_by_name_from_results_by_id(message_count, student_pids)
+    student_fraction_of_chats = get_results_by_name_from_results_by_id(fraction_of_chats, student_pids)
+
+    student_participation_grades = get_participation_grades(student_time_on_camera, student_minutes_on_microphone,
+                                                            student_message_count, instructor_name)
+    return get_results_table([
+        participant_names,
+        student_participation_grades,
+        student_time_on_camera,
+        student_minutes_with_camera_paused,
+        student_fraction_of_class_on_camera,
+        student_fraction_of_instructor_time_on_camera,
+        student_minutes_on_microphone,
+        student_fraction_of_class_on_microphone,
+        student_fraction_of_instructor_mic,
+        student_message_count,
+        student_fraction_of_chats
+    ])
+
+
+def watch_recording(recording_folder_path, report_folder_path, interval=60, poll_interval=5, once=False,
+                    source_timezone=DEFAULT_SOURCE_TIMEZONE, target_timezone=None):
+    '''
+    polls the recording every poll_interval seconds and rewrites the report
+    at most every interval seconds when there is something new, until
+    __stop__ is read, then makes the final report with get_results_summary.
+    once=True reads what is there, writes the interim report and returns.
+    source_timezone and target_timezone are the same as get_results_summary's
+    '''
+    os.makedirs(report_folder_path, exist_ok=True)
+    report_file_path = report_folder_path + "participation_report.csv"
+    live_state = get_empty_live_state(recording_folder_path, source_timezone, target_timezone)
+    last_report_time = None
+    unreported_events = 0
+    while True:
+        unreported_events += update_live_state(live_state)
+        if live_state['index']['__stop__'] and not once:
+            return get_results_summary(recording_folder_path, report_folder_path, source_timezone=source_timezone,
+                                       target_timezone=target_timezone)
+
+        if once or (unreported_events and (last_report_time is None or
+                                           time.time() - last_report_time >= interval)):
+            live_results = get_live_results(live_state)
+            if live_results is not None:
+                save_report_csv(live_results[0], report_file_path)
+                last_report_time = time.time()
+                unreported_events = 0
+            if once:
+                return live_results
+        time.sleep(poll_interval)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="make participation reports while a class is being recorded")
+    parser.add_argument("recording_folder_path")
+    parser.add_argument("report_folder_path")
+    parser.add_argument("--interval", type=float, default=60,
+                        help="seconds between rewrites of the report (default 60)")
+    parser.add_argument("--poll", dest="poll_interval", type=float, default=5,
+                        help="seconds between checks for new events (default 5)")
+    parser.add_argument("--once", action="store_true", help="write the report for the recording so far and stop")
+    parser.add_argument("--timezone", dest="source_timezone", default=DEFAULT_SOURCE_TIMEZONE,
+                        help="timezone of the start date in indexstream.xml")
+    parser.add_argument("--class-timezone", dest="target_timezone", default=None,
+                        help="count chat messages from midnight here (default: the --timezone)")
+    args = parser.parse_args()
+    watch_recording(os.path.join(args.recording_folder_path, ""), os.path.join(args.report_folder_path, ""),
+                    args.interval, args.poll_interval, args.once, args.source_timezone, args.target_timezone)
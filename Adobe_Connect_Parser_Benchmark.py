@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compares the xml parsers the participation extractor can use (see
+XML_PARSERS) on synthetic recordings of different sizes. For every recording
+file and parser it reports the parse time and peak memory, and checks that
+the events read are the same as the ones BeautifulSoup (the reference) reads.
+
+usage: Adobe_Connect_Parser_Benchmark.py [--sizes 10:30,50:90,200:180] [--parsers etree,lxml,beautifulsoup]
+                                         [--folder recordings/] [--output results.json]
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from Adobe_Connect_Participation_Extractor import (XML_PARSERS, get_chat_messages, get_ftstage_events,
+                                                   get_ftstage_file_path, get_index_stream_events)
+from Adobe_Connect_Synthetic_Recording import save_synthetic_recording
+
+FILE_READERS = {
+    'indexstream': get_index_stream_events,
+    'ftstage': get_ftstage_events,
+    'ftchat': get_chat_messages
+}
+
+
+def get_file_size(recording_folder_path, file_kind):
+    if file_kind == 'indexstream':
+        return os.path.getsize(recording_folder_path + "indexstream.xml")
+    if file_kind == 'ftstage':
+        return os.path.getsize(get_ftstage_file_path(recording_folder_path))
+    return sum(os.path.getsize(recording_folder_path + file_name) for file_name in os.listdir(recording_folder_path)
+               if file_name.startswith("ftchat") and file_name.endswith(".xml"))
+
+
+def get_memory_status(field):
+    # VmRSS (memory in use now) or VmHWM (most memory used) in kilobytes, from linux
+    with open("/proc/self/status") as infile:
+        for line in infile:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+
+
+def reset_peak_memory():
+    '''
+    on linux the peak memory of the process can be reset, so it does not
+    include the memory used importing bokeh and numpy. returns False where
+    that is not possible
+    '''
+    try:
+        with open("/proc/self/clear_refs", "w") as outfile:
+            outfile.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def get_parse_measurement(recording_folder_path, file_kind, parser):
+    '''
+    runs in a fresh process so that the peak memory (the most the process
+    ever used, less what it was using before parsing) only counts this parse
+    '''
+    peak_memory_was_reset = reset_peak_memory()
+    if peak_memory_was_reset:
+        memory_before = get_memory_status("VmRSS")
+    else:
+        # ru_maxrss is in kilobytes on linux, without the reset it includes the imports
+        memory_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start_time = time.perf_counter()
+    events = FILE_READERS[file_kind](recording_folder_path, parser)
+    seconds = time.perf_counter() - start_time
+
+    if peak_memory_was_reset:
+        peak_memory = get_memory_status("VmHWM") - memory_before
+    else:
+        peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - memory_before
+    return seconds, peak_memory / 1024, events
+
+
+def get_parser_benchmark(sizes, parsers, recordings_folder_path):
+    '''
+    sizes is a list of (participants, minutes). beautifulsoup is always run,
+    since every other parser is checked against it
+    '''
+    spawn_context = multiprocessing.get_context('spawn')
+    results = []
+    for participants, minutes in sizes:
+        recording_folder_path = os.path.join(recordings_folder_path, "%d_participants_%d_minutes" %
+                                             (participants, minutes), "")
+        if not os.path.exists(recording_folder_path + "indexstream.xml"):
+            save_synthetic_recording(recording_folder_path, participants, minutes)
+
+        for file_kind in FILE_READERS:
+            reference_events = None
+            for parser in ['beautifulsoup'] + [parser for parser in parsers if parser != 'beautifulsoup']:
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn_context) as executor:
+                    seconds, peak_memory, events = executor.submit(get_parse_measurement, recording_folder_path,
+                                                                   file_kind, parser).result()
+                if reference_events is None:
+                    reference_events = events
+                if parser in parsers:
+                    results.append({
+                        'participants': participants,
+                        'minutes': minutes,
+                        'file': file_kind,
+                        'file_size_mb': round(get_file_size(recording_folder_path, file_kind) / 1024 / 1024, 2),
+                        'parser': parser,
+                        'seconds': round(seconds, 3),
+                        'peak_memory_mb': round(peak_memory, 1),
+                        'same_events_as_beautifulsoup': events == reference_events
+                    })
+    return results
+
+
+def get_sizes(sizes_text):
+    return [tuple(int(number) for number in size.split(":")) for size in sizes_text.split(",")]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="compare the xml parsers on synthetic recordings")
+    parser.add_argument("--sizes", default="10:30,50:90,200:180",
+                        help="comma separated participants:minutes of the synthetic recordings")
+    parser.add_argument("--parsers", default=",".join(XML_PARSERS))
+    parser.add_argument("--folder", default=None,
+                        help="where the synthetic recordings are written (default: a temporary folder)")
+    parser.add_argument("--output", default=None, help="also save the results to this json file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary_folder_path:
+        results = get_parser_benchmark(get_sizes(args.sizes), args.parsers.split(","),
+                                       args.folder or temporary_folder_path)
+
+    print("%-24s %-12s %9s %-14s %9s %11s %6s" % ("recording", "file", "size MB", "parser", "seconds",
+                                                 "peak MB", "same"))
+    for result in results:
+        print("%-24s %-12s %9.2f %-14s %9.3f %11.1f %6s" % (
+            "%d participants %d min" % (result['participants'], result['minutes']), result['file'],
+            result['file_size_mb'], result['parser'], result['seconds'], result['peak_memory_mb'],
+            result['same_events_as_beautifulsoup']))
+
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump(results, outfile, indent=2)
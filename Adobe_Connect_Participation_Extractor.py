@@ -6,21 +6,115 @@ Created on Tue Jul 16 11:14:13 2019
 @author: JeffHalley
 """
 
-from sys import argv
-from bokeh.io import save, output_file
-from bokeh.plotting import figure
-from bokeh.layouts import gridplot
+import argparse
+from array import array
 from collections import defaultdict
-from bs4 import BeautifulSoup
 from collections import Counter
-from copy import copy
+from collections import namedtuple
 import csv
 from datetime import datetime
+import fnmatch
+from functools import lru_cache, partial
 import glob
+import hashlib
+import io
+import json
+import mmap
 import numpy as np
+import os
 import pytz
+import platform
 import re
 import time
+import tracemalloc
+from xml.etree.ElementTree import XMLPullParser, iterparse
+import zipfile
+
+# bokeh (which takes most of a second to import), BeautifulSoup, lxml and the
+# process pool are imported by the functions that use them, so a csv only run
+# with the default parser never imports them
+
+
+'''
+the recording files can be read with a streaming parser, xml.etree
+('etree', the default) or lxml ('lxml'), which only keep one message in
+memory at a time, or with BeautifulSoup ('beautifulsoup'), which builds a
+tree of the whole file. BeautifulSoup is how the files were originally read
+and is kept as the reference the other two are checked against. 'prefilter'
+memory maps the file and only parses the messages that contain the names of
+the events that are read from it, see iter_prefiltered_messages
+'''
+XML_PARSERS = ('etree', 'lxml', 'beautifulsoup', 'prefilter')
+DEFAULT_XML_PARSER = 'etree'
+
+
+'''
+recordings can also be read straight from the zip file adobe connect
+downloads them as, without unzipping it. a zipped recording is given as the
+path of the zip with a slash after it ("session.zip/"), so the file names
+added onto it ("session.zip/indexstream.xml") name members of the archive.
+only the xml members are ever read, the flv audio and video that make up
+most of the archive are not
+'''
+RECORDING_ARCHIVE_EXTENSION = ".zip"
+
+
+def get_recording_archive_member(file_path):
+    # the archive path and member name of a path into a zipped recording, None for a path on disk
+    position = file_path.lower().rfind(RECORDING_ARCHIVE_EXTENSION + "/")
+    if position == -1:
+        return None
+    archive_path = file_path[:position + len(RECORDING_ARCHIVE_EXTENSION)]
+    if not os.path.isfile(archive_path):
+        return None
+    return archive_path, file_path[position + len(RECORDING_ARCHIVE_EXTENSION) + 1:]
+
+
+def get_recording_archive_names(archive):
+    # member names by file name, the recording files can be in a folder inside the archive
+    member_names = {}
+    for member_name in archive.namelist():
+        if not member_name.endswith("/"):
+            member_names.setdefault(member_name.rsplit("/", 1)[-1], member_name)
+    return member_names
+
+
+def open_recording_file(file_path, mode='rb'):
+    '''
+    opens a recording file on disk or in a zipped recording. a member of a
+    zip is decompressed as it is read, and 'r' reads it as text like open
+    does
+    '''
+    archive_member = get_recording_archive_member(file_path)
+    if archive_member is None:
+        return open(file_path, mode)
+    archive_path, file_name = archive_member
+    with zipfile.ZipFile(archive_path) as archive:
+        # the member can still be read once the archive is closed, until it is closed itself
+        member = archive.open(get_recording_archive_names(archive)[file_name])
+    return member if 'b' in mode else io.TextIOWrapper(member)
+
+
+def get_recording_file_names(recording_folder_path, wildcard):
+    # the paths of the recording files matching wildcard, from the folder or zipped recording
+    archive_member = get_recording_archive_member(recording_folder_path)
+    if archive_member is None:
+        return glob.glob(recording_folder_path + wildcard)
+    with zipfile.ZipFile(archive_member[0]) as archive:
+        return [recording_folder_path + file_name for file_name in get_recording_archive_names(archive)
+                if fnmatch.fnmatch(file_name, wildcard)]
+
+
+def get_recording_file_signature(file_path):
+    # file name, size and modification time, a member of a zip has the modification time of the zip
+    archive_member = get_recording_archive_member(file_path)
+    if archive_member is None:
+        file_stat = os.stat(file_path)
+        return [os.path.basename(file_path), file_stat.st_size, file_stat.st_mtime_ns]
+    archive_path, file_name = archive_member
+    with zipfile.ZipFile(archive_path) as archive:
+        file_size = archive.getinfo(get_recording_archive_names(archive)[file_name]).file_size
+    return [file_name, file_size, os.stat(archive_path).st_mtime_ns]
 
 
 def get_index_stream(recording_folder_path):
@@ -29,42 +123,413 @@ def get_index_stream(recording_folder_path):
     indicates student names and IDs when students enter the session, come on 
     camera, come on microphone, and when they use the status buttons
     '''
+    from bs4 import BeautifulSoup
+
     index_stream_xml_path = recording_folder_path + "indexstream.xml"
-    with open(index_stream_xml_path) as filepath:
+    with open_recording_file(index_stream_xml_path, 'r') as filepath:
         index_stream = BeautifulSoup(filepath, 'xml')
     return index_stream
 
 
-def get_student_ids_and_pids(index_stream):
-    # this will return a result set that can be used as an index to find
-    # the record that contains id and pID for each student
-    student_names_index = index_stream.find_all('fullName')
+'''
+events are the records in indexstream.xml that the participation calculations
+need. userAdded carries the name, id and pID of a participant, the camera and
+microphone events carry an id and a time, __stop__ carries the end of class
+time, and myID and startDate carry the instructor id and the recording start
+date. value holds the name for userAdded, the on/off status for
+userVoipStatusChanged and the date string for startDate
+'''
+IndexStreamEvent = namedtuple('IndexStreamEvent', ['type', 'id', 'pid', 'time', 'value'])
+
+INDEX_STREAM_EVENT_TYPES = (
+    'startDate',
+    'myID',
+    'userAdded',
+    'streamAdded',
+    'streamRemoved',
+    'userDeleted',
+    'userVoipStatusChanged',
+    '__stop__'
+)
+
+# strings inside a message that mark it as one of the events above
+INDEX_STREAM_EVENT_STRINGS = ('streamAdded', 'streamRemoved', 'userDeleted', 'userVoipStatusChanged', '__stop__')
+# every message get_message_events reads anything from has one of these in it
+INDEX_STREAM_PREFILTER_STRINGS = (b'myID', b'fullName') + tuple(event_string.encode('utf-8') for event_string
+                                                                in INDEX_STREAM_EVENT_STRINGS)
+
+
+def get_empty_index_stream_events():
+    return {event_type: [] for event_type in INDEX_STREAM_EVENT_TYPES}
+
+
+def get_element_text(element):
+    return ''.join(element.itertext())
+
+
+def get_next_element_sibling(element, parents, tag=None, skip=0):
+    '''
+    ElementTree elements do not know their parents, so the parents dict of
+    the message being read is used to find the elements that follow this one.
+    skip is the number of following elements to jump over, as in
+    next_sibling.next_sibling.next_sibling.next_sibling with BeautifulSoup
+    '''
+    siblings = list(parents[element])
+    for sibling in siblings[siblings.index(element) + 1:]:
+        if tag is None or sibling.tag == tag:
+            if skip == 0:
+                return sibling
+            skip -= 1
+    return None
+
+
+def get_message_events(message, is_first_message):
+    '''
+    reads the events out of one top level message of indexstream.xml. the
+    elements are found the same way get_index_stream_events_from_soup finds
+    them in the BeautifulSoup tree, but only inside this message, so the rest
+    of the file never has to be held in memory
+    '''
+    events = []
+    parents = None
+    if is_first_message and message.tag == 'Message':
+        array = message.find('.//Array')
+        start_date_string = array.find('.//String') if array is not None else None
+        if start_date_string is not None:
+            parents = {child: parent for parent in message.iter() for child in parent}
+            start_date = get_next_element_sibling(start_date_string, parents, skip=1)
+            events.append(IndexStreamEvent('startDate', None, None, None, get_element_text(start_date)))
+
+    for element in message.iter():
+        if element.tag == 'myID':
+            events.append(IndexStreamEvent('myID', get_element_text(element), None, None, None))
+            continue
+        if element.tag != 'fullName' and element.text not in INDEX_STREAM_EVENT_STRINGS:
+            continue
+        if parents is None:
+            parents = {child: parent for parent in message.iter() for child in parent}
+
+        if element.tag == 'fullName':
+            events.append(IndexStreamEvent(
+                'userAdded',
+                get_element_text(get_next_element_sibling(element, parents, 'id')),
+                get_element_text(get_next_element_sibling(element, parents, 'pID')),
+                None,
+                get_element_text(parents[element].find('.//fullName'))
+            ))
+
+        elif element.text in ('streamAdded', 'streamRemoved'):
+            stream = parents[element]
+            time_tag = 'startTime' if element.text == 'streamAdded' else 'time'
+            events.append(IndexStreamEvent(
+                element.text,
+                get_element_text(stream.find('.//streamPublisherID')),
+                None,
+                int(get_element_text(stream.find('.//' + time_tag))),
+                None
+            ))
+
+        elif element.text == 'userDeleted':
+            method = parents[element]
+            events.append(IndexStreamEvent(
+                'userDeleted',
+                get_element_text(get_next_element_sibling(method, parents)),
+                None,
+                int(get_element_text(parents[method].find('.//time'))),
+                None
+            ))
+
+        elif element.text == 'userVoipStatusChanged':
+            # only true (started talking) and false (stopped talking) are used
+            student_id_string = parents[parents[element]].find('.//String')
+            status = get_element_text(get_next_element_sibling(student_id_string, parents, 'String'))
+            if status in ('true', 'false'):
+                events.append(IndexStreamEvent(
+                    'userVoipStatusChanged',
+                    get_element_text(student_id_string),
+                    None,
+                    int(get_element_text(get_next_element_sibling(element, parents, 'time'))),
+                    status == 'true'
+                ))
+
+        else:
+            events.append(IndexStreamEvent(
+                '__stop__',
+                None,
+                None,
+                int(get_element_text(parents[element].find('.//Number'))),
+                None
+            ))
+    return events
+
+
+def get_prefiltered_message_spans(recording, prefilter_strings):
+    '''
+    the (start, end) byte positions of the first message and of every other
+    message with one of prefilter_strings in it, in file order. each string
+    is looked for with find, which runs through the bytes much faster than
+    a regular expression of all of them
+    '''
+    string_positions = []
+    for prefilter_string in prefilter_strings:
+        position = recording.find(prefilter_string)
+        while position != -1:
+            string_positions.append(position)
+            position = recording.find(prefilter_string, position + len(prefilter_string))
+    string_positions.sort()
+
+    # the first message is always kept, it has the start date of indexstream.xml
+    message_start = recording.find(b'<Message')
+    if message_start == -1:
+        return []
+    message_end = recording.find(b'</Message>', message_start) + len(b'</Message>')
+    message_spans = [(message_start, message_end)]
+    for position in string_positions:
+        if position < message_end:
+            continue
+        message_start = max(recording.rfind(b'<Message ', message_end, position),
+                             recording.rfind(b'<Message>', message_end, position))
+        message_header_end = recording.find(b'>', message_start)
+        if (message_start == -1 or recording.rfind(b'</Message>', message_start, position) != -1 or
+                recording[message_header_end - 1:message_header_end] == b'/'):
+            # the string is between messages rather than in one
+            continue
+        message_end = recording.find(b'</Message>', position) + len(b'</Message>')
+        message_spans.append((message_start, message_end))
+    return message_spans
+
+
+def iter_prefiltered_messages(xml_file_path, prefilter_strings):
+    '''
+    yields the messages of a recording file that get_prefiltered_message_spans
+    keeps. the file is memory mapped, and only the bytes of those messages are
+    given to the parser (one parser for the whole file, as if the messages
+    were all there was in it), so the messages without any of the strings
+    (whiteboard, layout, screen share...) are never parsed. the top level
+    elements of the recording files are all Message elements, which is what
+    this relies on
+    '''
+    if get_recording_archive_member(xml_file_path) is not None:
+        # a member of a zip can not be memory mapped, it is decompressed into memory instead
+        with open_recording_file(xml_file_path) as infile:
+            yield from iter_prefiltered_recording_messages(infile.read(), prefilter_strings)
+        return
+    if os.path.getsize(xml_file_path) == 0:
+        return
+    with open(xml_file_path, 'rb') as infile, mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as recording:
+        yield from iter_prefiltered_recording_messages(recording, prefilter_strings)
+
+
+def iter_prefiltered_recording_messages(recording, prefilter_strings):
+    # the kept messages of the bytes (or memory map) of a recording file
+    parser = XMLPullParser(events=('start', 'end'))
+    parser.feed(b'<root>')
+
+    def iter_parse_events():
+        # the parser is much faster given a few large pieces than a piece per message
+        messages = []
+        messages_size = 0
+        for message_start, message_end in get_prefiltered_message_spans(recording, prefilter_strings):
+            messages.append(recording[message_start:message_end])
+            messages_size += message_end - message_start
+            if messages_size >= 16384:
+                parser.feed(b''.join(messages))
+                messages = []
+                messages_size = 0
+                yield from parser.read_events()
+        parser.feed(b''.join(messages))
+        yield from parser.read_events()
+
+    yield from iter_completed_top_level_elements(iter_parse_events())
+
+
+def iter_completed_top_level_elements(parse_events):
+    # the children of the root element from start and end parse events, each cleared once the caller is done with it
+    depth = 0
+    root = None
+    for event, element in parse_events:
+        if event == 'start':
+            if root is None:
+                root = element
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            yield element
+            root.clear()
+
+
+def iter_top_level_elements(xml_file_path, parser=DEFAULT_XML_PARSER, prefilter_strings=None):
+    '''
+    yields each child of the root element of an xml file (each message, in
+    the recording files) once it has been read in full, and throws it away
+    once the caller is done with it, so memory use stays the same no matter
+    how big the file is. the 'prefilter' parser only yields the messages with
+    one of prefilter_strings in them
+    '''
+    if parser == 'prefilter':
+        yield from iter_prefiltered_messages(xml_file_path, prefilter_strings)
+        return
+    if parser not in ('etree', 'lxml'):
+        raise ValueError("%s is not a streaming xml parser, use one of etree, lxml or prefilter" % parser)
+    if parser == 'lxml':
+        try:
+            from lxml.etree import iterparse as lxml_iterparse
+        except ImportError:
+            raise ValueError("the lxml parser needs lxml to be installed")
+    # a member of a zipped recording is parsed as it is decompressed, both parsers also read open files
+    xml_file = xml_file_path
+    if get_recording_archive_member(xml_file_path) is not None:
+        xml_file = open_recording_file(xml_file_path)
+    try:
+        if parser == 'etree':
+            parse_events = iterparse(xml_file, events=('start', 'end'))
+        else:
+            parse_events = lxml_iterparse(xml_file, events=('start', 'end'), huge_tree=True)
+        yield from iter_completed_top_level_elements(parse_events)
+    finally:
+        if xml_file is not xml_file_path:
+            xml_file.close()
+
+
+def iter_index_stream_events(recording_folder_path, parser=DEFAULT_XML_PARSER):
+    '''
+    walks indexstream.xml once and yields its events in the order they appear
+    in the file. each message is thrown away as soon as its events are read,
+    so memory use stays the same no matter how long the recording is
+    '''
+    index_stream_xml_path = recording_folder_path + "indexstream.xml"
+    is_first_message = True
+    for message in iter_top_level_elements(index_stream_xml_path, parser, INDEX_STREAM_PREFILTER_STRINGS):
+        for index_stream_event in get_message_events(message, is_first_message):
+            yield index_stream_event
+        is_first_message = is_first_message and message.tag != 'Message'
+
+
+def get_index_stream_events(recording_folder_path, parser=DEFAULT_XML_PARSER):
+    if parser == 'beautifulsoup':
+        return get_index_stream_events_from_soup(get_index_stream(recording_folder_path))
+
+    index_events = get_empty_index_stream_events()
+    for event in iter_index_stream_events(recording_folder_path, parser):
+        index_events[event.type].append(event)
+    return index_events
+
+
+def get_index_stream_events_from_soup(index_stream):
+    '''
+    finds the same events as get_index_stream_events but from the whole
+    BeautifulSoup tree of indexstream.xml, this is slower and uses far more
+    memory, but it is how the events were originally found so it is kept to
+    check the streaming version against
+    '''
+    index_events = get_empty_index_stream_events()
+
+    start_date = index_stream.root.Message.Array.String.next_sibling.next_sibling.next_sibling.next_sibling.text
+    index_events['startDate'].append(IndexStreamEvent('startDate', None, None, None, start_date))
+
+    for item in index_stream.find_all('myID'):
+        index_events['myID'].append(IndexStreamEvent('myID', item.text, None, None, None))
+
+    for item in index_stream.find_all('fullName'):
+        index_events['userAdded'].append(IndexStreamEvent(
+            'userAdded',
+            item.find_next_sibling("id").text,
+            item.find_next_sibling("pID").text,
+            None,
+            item.parent.fullName.text
+        ))
+
+    for item in index_stream.find_all(string='streamAdded'):
+        index_events['streamAdded'].append(IndexStreamEvent(
+            'streamAdded',
+            item.parent.parent.streamPublisherID.text,
+            None,
+            int(item.parent.parent.startTime.text),
+            None
+        ))
+
+    for item in index_stream.find_all(string='streamRemoved'):
+        index_events['streamRemoved'].append(IndexStreamEvent(
+            'streamRemoved',
+            item.parent.parent.streamPublisherID.text,
+            None,
+            int(item.parent.parent.time.text),
+            None
+        ))
+
+    for item in index_stream.find_all(string='userDeleted'):
+        index_events['userDeleted'].append(IndexStreamEvent(
+            'userDeleted',
+            item.parent.parent.next_sibling.next_sibling.text,
+            None,
+            int(item.parent.parent.parent.time.text),
+            None
+        ))
+
+    for item in index_stream.find_all(string='userVoipStatusChanged'):
+        status = item.parent.parent.parent.String.find_next_sibling("String").text
+        if status in ('true', 'false'):
+            index_events['userVoipStatusChanged'].append(IndexStreamEvent(
+                'userVoipStatusChanged',
+                item.parent.parent.parent.String.text,
+                None,
+                int(item.parent.find_next_sibling("time").text),
+                status == 'true'
+            ))
+
+    for item in index_stream.find_all(string='__stop__'):
+        index_events['__stop__'].append(IndexStreamEvent(
+            '__stop__', None, None, int(item.parent.parent.Number.text), None
+        ))
+
+    return index_events
+
+
+def get_end_of_class_time(index_events):
+    # the last __stop__ in the recording is the end of class
+    return index_events['__stop__'][-1].time
+
+
+def get_normalized_name(student_name):
+    '''sometimes students have connection issues and they end up with multiple
+    logins with their name followed by a number, for this reason the
+    following is done to remove any numbers from names'''
+    student_name = ''.join([i for i in student_name if not i.isdigit()])
+    
+    # remove any doubled spaces in the name
+    student_name = re.sub(' +', ' ', student_name)
+    
+    # remove any space before or after the name
+    return student_name.strip()
+
+
+def get_name_key(student_name):
+    # what names are matched on, between a roster and a recording and across a term, capitals do not matter
+    return get_normalized_name(student_name).casefold()
+
+
+def get_student_ids_and_pids(index_events, roster_names_by_key=None):
+    '''
+    roster_names_by_key (see get_identity_index) replaces the name a student
+    joined with by how it is written in the roster
+    '''
     student_names = []
     id_numbers = []
     pid_numbers = []
-    for item in range(len(student_names_index)):
-        # use the name index to access the actual name and add it to the list of names
-        student_name = student_names_index[item].parent.fullName.text
-        
-        '''sometimes students have connection issues and they end up with multiple
-        logins with their name followed by a number, for this reason the
-        following is done to remove any numbers from names'''
-        student_name = ''.join([i for i in student_name if not i.isdigit()])
-        
-        # remove any doubled spaces in the name
-        student_name = re.sub(' +', ' ', student_name)
-        
-        # remove any space before or after the name
-        student_name = student_name.strip()
+    # students usually join several times with the same name, so each name is only normalized once
+    normalized_names = {}
+    for user_added in index_events['userAdded']:
+        student_name = normalized_names.get(user_added.value)
+        if student_name is None:
+            student_name = get_normalized_name(user_added.value)
+            if roster_names_by_key:
+                student_name = roster_names_by_key.get(student_name.casefold(), student_name)
+            normalized_names[user_added.value] = student_name
         student_names.append(student_name)
         
-        # use the name index to find the student id number for the student
-        id_number = student_names_index[item].find_next_sibling("id").text
-        id_numbers.append(id_number)
-        
-        # use the name index to find the the pID for each student and add to list
-        pid_number = student_names_index[item].find_next_sibling("pID").text
-        pid_numbers.append(pid_number)
+        id_numbers.append(user_added.id)
+        pid_numbers.append(user_added.pid)
 
         '''
         make dict with student ID or pID and student name. Reverse list is used 
@@ -78,18 +543,26 @@ def get_student_ids_and_pids(index_stream):
     student_ids = defaultdict(str, zip(list(reversed(id_numbers)), list(reversed(student_names))))
     student_pids = defaultdict(str, zip(list(reversed(pid_numbers)), list(reversed(student_names))))
     return student_ids, student_pids
-    # future plans: take a second argument a student roster cvs file make a dict
-    # with zeroes for all students to act as a placeholder. Then use combined
-    # dict from insight project. to give students with no record a zero
 
 
-def get_instructor_id_and_instructor_name(index_stream, student_ids, student_pids):
-    instructor_id = index_stream.find("myID").text
+# put in front of the instructor's name in the reports
+INSTRUCTOR_TITLE = " ~ ~Instructor~ ~ "
+
+
+def get_instructor_id_and_instructor_name(index_events, student_ids, student_pids, pids_by_name=None):
+    '''
+    pids_by_name (see get_identity_index) finds the instructor's pid without
+    searching every pid
+    '''
+    instructor_id = index_events['myID'][0].id
     instructor = student_ids[instructor_id]
-    instructor_pid = list(student_pids.keys())[list(student_pids.values()).index(instructor)]
+    if pids_by_name is None:
+        instructor_pid = list(student_pids.keys())[list(student_pids.values()).index(instructor)]
+    else:
+        instructor_pid = pids_by_name[instructor][0]
     
     #designate instructor in instructor's name
-    instructor_title_and_name = " ~ ~Instructor~ ~ " + instructor
+    instructor_title_and_name = INSTRUCTOR_TITLE + instructor
     instructor_name = instructor_title_and_name
     
     #replace instructor name with instructor title name in student IDs dict
@@ -99,6 +572,67 @@ def get_instructor_id_and_instructor_name(index_stream, student_ids, student_pid
     return instructor_id, instructor_name
 
 
+def get_roster_names(roster_file_path):
+    '''
+    a roster is a csv file with a student's name at the start of each row,
+    with or without a Participant or Name header
+    '''
+    roster_names = []
+    with open(roster_file_path, newline="") as infile:
+        for row in csv.reader(infile):
+            if not row or not row[0].strip():
+                continue
+            if not roster_names and row[0].strip().casefold() in ("participant", "name"):
+                continue
+            roster_names.append(get_normalized_name(row[0]))
+    return roster_names
+
+
+def get_identity_index(index_events, roster_file_path=None):
+    '''
+    who is who in a session, worked out once and shared by all of the
+    metric functions: the name of each id and pid (student_ids and
+    student_pids), the ids and pids of each name, the instructor and the
+    rows of the report (participant_names). with a roster, students are
+    named as in the roster, matched on get_name_key, and roster students
+    who never joined get a row of zeroes (absent_names)
+    '''
+    roster_names = get_roster_names(roster_file_path) if roster_file_path is not None else []
+    roster_names_by_key = {get_name_key(roster_name): roster_name for roster_name in roster_names}
+    student_ids, student_pids = get_student_ids_and_pids(index_events, roster_names_by_key)
+
+    pids_by_name = defaultdict(list)
+    for student_pid, student_name in student_pids.items():
+        pids_by_name[student_name].append(student_pid)
+    instructor_id, instructor_name = get_instructor_id_and_instructor_name(index_events, student_ids, student_pids,
+                                                                           pids_by_name)
+
+    # the instructor's id and pid were renamed, so the names are matched with ids and pids again
+    ids_by_name = defaultdict(list)
+    for student_id, student_name in student_ids.items():
+        ids_by_name[student_name].append(student_id)
+    pids_by_name = defaultdict(list)
+    for student_pid, student_name in student_pids.items():
+        pids_by_name[student_name].append(student_pid)
+
+    participant_names = get_participant_names(student_ids)
+    absent_names = [roster_name for roster_name in roster_names if roster_name not in participant_names]
+    for absent_name in absent_names:
+        participant_names[absent_name] = absent_name
+
+    return {
+        'student_ids': student_ids,
+        'student_pids': student_pids,
+        'ids_by_name': ids_by_name,
+        'pids_by_name': pids_by_name,
+        'instructor_id': instructor_id,
+        'instructor_name': instructor_name,
+        'participant_names': participant_names,
+        'roster_names': roster_names,
+        'absent_names': absent_names
+    }
+
+
 def assign_zeroes_for_no_participation(dict_of_student_ids, dict_of_results):
     for k in dict_of_student_ids.keys():
         if type(dict_of_results[k]) == list:
@@ -132,7 +666,7 @@ def get_results_by_name_from_results_by_id(dict_of_results_by_id, student_ids):
     return results_with_names_subbed_for_ids
 
 
-def get_ftstage(recording_folder_path):
+def get_ftstage_file_path(recording_folder_path):
     '''
     ftstage is the xml file describing what happens with the camera streams
     in the video pod, much of this information is in the indexstream xml
@@ -140,59 +674,126 @@ def get_ftstage(recording_folder_path):
     times when students pause the camera. ftstage files always start with
     "ftstage" and end with ".xml" but they have different numbers in
     different recordings so a wildcard is used to find the file in the
-    recording folder
+    recording folder. if there is more than one the first by name is used,
+    the live report (Adobe_Connect_Live_Report.py) picks the same one
     '''
     ftstage_wildcard = "ftstage*.xml"
 
     '''
-    glob searches for the wildcard and returns a list of results. index is to
-    get the first result from the resulting list
+    glob searches for the wildcard and returns a list of results in no
+    particular order, so they are sorted. index is to get the first result
+    from the resulting list
     '''
-    ftstage_file_path = glob.glob(recording_folder_path + ftstage_wildcard)[0]
-    with open(ftstage_file_path) as filepath:
+    return sorted(get_recording_file_names(recording_folder_path, ftstage_wildcard))[0]
+
+
+def get_ftstage(recording_folder_path):
+    from bs4 import BeautifulSoup
+
+    with open_recording_file(get_ftstage_file_path(recording_folder_path), 'r') as filepath:
         ftstage = BeautifulSoup(filepath, "xml")
     return ftstage
 
 
-def get_camera_contributions(index_stream, ftstage, student_ids, instructor_id):
-    # get time when student came on camera from index stream soup
-    camera_starts_index = index_stream.find_all(string='streamAdded')
-    camera_start_ids = []
-    camera_start_times = []
-    for item in range(len(camera_starts_index)):
-        # get id number of student that started their camera
-        camera_start_id = camera_starts_index[item].parent.parent.streamPublisherID.text
-        camera_start_ids.append(camera_start_id)
-        # get time that student started their camera
-        camera_start_time = int(camera_starts_index[item].parent.parent.startTime.text)
-        camera_start_times.append(camera_start_time)
+FtstageEvent = namedtuple('FtstageEvent', ['type', 'id', 'time', 'value'])
+
+
+def get_ftstage_events_from_soup(ftstage):
+    '''
+    the camera pause events (value is true when the camera is paused) and the
+    times video was removed, found in the ftstage soup
+    '''
+    ftstage_events = {'updateVideoPauseStatus': [], 'removeVideo': []}
+    for item in ftstage.find_all(string="updateVideoPauseStatus"):
+        ftstage_events['updateVideoPauseStatus'].append(FtstageEvent(
+            'updateVideoPauseStatus',
+            item.parent.next_sibling.next_sibling.text,
+            int(item.parent.parent.Object.time.text),
+            item.parent.parent.String.find_next_sibling("String").text == 'true'
+        ))
+
+    for item in ftstage.find_all(string="removeVideo"):
+        ftstage_events['removeVideo'].append(FtstageEvent(
+            'removeVideo',
+            item.parent.next_sibling.next_sibling.text,
+            int(item.parent.parent.time.text),
+            None
+        ))
+    return ftstage_events
+
+
+def get_ftstage_events(recording_folder_path, parser=DEFAULT_XML_PARSER):
+    '''
+    the same events as get_ftstage_events_from_soup, read one message at a
+    time with a streaming parser
+    '''
+    if parser == 'beautifulsoup':
+        return get_ftstage_events_from_soup(get_ftstage(recording_folder_path))
+
+    ftstage_events = {'updateVideoPauseStatus': [], 'removeVideo': []}
+    for event in iter_ftstage_events(recording_folder_path, parser):
+        ftstage_events[event.type].append(event)
+    return ftstage_events
+
+
+def iter_ftstage_events(recording_folder_path, parser=DEFAULT_XML_PARSER):
+    # yields the events of the ftstage file in the order they appear in it
+    for message in iter_top_level_elements(get_ftstage_file_path(recording_folder_path), parser,
+                                           (b'updateVideoPauseStatus', b'removeVideo')):
+        for ftstage_event in get_ftstage_message_events(message):
+            yield ftstage_event
+
+
+def get_ftstage_message_events(message):
+    # the pause and remove video events in one top level message of the ftstage file
+    events = []
+    parents = None
+    for element in message.iter():
+        if element.text not in ('updateVideoPauseStatus', 'removeVideo'):
+            continue
+        if parents is None:
+            parents = {child: parent for parent in message.iter() for child in parent}
+        change = parents[element]
+        student_id = get_element_text(get_next_element_sibling(element, parents))
+        if element.text == 'updateVideoPauseStatus':
+            pause_status = get_next_element_sibling(change.find('.//String'), parents, 'String')
+            events.append(FtstageEvent(
+                'updateVideoPauseStatus',
+                student_id,
+                int(get_element_text(change.find('.//Object').find('.//time'))),
+                get_element_text(pause_status) == 'true'
+            ))
+        else:
+            events.append(FtstageEvent(
+                'removeVideo',
+                student_id,
+                int(get_element_text(change.find('.//time'))),
+                None
+            ))
+    return events
+
+
+def get_camera_minutes_with_loops(index_events, ftstage_events):
+    '''
+    the original way of working out, for each id, the minutes the camera was
+    on and the minutes it was paused. it is slow for students who lose their
+    connection many times, but it is kept as the reference for
+    get_camera_minutes_vectorized
+    '''
+    # get time when student came on camera from index stream events
+    camera_start_ids = [event.id for event in index_events['streamAdded']]
+    camera_start_times = [event.time for event in index_events['streamAdded']]
     student_camera_start_times = defaultdict(list)
     for student_id, start_time in zip(camera_start_ids, camera_start_times):
         student_camera_start_times[student_id].append(start_time)
 
-        # get time when student turned off camera
-    stream_removed_index = index_stream.find_all(string='streamRemoved')
-    stream_removed_ids = []
-    stream_removed_times = []
-    for item in range(len(stream_removed_index)):
-        # get id number of student that stopped their camera
-        stream_removed_id = stream_removed_index[item].parent.parent.streamPublisherID.text
-        stream_removed_ids.append(stream_removed_id)
-        # get time that student stopped their camera
-        stream_removed_time = int(stream_removed_index[item].parent.parent.time.text)
-        stream_removed_times.append(stream_removed_time)
+    # get time when student turned off camera
+    stream_removed_ids = [event.id for event in index_events['streamRemoved']]
+    stream_removed_times = [event.time for event in index_events['streamRemoved']]
 
     # get time when student loses connection
-    user_deleted_index = index_stream.find_all(string='userDeleted')
-    user_deleted_ids = []
-    user_deleted_times = []
-    for item in range(len(user_deleted_index)):
-        # get id number of student that loses connection
-        user_deleted_id = user_deleted_index[item].parent.parent.next_sibling.next_sibling.text
-        user_deleted_ids.append(user_deleted_id)
-        # get time that student that loses connection
-        user_deleted_time = int(user_deleted_index[item].parent.parent.parent.time.text)
-        user_deleted_times.append(user_deleted_time)
+    user_deleted_ids = [event.id for event in index_events['userDeleted']]
+    user_deleted_times = [event.time for event in index_events['userDeleted']]
 
     # merge lists of stream removed and stream ids b/c both are ways camera stops
     camera_stops_ids = stream_removed_ids + user_deleted_ids
@@ -222,19 +823,18 @@ def get_camera_contributions(index_stream, ftstage, student_ids, instructor_id):
         total_time = sum(times) / 1000 / 60
         student_minutes_with_camera_on[k] += total_time
 
-    # get total time student pauses camera from ftstage soup
-    pause_change_index = ftstage.find_all(string="updateVideoPauseStatus")
+    # get total time student pauses camera from ftstage events
     pause_start_ids = []
     pause_start_times = []
     pause_stop_ids = []
     pause_stop_times = []
-    for item in range(len(pause_change_index)):
-        if pause_change_index[item].parent.parent.String.find_next_sibling("String").text == 'true':
-            pause_start_times.append(int(pause_change_index[item].parent.parent.Object.time.text))
-            pause_start_ids.append(pause_change_index[item].parent.next_sibling.next_sibling.text)
+    for pause_change in ftstage_events['updateVideoPauseStatus']:
+        if pause_change.value:
+            pause_start_times.append(pause_change.time)
+            pause_start_ids.append(pause_change.id)
         else:
-            pause_stop_times.append(int(pause_change_index[item].parent.parent.Object.time.text))
-            pause_stop_ids.append(pause_change_index[item].parent.next_sibling.next_sibling.text)
+            pause_stop_times.append(pause_change.time)
+            pause_stop_ids.append(pause_change.id)
     student_pause_start_times = defaultdict(list)
     for student_id, start_time in zip(pause_start_ids, pause_start_times):
         student_pause_start_times[student_id].append(start_time)
@@ -245,12 +845,8 @@ def get_camera_contributions(index_stream, ftstage, student_ids, instructor_id):
         # trimmed_student_pause_stop_times = {k: student_pause_stop_times[k][1:] for k in student_pause_stop_times}
 
     # find times when student video feed was lost
-    video_removed_index = ftstage.find_all(string="removeVideo")
-    video_removed_ids = []
-    video_removed_times = []
-    for item in range(len(video_removed_index)):
-        video_removed_ids.append(video_removed_index[item].parent.next_sibling.next_sibling.text)
-        video_removed_times.append(int(video_removed_index[item].parent.parent.time.text))
+    video_removed_ids = [event.id for event in ftstage_events['removeVideo']]
+    video_removed_times = [event.time for event in ftstage_events['removeVideo']]
     student_video_removed_times = defaultdict(list)
     for student_id, removed_time in zip(video_removed_ids, video_removed_times):
         student_video_removed_times[student_id].append(removed_time)
@@ -329,13 +925,199 @@ def get_camera_contributions(index_stream, ftstage, student_ids, instructor_id):
         total_time = sum(times) / 1000 / 60
         student_minutes_with_camera_paused[k] += total_time
 
+    return student_minutes_with_camera_on, student_minutes_with_camera_paused
+
+
+def get_ordered_ids(*lists_of_ids):
+    # every id in the lists once, in the order it first appears
+    return list(dict.fromkeys(student_id for list_of_ids in lists_of_ids for student_id in list_of_ids))
+
+
+def get_ordered_codes(*arrays_of_codes):
+    # the same as get_ordered_ids for arrays of id codes
+    codes = np.concatenate([np.asarray(array_of_codes, dtype=np.int64) for array_of_codes in arrays_of_codes])
+    unique_codes, first_indexes = np.unique(codes, return_index=True)
+    return unique_codes[np.argsort(first_indexes)]
+
+
+def get_ranks_within_codes(codes):
+    '''
+    for each entry, how many entries with the same code come before it, so
+    the first camera start of a student is 0, their second is 1 and so on
+    '''
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    ranks = np.empty(len(codes), dtype=np.int64)
+    ranks[order] = np.arange(len(codes)) - np.searchsorted(sorted_codes, sorted_codes, side='left')
+    return ranks
+
+
+def get_interval_totals(intervals, id_count):
+    # the total milliseconds of (codes, start times, stop times) intervals for each code
+    codes, start_times, stop_times = intervals
+    totals = np.zeros(id_count, dtype=np.int64)
+    np.add.at(totals, codes, stop_times - start_times)
+    return totals
+
+
+def get_camera_minutes_vectorized(event_store):
+    '''
+    gives exactly the same results as get_camera_minutes_with_loops, but
+    works on the id codes and times of the event store, kept in numpy arrays
+    sorted by code and then time. instead of looping over every stop for
+    every start, the matching is done with searchsorted on a key that orders
+    the times by code first, so the cost is O((n + m) log n) rather than
+    O(n * m) for students who lose their connection many times
+    '''
+    camera_intervals, pause_intervals, camera_codes, camera_and_pause_codes = get_camera_intervals_vectorized(
+        event_store)
+    id_count = len(event_store['ids'])
+    camera_on_totals = get_interval_totals(camera_intervals, id_count)
+    paused_totals = get_interval_totals(pause_intervals, id_count)
+
+    ids = event_store['ids']
+    student_minutes_with_camera_on = {ids[code]: int(camera_on_totals[code]) / 1000 / 60
+                                      for code in camera_codes.tolist()}
+    student_minutes_with_camera_paused = {ids[code]: int(paused_totals[code]) / 1000 / 60
+                                          for code in camera_and_pause_codes.tolist()}
+    return student_minutes_with_camera_on, student_minutes_with_camera_paused
+
+
+def get_camera_intervals_vectorized(event_store):
+    '''
+    the camera on and camera paused intervals that get_camera_minutes_vectorized
+    adds up, each as arrays of (id codes, start times, stop times), and the
+    codes of the students that get_camera_minutes_with_loops has camera and
+    pause results for, in its order
+    '''
+    camera_start_codes, camera_start_times, values = get_event_columns(event_store, 'streamAdded')
+    # stream removed and user deleted are both ways the camera stops
+    camera_stop_codes, camera_stop_times, values = get_event_columns(event_store, 'streamRemoved', 'userDeleted')
+    pause_change_codes, pause_change_times, pause_statuses = get_event_columns(event_store,
+                                                                               'updateVideoPauseStatus')
+    pause_start_codes, pause_start_times = pause_change_codes[pause_statuses], pause_change_times[pause_statuses]
+    pause_stop_codes, pause_stop_times = pause_change_codes[~pause_statuses], pause_change_times[~pause_statuses]
+    video_removed_codes, video_removed_times, values = get_event_columns(event_store, 'removeVideo')
+
+    # the ids (and their order) the loop version ends up with in its results
+    camera_codes = get_ordered_codes(camera_start_codes, camera_stop_codes)
+    camera_and_pause_codes = get_ordered_codes(video_removed_codes, pause_stop_codes, camera_codes, pause_start_codes)
+    id_count = len(event_store['ids'])
+
+    '''
+    time with camera on: a student's nth camera stop is paired with their nth
+    camera start, and starts or stops left over without a partner are not
+    counted. students with stops but no starts get 0
+    '''
+    camera_start_counts = np.bincount(camera_start_codes, minlength=id_count)
+    camera_stop_counts = np.bincount(camera_stop_codes, minlength=id_count)
+    paired_counts = np.minimum(camera_start_counts, camera_stop_counts)
+    camera_start_ranks = get_ranks_within_codes(camera_start_codes)
+    camera_stop_ranks = get_ranks_within_codes(camera_stop_codes)
+    paired_starts = camera_start_ranks < paired_counts[camera_start_codes]
+    paired_stops = camera_stop_ranks < paired_counts[camera_stop_codes]
+    # line the paired starts and stops up by code and then rank, so each start meets its stop
+    start_order = np.lexsort((camera_start_ranks[paired_starts], camera_start_codes[paired_starts]))
+    stop_order = np.lexsort((camera_stop_ranks[paired_stops], camera_stop_codes[paired_stops]))
+    camera_intervals = (camera_start_codes[paired_starts][start_order],
+                        camera_start_times[paired_starts][start_order],
+                        camera_stop_times[paired_stops][stop_order])
+
+    # students on camera without a start are treated as starting at 0
+    camera_codes_without_starts = camera_codes[camera_start_counts[camera_codes] == 0]
+    window_start_codes = np.concatenate([camera_start_codes, camera_codes_without_starts])
+    window_start_times = np.concatenate([camera_start_times, np.zeros(len(camera_codes_without_starts), np.int64)])
+
+    '''
+    pause stops are the pause status changing to false and the video being
+    removed, students on camera without a pause stop get a stop at 0
+    '''
+    pause_start_counts = np.bincount(pause_start_codes, minlength=id_count)
+    pause_stop_counts = np.bincount(pause_stop_codes, minlength=id_count)
+    camera_codes_without_pause_stops = camera_codes[pause_stop_counts[camera_codes] == 0]
+    stop_codes = np.concatenate([video_removed_codes, pause_stop_codes, camera_codes_without_pause_stops])
+    stop_times = np.concatenate([video_removed_times, pause_stop_times,
+                                 np.zeros(len(camera_codes_without_pause_stops), np.int64)])
+
+    # key that sorts by code and then by time, used for all of the searchsorted lookups
+    all_times = np.concatenate([stop_times, window_start_times, pause_start_times, [0]])
+    earliest_time = all_times.min()
+    time_span = all_times.max() - earliest_time + 1
+
+    def get_keys(codes, times):
+        return codes * time_span + (times - earliest_time)
+
+    order = np.lexsort((stop_times, stop_codes))
+    stop_codes, stop_times = stop_codes[order], stop_times[order]
+
+    # remove stop times that occur before the first pause
+    first_pause_start_times = np.zeros(id_count, dtype=np.int64)
+    paused_codes, first_pause_start_indexes = np.unique(pause_start_codes, return_index=True)
+    first_pause_start_times[paused_codes] = pause_start_times[first_pause_start_indexes]
+    keep = ~((pause_start_counts[stop_codes] > 0) & (stop_times < first_pause_start_times[stop_codes]))
+    stop_codes, stop_times = stop_codes[keep], stop_times[keep]
+
+    '''
+    remove stops when students lose connection, these are less than 100 ms
+    after one of the student's camera starts. the latest camera start before
+    each stop is found, if any start is in the window that one is
+    '''
+    if len(window_start_codes) > 0:
+        window_order = np.lexsort((window_start_times, window_start_codes))
+        window_start_codes = window_start_codes[window_order]
+        window_start_times = window_start_times[window_order]
+        previous_starts = np.searchsorted(get_keys(window_start_codes, window_start_times),
+                                          get_keys(stop_codes, stop_times), side='left') - 1
+        has_previous_start = previous_starts >= 0
+        previous_starts = np.maximum(previous_starts, 0)
+        reconnect_stops = (
+            has_previous_start &
+            (window_start_codes[previous_starts] == stop_codes) &
+            (stop_times - window_start_times[previous_starts] < 100)
+        )
+        stop_codes, stop_times = stop_codes[~reconnect_stops], stop_times[~reconnect_stops]
+
+    # remove the last stop of students with more stops than pause starts (student removed from class)
+    is_last_stop = np.append(stop_codes[1:] != stop_codes[:-1], True)[:len(stop_codes)]
+    extra_stops = is_last_stop & (np.bincount(stop_codes, minlength=id_count)[stop_codes] >
+                                  pause_start_counts[stop_codes])
+    stop_codes, stop_times = stop_codes[~extra_stops], stop_times[~extra_stops]
+
+    # each pause ends at the first remaining stop after it, or lasts no time if there is none
+    next_stops = np.searchsorted(get_keys(stop_codes, stop_times),
+                                 get_keys(pause_start_codes, pause_start_times), side='right')
+    has_next_stop = next_stops < len(stop_codes)
+    next_stops = np.minimum(next_stops, max(len(stop_codes) - 1, 0))
+    if len(stop_codes) > 0:
+        has_next_stop &= stop_codes[next_stops] == pause_start_codes
+        clean_stop_times = np.where(has_next_stop, stop_times[next_stops], pause_start_times)
+    else:
+        clean_stop_times = pause_start_times
+    pause_intervals = (pause_start_codes, pause_start_times, clean_stop_times)
+    return camera_intervals, pause_intervals, camera_codes, camera_and_pause_codes
+
+
+def get_camera_contributions(event_store, student_ids, instructor_id, vectorized=True):
+    if vectorized:
+        student_minutes_with_camera_on, student_minutes_with_camera_paused = get_camera_minutes_vectorized(
+            event_store)
+    else:
+        recording_events = get_recording_events_from_event_store(event_store)
+        student_minutes_with_camera_on, student_minutes_with_camera_paused = get_camera_minutes_with_loops(
+            recording_events['index'], recording_events['ftstage'])
+
+    return get_camera_contributions_from_minutes(student_minutes_with_camera_on, student_minutes_with_camera_paused,
+                                                 get_end_of_class_time(event_store['index']), student_ids,
+                                                 instructor_id)
+
+
+def get_camera_contributions_from_minutes(student_minutes_with_camera_on, student_minutes_with_camera_paused,
+                                          end_of_class_time, student_ids, instructor_id):
     # determine time student was on camera minus time paused
     student_time_on_camera = {k: student_minutes_with_camera_on[k] - student_minutes_with_camera_paused.get(k, 0) for k
                               in student_minutes_with_camera_on.keys()}
 
     # get fraction of class time student spent on camera based on end of class time
-    end_of_class_object = index_stream.find_all(text='__stop__')
-    end_of_class_time = int(end_of_class_object[len(end_of_class_object) - 1].parent.parent.Number.text)
     end_of_clas_time_minutes = end_of_class_time / 1000 / 60
     student_fraction_of_class_on_camera = {k: v / end_of_clas_time_minutes for k, v in student_time_on_camera.items()}
     student_fraction_of_class_on_camera = defaultdict(int, student_fraction_of_class_on_camera)
@@ -360,22 +1142,32 @@ def get_camera_contributions(index_stream, ftstage, student_ids, instructor_id):
     )
 
 
-def get_microphone_contributions(index_stream, student_ids, instructor_id):
+def get_mic_starts_and_stops(index_events):
     # get times when student has a microphone change (turns it on OR off)
-    mic_change_index = index_stream.find_all(string='userVoipStatusChanged')
     mic_start_ids = []
     mic_start_times = []
     mic_stop_ids = []
     mic_stop_times = []
-    for item in range(len(mic_change_index)):
-        # look in index of microphone changes to find instances where student turned mic on (started talking)
-        if mic_change_index[item].parent.parent.parent.String.find_next_sibling("String").text == 'true':
-            mic_start_ids.append(mic_change_index[item].parent.parent.parent.String.text)
-            mic_start_times.append(int(mic_change_index[item].parent.find_next_sibling("time").text))
+    for mic_change in index_events['userVoipStatusChanged']:
+        # true is when the student turned mic on (started talking)
+        if mic_change.value:
+            mic_start_ids.append(mic_change.id)
+            mic_start_times.append(mic_change.time)
+        else:
+            mic_stop_ids.append(mic_change.id)
+            mic_stop_times.append(mic_change.time)
+    return mic_start_ids, mic_start_times, mic_stop_ids, mic_stop_times
 
-        if mic_change_index[item].parent.parent.parent.String.find_next_sibling("String").text == 'false':
-            mic_stop_ids.append(mic_change_index[item].parent.parent.parent.String.text)
-            mic_stop_times.append(int(mic_change_index[item].parent.find_next_sibling("time").text))
+
+def get_microphone_milliseconds_with_loops(index_events, student_ids):
+    '''
+    the original way of working out the total milliseconds each id spent on
+    microphone. every start is paired with a scan through all of the
+    student's stops, so it is slow for the instructor who may talk thousands
+    of times in a session, but it is kept as the reference for
+    get_microphone_milliseconds_vectorized
+    '''
+    mic_start_ids, mic_start_times, mic_stop_ids, mic_stop_times = get_mic_starts_and_stops(index_events)
 
     student_mic_start_times = defaultdict(list)
     for student_id, start_time in zip(mic_start_ids, mic_start_times):
@@ -407,18 +1199,120 @@ def get_microphone_contributions(index_stream, student_ids, instructor_id):
         if len(student_mic_start_times[k]) == 0:
             student_mic_start_times[k].append(0)
 
-            # get end of class time
-    end_of_class_object = index_stream.find_all(text='__stop__')
-    end_of_class_time = int(end_of_class_object[len(end_of_class_object) - 1].parent.parent.Number.text)
+    student_milliseconds_on_microphone = {}
+    for k in student_mic_stop_times.keys():
+        times = [a - b for a, b in zip(student_mic_stop_times[k], student_mic_start_times[k])]
+        student_milliseconds_on_microphone[k] = sum(times)
+    return student_milliseconds_on_microphone
+
+
+def get_microphone_milliseconds_vectorized(event_store, student_ids, merge_gap=None):
+    '''
+    gives the same results as get_microphone_milliseconds_with_loops. each
+    start is paired with the first of the student's stops (in the order they
+    appear in the recording) that is later than it, and that pairing is done
+    for every start at once with a single searchsorted over the running
+    maximum of the stop times, grouped by student.
+
+    merge_gap (in milliseconds) optionally joins speaking bursts of the same
+    student that are separated by less than merge_gap, so the short silences
+    when the microphone icon flickers off mid sentence count as talking, and
+    overlapping bursts are only counted once. None keeps the original totals
+    '''
+    ids = event_store['ids']
+    totals = get_interval_totals(get_microphone_bursts_vectorized(event_store, merge_gap), len(ids))
+    # students who never had a microphone (or any other) event get 0
+    mic_change_codes, mic_change_times, mic_statuses = get_event_columns(event_store, 'userVoipStatusChanged')
+    id_codes = event_store['id_codes']
+    mic_ids = get_ordered_ids([ids[code] for code in get_ordered_codes(mic_change_codes[mic_statuses]).tolist()],
+                              student_ids.keys())
+    return {k: int(totals[id_codes[k]]) if k in id_codes else 0 for k in mic_ids}
+
 
+def get_microphone_bursts_vectorized(event_store, merge_gap=None):
+    '''
+    the speaking bursts that get_microphone_milliseconds_vectorized adds up,
+    as arrays of (id codes, start times, stop times)
+    '''
+    mic_change_codes, mic_change_times, mic_statuses = get_event_columns(event_store, 'userVoipStatusChanged')
+    # true is when the student turned mic on (started talking)
+    start_codes, start_times = mic_change_codes[mic_statuses], mic_change_times[mic_statuses]
+    stop_codes, stop_times = mic_change_codes[~mic_statuses], mic_change_times[~mic_statuses]
+
+    all_times = np.concatenate([start_times, stop_times, [0]])
+    earliest_time = all_times.min()
+    time_span = all_times.max() - earliest_time + 1
+
+    '''
+    with the stops grouped by student (and kept in recording order within a
+    student), the running maximum of code * time_span + time is still grouped
+    by student, and the first place it goes past a start is the first stop of
+    that student that is later than the start
+    '''
+    stop_order = np.argsort(stop_codes, kind='stable')
+    stop_codes, stop_times = stop_codes[stop_order], stop_times[stop_order]
+    running_latest_stops = np.maximum.accumulate(stop_codes * time_span + (stop_times - earliest_time))
+    next_stops = np.searchsorted(running_latest_stops, start_codes * time_span + (start_times - earliest_time),
+                                 side='right')
+    if len(stop_codes) > 0:
+        has_next_stop = next_stops < len(stop_codes)
+        next_stops = np.minimum(next_stops, len(stop_codes) - 1)
+        has_next_stop &= stop_codes[next_stops] == start_codes
+        clean_stop_times = np.where(has_next_stop, stop_times[next_stops], start_times)
+    else:
+        clean_stop_times = start_times
+
+    if merge_gap is None:
+        return start_codes, start_times, clean_stop_times
+    return get_merged_bursts(start_codes, start_times, clean_stop_times, merge_gap, time_span, earliest_time)
+
+
+def get_merged_bursts(codes, start_times, stop_times, merge_gap, time_span, earliest_time):
+    '''
+    joins each student's bursts that overlap or are less than merge_gap
+    milliseconds apart and returns the code, start and stop of each joined burst
+    '''
+    order = np.lexsort((start_times, codes))
+    codes, start_times, stop_times = codes[order], start_times[order], stop_times[order]
+    # latest stop so far for each student, as a key so it restarts for every student
+    latest_stop_keys = np.maximum.accumulate(codes * time_span + (stop_times - earliest_time))
+    latest_stop_times = latest_stop_keys - codes * time_span + earliest_time
+    starts_new_burst = np.ones(len(codes), dtype=bool)
+    starts_new_burst[1:] = ((codes[1:] != codes[:-1]) |
+                            (start_times[1:] - latest_stop_times[:-1] >= merge_gap))
+    first_in_burst = np.flatnonzero(starts_new_burst)
+    last_in_burst = np.append(first_in_burst[1:] - 1, len(codes) - 1)[:len(first_in_burst)]
+    return codes[first_in_burst], start_times[first_in_burst], latest_stop_times[last_in_burst]
+
+
+def get_microphone_contributions(event_store, student_ids, instructor_id, vectorized=True, merge_gap=None):
+    '''
+    merge_gap is only used by the vectorized calculation, see
+    get_microphone_milliseconds_vectorized
+    '''
+    if vectorized:
+        student_milliseconds_on_microphone = get_microphone_milliseconds_vectorized(event_store, student_ids,
+                                                                                    merge_gap)
+    elif merge_gap is None:
+        student_milliseconds_on_microphone = get_microphone_milliseconds_with_loops(
+            get_recording_events_from_event_store(event_store)['index'], student_ids)
+    else:
+        raise ValueError("merge_gap needs the vectorized microphone calculation")
+
+    return get_microphone_contributions_from_milliseconds(student_milliseconds_on_microphone,
+                                                          get_end_of_class_time(event_store['index']), student_ids,
+                                                          instructor_id)
+
+
+def get_microphone_contributions_from_milliseconds(student_milliseconds_on_microphone, end_of_class_time, student_ids,
+                                                   instructor_id):
     # determine total time on microphone
     student_minutes_on_microphone = defaultdict(int)
     student_fraction_of_class_on_microphone = defaultdict(int)
 
-    for k in student_mic_stop_times.keys():
-        times = [a - b for a, b in zip(student_mic_stop_times[k], student_mic_start_times[k])]
-        total_time = sum(times) / 1000 / 60
-        fraction_of_class_time_on_microphone = (sum(times) / end_of_class_time)
+    for k, milliseconds_on_microphone in student_milliseconds_on_microphone.items():
+        total_time = milliseconds_on_microphone / 1000 / 60
+        fraction_of_class_time_on_microphone = (milliseconds_on_microphone / end_of_class_time)
 
         student_minutes_on_microphone[k] += total_time
         student_fraction_of_class_on_microphone[k] += fraction_of_class_time_on_microphone
@@ -440,51 +1334,178 @@ def get_microphone_contributions(index_stream, student_ids, instructor_id):
     )
 
 
-def get_chat_contributions(index_stream, student_pids, recording_folder_file_path):
+ChatMessage = namedtuple('ChatMessage', ['pid', 'time', 'text'])
+
+
+def get_chat_messages_from_soup(ftchat):
+    chat_messages = []
+    chat_index = ftchat.find_all("fromPID")
+    for item in range(len(chat_index)):
+        chat_messages.append(ChatMessage(
+            chat_index[item].parent.fromPID.text,
+            float(chat_index[item].parent.when.text),
+            chat_index[item].parent.fromPID.next_sibling.next_sibling.text
+        ))
+    return chat_messages
+
+
+def get_chat_messages_from_file(ftchat_file_path, parser=DEFAULT_XML_PARSER):
+    if parser == 'beautifulsoup':
+        from bs4 import BeautifulSoup
+
+        with open_recording_file(ftchat_file_path, 'r') as filepath:
+            ftchat = BeautifulSoup(filepath, "xml")
+        return get_chat_messages_from_soup(ftchat)
+
+    chat_messages = []
+    for message in iter_top_level_elements(ftchat_file_path, parser, (b'fromPID',)):
+        chat_messages.extend(get_chat_message_events(message))
+    return chat_messages
+
+
+def get_chat_message_events(message):
+    # the chat messages in one top level message of an ftchat file
+    chat_messages = []
+    parents = None
+    for element in message.iter('fromPID'):
+        if parents is None:
+            parents = {child: parent for parent in message.iter() for child in parent}
+        chat = parents[element]
+        from_pid = chat.find('.//fromPID')
+        chat_messages.append(ChatMessage(
+            get_element_text(from_pid),
+            float(get_element_text(chat.find('.//when'))),
+            get_element_text(get_next_element_sibling(from_pid, parents))
+        ))
+    return chat_messages
+
+
+def get_chat_messages(recording_folder_file_path, parser=DEFAULT_XML_PARSER, workers=None):
+    '''
+    every message from every ftchat file with the pID of the sender, the time
+    it was sent and the text of the message. sessions with breakouts or Q&A
+    pods have many ftchat files and each one can be read on its own, so when
+    there is more than one they are read in parallel by a pool of worker
+    processes (workers of them, None uses one per CPU and 1 reads the files
+    one after another). the
+    messages are put together in file name order, so the result is the same
+    whichever file finishes first
+    '''
+    # get list of ftchat files
+    ftchat_wildcard = "ftchat*.xml"
+    ftchat_file_path_list = sorted(get_recording_file_names(recording_folder_file_path, ftchat_wildcard))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(ftchat_file_path_list))
+    if workers <= 1:
+        chat_messages_by_file = [get_chat_messages_from_file(file_path, parser) for file_path in ftchat_file_path_list]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chat_messages_by_file = list(executor.map(get_chat_messages_from_file, ftchat_file_path_list,
+                                                      [parser] * len(ftchat_file_path_list)))
+
+    chat_messages = []
+    for file_chat_messages in chat_messages_by_file:
+        chat_messages.extend(file_chat_messages)
+    return chat_messages
+
+
+def get_chat_contributions(event_store, student_pids, session_header=None):
     '''
     ftchatX logs record time of chat message as unixtime code multiplied by 1000
     in PST. The start date in indexstream is a readable string stating the 
     in Greenwich mean time zone. This code will strip the time from 
     indexstream.xml and convert it into the same format used in the ftchat logs
+    (see get_session_header)
     '''
-    # get get start date from indextream timestamp
-    start_date = index_stream.root.Message.Array.String.next_sibling.next_sibling.next_sibling.next_sibling.text
+    sent_after_start = get_chat_messages_sent_after_start(event_store, session_header)
+    pids = event_store['pids']
+    chat_pids = [pids[pid_code] for pid_code in event_store['chat_pid'][sent_after_start].tolist()]
+    chat_times = event_store['chat_time'][sent_after_start].tolist()
+    chat_texts = [event_store['chat_text'][message] for message in sent_after_start.tolist()]
+    return get_chat_contributions_from_messages(chat_pids, chat_times, chat_texts, student_pids)
+
+
+def get_chat_messages_sent_after_start(event_store, session_header=None):
+    # find all messages sent after the start of the class day, with one comparison of all of the chat times
+    if session_header is None:
+        session_header = get_session_header(event_store)
+    return np.flatnonzero(event_store['chat_time'] > session_header['chat_start_time'])
+
+
+'''
+the start date in indexstream.xml is in greenwich mean time (the source
+timezone), and the chats sent from midnight of that day on are counted. a
+target timezone makes the class day start at midnight where the class is
+held instead. the timezone objects and the start times of the most recent
+start dates are kept, so a batch of sessions looks each timezone up once
+and each report works its times out once
+'''
+DEFAULT_SOURCE_TIMEZONE = "Greenwich"
+# a batch or a service sees a handful of timezones and one start date per session, so the caches stay small
+SESSION_CACHE_SIZE = 256
+
 
-    # convert to format used in ftchats
-    start_timestamp = datetime.fromtimestamp(time.mktime(time.strptime(start_date)))
+@lru_cache(maxsize=32)
+def get_timezone(timezone_name):
+    return pytz.timezone(timezone_name)
 
+
+@lru_cache(maxsize=SESSION_CACHE_SIZE)
+def get_session_start_times(start_date, source_timezone=DEFAULT_SOURCE_TIMEZONE, target_timezone=None):
+    '''
+    when the recording started and when the class day started, in ftchat
+    time (unix time * 1000), and the offset from utc of the target timezone
+    (the source timezone when there is none) in milliseconds
+    '''
+    start_time = get_timezone(source_timezone).localize(datetime(*time.strptime(start_date)[:6]))
+    target = get_timezone(target_timezone or source_timezone)
+    local_start_time = start_time.astimezone(target)
     # remove time information to capture chats after class starts but before recording
-    start_day_timestamp = datetime(start_timestamp.year, start_timestamp.month, start_timestamp.day)
-    old_timezone = pytz.timezone("Greenwich")
-    new_timezone = pytz.timezone("US/Pacific")
+    start_day_time = target.localize(datetime(local_start_time.year, local_start_time.month, local_start_time.day))
+    return (int(1000 * start_time.timestamp()), 1000 * start_day_time.timestamp(),
+            1000 * local_start_time.utcoffset().total_seconds())
 
-    # all of the timestamps used by AC are multiplied by 1000
-    corrected_start_timestamp = 1000 * (
-        datetime.timestamp(old_timezone.localize(start_day_timestamp).astimezone(new_timezone)))
 
-    # get list of ftchat files
-    ftchat_wildcard = "ftchat*.xml"
-    ftchat_file_path_list = glob.glob(recording_folder_file_path + ftchat_wildcard)
+def get_chat_start_timestamp(start_date, source_timezone=DEFAULT_SOURCE_TIMEZONE, target_timezone=None):
+    '''
+    the start of the class day as an ftchat time, from the start date string
+    in indexstream.xml (see get_chat_contributions)
+    '''
+    return get_session_start_times(start_date, source_timezone, target_timezone)[1]
 
-    # loop through the list finding all messages chat_times, and chat_lengths
-    chat_pids = []
-    chat_messages = []
-    chat_times = []
-    chat_lengths = []
-    for file_path in ftchat_file_path_list:
-        with open(file_path) as filepath:
-            ftchat = BeautifulSoup(filepath, "xml")
-        chat_index = ftchat.find_all("fromPID")
-        for item in range(len(chat_index)):
-            if float(chat_index[item].parent.when.text) > corrected_start_timestamp:
-                chat_pids.append(chat_index[item].parent.fromPID.text)
-                chat_times.append(float(chat_index[item].parent.when.text))
-                chat_messages.append(chat_index[item].parent.fromPID.next_sibling.next_sibling.text)
-                chat_lengths.append(int(len(chat_index[item].parent.fromPID.next_sibling.next_sibling.text)))
+
+def get_session_header(event_store, source_timezone=DEFAULT_SOURCE_TIMEZONE, target_timezone=None):
+    '''
+    the timing of a session, worked out once and shared by the chat,
+    timeline and chat analytics calculations: the start date string, when
+    the recording and the class day started in ftchat time, the end of class
+    in recording time and the utc offset of the class in milliseconds
+    '''
+    start_date = event_store['index']['startDate'][0].value
+    recording_start_time, chat_start_time, utc_offset = get_session_start_times(start_date, source_timezone,
+                                                                                target_timezone)
+    return {
+        'start_date': start_date,
+        'source_timezone': source_timezone,
+        'target_timezone': target_timezone or source_timezone,
+        'recording_start_time': recording_start_time,
+        'chat_start_time': chat_start_time,
+        'end_of_class_time': get_end_of_class_time(event_store['index']),
+        'utc_offset': utc_offset
+    }
+
+
+def get_chat_contributions_from_messages(chat_pids, chat_times, chat_texts, student_pids):
+    # the sender pid, time and text of every message sent after the start of the class day
+    chat_lengths = [len(chat_text) for chat_text in chat_texts]
 
     student_chat_messages = defaultdict(list)
-    for student_pid, chat_message in zip(chat_pids, chat_messages):
-        student_chat_messages[student_pid].append(chat_message)
+    for student_pid, chat_text in zip(chat_pids, chat_texts):
+        student_chat_messages[student_pid].append(chat_text)
     assign_zeroes_for_no_participation(student_pids, student_chat_messages)
 
     student_chat_times = defaultdict(list)
@@ -494,13 +1515,13 @@ def get_chat_contributions(index_stream, student_pids, recording_folder_file_pat
 
     student_chat_lengths = defaultdict(list)
     for student_pid, chat_length in zip(chat_pids, chat_lengths):
-        student_chat_messages[student_pid].append(chat_length)
+        student_chat_lengths[student_pid].append(chat_length)
     assign_zeroes_for_no_participation(student_pids, student_chat_lengths)
 
     student_message_count = Counter(chat_pids)
     assign_zeroes_for_no_participation(student_pids, student_message_count)
 
-    student_fraction_of_chats = {k: student_message_count[k] / len(chat_messages)
+    student_fraction_of_chats = {k: student_message_count[k] / len(chat_texts)
                                  for k in student_message_count}
 
     assign_zeroes_for_no_participation(student_pids, student_message_count)
@@ -513,56 +1534,214 @@ def get_chat_contributions(index_stream, student_pids, recording_folder_file_pat
     )
 
 
-def get_participation_grades(student_time_on_camera, student_minutes_on_microphone, student_message_count, instructor_name):
-    # get camera grade, decimal at end is made to avoid divide by zero errors
-    camera_times = copy(student_time_on_camera)
-    del (camera_times[instructor_name])
-    camera_time_mean = np.mean(list(camera_times.values()))
-    camera_time_stdev = np.std(list(camera_times.values())) + .00000001
-    # adjust scores so average participation is 100%
-    if camera_time_mean > 0:
-        camera_adjustment = 100 / camera_time_mean
-    else:
-        camera_adjustment = 100
-    student_camera_grades = {k: (((camera_times[k] - camera_time_mean) / camera_time_stdev) * camera_adjustment) + 100
-                             for k in camera_times}
-
-    # get microphone grade
-    mic_times = copy(student_minutes_on_microphone)
-    del (mic_times[instructor_name])
-    mic_time_mean = np.mean(list(mic_times.values()))
-    mic_time_stdev = np.std(list(mic_times.values())) + .00000001
-    # adjust scores so average participation is 100%
-    if mic_time_mean > 0:
-        mic_adjustment = 100 / (mic_time_mean)
-    else:
-        mic_adjustment = 100
-    student_mic_grades = {k: (((mic_times[k] - mic_time_mean) / mic_time_stdev) * mic_adjustment) + 100
-                          for k in mic_times}
-
-    # get chat grades
-    message_count = copy(student_message_count)
-    del (message_count[instructor_name])
-    messages_mean = np.mean(list(message_count.values()))
-    messages_stdev = np.std(list(message_count.values())) + .00000001
-    # adjust scores so average participation is 90%
-    if messages_mean > 0:
-        messages_adjustment = 100 / messages_mean
-    else:
-        messages_adjustment = 100
-    student_message_grades = {k: (((message_count[k] - messages_mean) / messages_stdev) * messages_adjustment) + 100
-                              for k in message_count}
+CHAT_ANALYTICS_HEADERS = [
+    "Participant",
+    "Chat Messages Sent",
+    "Characters",
+    "Mean Characters per Message",
+    "Words",
+    "Mean Words per Message",
+    "Instructor Messages Answered",
+    "Mean Seconds to Answer",
+    "Burstiness"
+]
 
-    # get total participation grade (average of cam,mic,and chat grades)
-    student_participation_grades = {
-        k: (student_message_grades[k] + student_camera_grades[k] + student_mic_grades[k]) / 3
-        for k in student_message_grades}
 
-    for k in student_participation_grades.keys():
-        if student_participation_grades[k] > 105:
-            student_participation_grades[k] = 105
+def get_chat_analytics(event_store, identities, session_header=None):
+    '''
+    what each participant wrote in the chat, from the messages sent after the
+    start of the class day: messages, characters and words (in total and per
+    message), how many instructor messages they answered and how many seconds
+    they took on average, and how bursty their messages were. the text of
+    each message is read once, in one pass, and the rest is worked out with
+    numpy on arrays with a value per message, so it stays quick with tens of
+    thousands of messages.
+
+    an answer is a participant's first message after an instructor message
+    and before the next one. burstiness is (sd - mean) / (sd + mean) of the
+    seconds between a participant's messages, -1 for evenly spaced messages,
+    about 0 for messages at random times and near 1 for messages sent in
+    bursts. participants who answered nothing have nan seconds to answer and
+    those with fewer than 3 messages have nan burstiness. returns the rows,
+    headers first, sorted like the report
+    '''
+    sent_after_start = get_chat_messages_sent_after_start(event_store, session_header)
+    chat_texts = event_store['chat_text']
+    message_count = len(sent_after_start)
+    characters = np.fromiter((len(chat_texts[message]) for message in sent_after_start.tolist()), dtype=np.int64,
+                             count=message_count)
+    words = np.fromiter((len(chat_texts[message].split()) for message in sent_after_start.tolist()), dtype=np.int64,
+                        count=message_count)
+
+    # messages are counted by participant, a participant who reconnected sent messages from several pids
+    participant_names = list(identities['participant_names'])
+    name_codes = {participant_name: code for code, participant_name in enumerate(participant_names)}
+    pid_name_codes = np.array([name_codes.get(identities['student_pids'].get(student_pid), -1)
+                               for student_pid in event_store['pids']], dtype=np.int64)
+    codes = pid_name_codes[event_store['chat_pid'][sent_after_start]]
+    is_known = codes >= 0
+    codes, chat_times = codes[is_known], event_store['chat_time'][sent_after_start][is_known]
+    characters, words = characters[is_known], words[is_known]
+    name_count = len(participant_names)
+
+    messages = np.bincount(codes, minlength=name_count)
+    total_characters = np.bincount(codes, characters, minlength=name_count)
+    total_words = np.bincount(codes, words, minlength=name_count)
+    mean_characters = np.divide(total_characters, messages, out=np.zeros(name_count), where=messages > 0)
+    mean_words = np.divide(total_words, messages, out=np.zeros(name_count), where=messages > 0)
+
+    # answers, each message is matched with the last instructor message before it
+    order = np.argsort(chat_times, kind='stable')
+    ordered_codes, ordered_times = codes[order], chat_times[order]
+    is_instructor = ordered_codes == name_codes.get(identities['instructor_name'], -1)
+    instructor_times = ordered_times[is_instructor]
+    previous_instructor_messages = np.searchsorted(instructor_times, ordered_times, side='left') - 1
+    is_reply = ~is_instructor & (previous_instructor_messages >= 0)
+    reply_codes, reply_times = ordered_codes[is_reply], ordered_times[is_reply]
+    previous_instructor_messages = previous_instructor_messages[is_reply]
+    # the messages are in time order, so the first of each participant and instructor message is the answer
+    first_replies = np.unique(reply_codes * max(len(instructor_times), 1) + previous_instructor_messages,
+                              return_index=True)[1]
+    answer_codes = reply_codes[first_replies]
+    answer_seconds = (reply_times[first_replies] - instructor_times[previous_instructor_messages[first_replies]]) / 1000
+    answers = np.bincount(answer_codes, minlength=name_count)
+    mean_answer_seconds = np.divide(np.bincount(answer_codes, answer_seconds, minlength=name_count), answers,
+                                    out=np.full(name_count, np.nan), where=answers > 0)
+
+    # burstiness, from the gaps between each participant's messages
+    order = np.lexsort((chat_times, codes))
+    ordered_codes, ordered_times = codes[order], chat_times[order]
+    is_gap = ordered_codes[1:] == ordered_codes[:-1]
+    gap_codes = ordered_codes[1:][is_gap]
+    gap_seconds = np.diff(ordered_times)[is_gap] / 1000
+    gaps = np.bincount(gap_codes, minlength=name_count)
+    gap_means = np.divide(np.bincount(gap_codes, gap_seconds, minlength=name_count), gaps,
+                          out=np.zeros(name_count), where=gaps > 0)
+    gap_variances = np.divide(np.bincount(gap_codes, gap_seconds ** 2, minlength=name_count), gaps,
+                              out=np.zeros(name_count), where=gaps > 0) - gap_means ** 2
+    gap_stdevs = np.sqrt(np.maximum(gap_variances, 0))
+    burstiness = np.divide(gap_stdevs - gap_means, gap_stdevs + gap_means, out=np.full(name_count, np.nan),
+                           where=(gaps >= 2) & (gap_stdevs + gap_means > 0))
+
+    results = []
+    for code, participant_name in enumerate(participant_names):
+        results.append([participant_name, int(messages[code]), int(total_characters[code]),
+                        float(mean_characters[code]), int(total_words[code]), float(mean_words[code]),
+                        int(answers[code]), float(mean_answer_seconds[code]), float(burstiness[code])])
 
-    return student_participation_grades
+    # sort orders by student name
+    results.sort()
+    results.sort(key=lambda n: n[0].split()[1] if len(n[0].split()) > 1 else n[0])
+    results.insert(0, CHAT_ANALYTICS_HEADERS)
+    return results
+
+
+GRADE_METRICS = ('camera', 'microphone', 'chat')
+GRADE_CAP = 105
+
+
+def get_zscore_scores(metrics):
+    '''
+    the scores the script has always given. each metric is how many standard
+    deviations a participant is from the class mean, times 100 / mean (100
+    when the mean is 0) so that an average participant gets 100. the
+    decimal added to the standard deviation avoids dividing by zero
+    '''
+    means = np.nanmean(metrics, axis=-1, keepdims=True)
+    stdevs = np.nanstd(metrics, axis=-1, keepdims=True) + .00000001
+    adjustments = np.where(means > 0, 100 / np.where(means > 0, means, 1), 100)
+    return (((metrics - means) / stdevs) * adjustments) + 100
+
+
+def get_percentile_scores(metrics):
+    '''
+    each metric is the percent of the rest of the class a participant did
+    better than, with ties counted as half. the ranks of every row are found
+    with one lexsort of all of the rows together
+    '''
+    rows = metrics.reshape(-1, metrics.shape[-1])
+    row_count, participant_count = rows.shape
+    row_codes = np.repeat(np.arange(row_count), participant_count)
+    values = rows.ravel()
+    # nan (a participant missing from a session) sorts after every number of its row
+    order = np.lexsort((values, row_codes))
+    sorted_rows, sorted_values = row_codes[order], values[order]
+    starts_run = np.ones(len(order), dtype=bool)
+    starts_run[1:] = (sorted_rows[1:] != sorted_rows[:-1]) | (sorted_values[1:] != sorted_values[:-1])
+    run_codes = np.cumsum(starts_run) - 1
+    run_starts = np.flatnonzero(starts_run)
+    run_lengths = np.diff(np.append(run_starts, len(order)))
+    row_starts = np.searchsorted(sorted_rows, np.arange(row_count))
+    below = run_starts[run_codes] - row_starts[sorted_rows]
+    ties = run_lengths[run_codes] - 1
+    others = np.count_nonzero(~np.isnan(rows), axis=1)[sorted_rows] - 1
+    sorted_scores = np.where(others > 0, 100 * (below + ties / 2) / np.maximum(others, 1), 100.0)
+    scores = np.empty(len(order))
+    scores[order] = np.where(np.isnan(sorted_values), np.nan, sorted_scores)
+    return scores.reshape(metrics.shape)
+
+
+def get_capped_linear_scores(metrics):
+    '''
+    each metric is 100 times a participant's share of the class mean (100 for
+    everyone when the mean is 0), capped at GRADE_CAP so that doing far more
+    of one thing can not make up for doing none of another
+    '''
+    means = np.nanmean(metrics, axis=-1, keepdims=True)
+    scores = np.where(means > 0, 100 * metrics / np.where(means > 0, means, 1), 100)
+    return np.minimum(scores, GRADE_CAP)
+
+
+# scores turns a metrics matrix into a score per metric, the grade is the weighted mean of the scores
+# (weights in GRADE_METRICS order) capped at cap. the weighted policy, which counts camera twice, is an example
+# to be tuned
+GRADING_POLICIES = {
+    'zscore': {'scores': get_zscore_scores, 'weights': (1, 1, 1), 'cap': GRADE_CAP},
+    'percentile': {'scores': get_percentile_scores, 'weights': (1, 1, 1), 'cap': None},
+    'capped_linear': {'scores': get_capped_linear_scores, 'weights': (1, 1, 1), 'cap': GRADE_CAP},
+    'weighted': {'scores': get_zscore_scores, 'weights': (2, 1, 1), 'cap': GRADE_CAP}
+}
+DEFAULT_GRADING_POLICY = 'zscore'
+
+
+def get_policy_grades(metrics, policies=(DEFAULT_GRADING_POLICY,)):
+    '''
+    metrics has a row per metric (in GRADE_METRICS order) and a column per
+    student, with any number of leading axes, for example (sessions,
+    metrics, students) for a whole term. a student missing from a session is
+    nan there and gets a nan grade. returns the grades of each policy (the
+    metrics axis taken out), and policies sharing a scores function share
+    the scores
+    '''
+    metrics = np.asarray(metrics, dtype=np.float64)
+    scores = {}
+    policy_grades = {}
+    for policy in policies:
+        if policy not in GRADING_POLICIES:
+            raise ValueError("unknown grading policy %s, use one of %s" % (policy, ", ".join(GRADING_POLICIES)))
+        scores_function = GRADING_POLICIES[policy]['scores']
+        if scores_function not in scores:
+            scores[scores_function] = scores_function(metrics)
+        weights = np.array(GRADING_POLICIES[policy]['weights'], dtype=np.float64)[:, None]
+        grades = (scores[scores_function] * weights).sum(axis=-2) / weights.sum()
+        if GRADING_POLICIES[policy]['cap'] is not None:
+            grades = np.minimum(grades, GRADING_POLICIES[policy]['cap'])
+        policy_grades[policy] = grades
+    return policy_grades
+
+
+def get_participation_grades(student_time_on_camera, student_minutes_on_microphone, student_message_count, instructor_name,
+                             policy=DEFAULT_GRADING_POLICY):
+    # the instructor is not graded, and is not part of the class means. a participant missing from one of the
+    # metrics (for example a name only the camera totals have) is graded with 0 of it
+    student_metrics = (student_time_on_camera, student_minutes_on_microphone, student_message_count)
+    student_names = [k for k in dict.fromkeys(k for metric in reversed(student_metrics) for k in metric)
+                     if k != instructor_name]
+    metrics = np.array([[metric.get(k, 0) for k in student_names] for metric in student_metrics], dtype=np.float64)
+    grades = get_policy_grades(metrics, (policy,))[policy]
+    # capped grades stay the whole number the reports have always shown
+    cap = GRADING_POLICIES[policy]['cap']
+    return {k: cap if cap is not None and grade >= cap else grade for k, grade in zip(student_names, grades.tolist())}
 
 
 def save_report_csv(results, report_file_path):
@@ -570,40 +1749,831 @@ def save_report_csv(results, report_file_path):
         writer = csv.writer(outfile)
         writer.writerows(results)
 
-def get_results_summary(recording_folder_file_path, report_folder_file_path):
-    index_stream = get_index_stream(recording_folder_file_path)
-    student_ids, student_pids = get_student_ids_and_pids(index_stream)
-    ftstage = get_ftstage(recording_folder_file_path)
-    instructor_id, instructor_name = get_instructor_id_and_instructor_name(index_stream, 
-                                                                           student_ids, 
-                                                                           student_pids)
-    participant_names = get_participant_names(student_ids)
-    
-    
+
+COLUMNAR_FORMATS = ('npz', 'parquet')
+
+
+def save_report_columns(results, report_file_path, columnar_format='npz'):
+    '''
+    saves the report with one array per column (named by its header) so it
+    can be loaded without parsing any text. npz only needs numpy, np.load
+    gives the columns back as arrays. parquet needs pyarrow and can be read
+    straight into pandas or arrow
+    '''
+    headers = results[0]
+    columns = {header: np.array([row[index] for row in results[1:]], dtype=str if index == 0 else None)
+               for index, header in enumerate(headers)}
+    if columnar_format == 'npz':
+        with open(report_file_path, 'wb') as outfile:
+            np.savez(outfile, **columns)
+    elif columnar_format == 'parquet':
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("the parquet format needs pyarrow to be installed")
+        pyarrow.parquet.write_table(pyarrow.table(columns), report_file_path)
+    else:
+        raise ValueError("%s is not a columnar format, use one of %s" % (columnar_format,
+                                                                         ", ".join(COLUMNAR_FORMATS)))
+
+
+def get_participation_timelines(event_store, student_ids, student_pids, mic_merge_gap=None, session_header=None):
+    '''
+    every interval behind the report totals, as arrays: the camera on and
+    paused intervals and the microphone bursts as (code, start, stop) in
+    milliseconds of recording time, and the chat messages sent after the
+    start of the class day as (code, time) in ftchat time (unix time * 1000).
+    camera, pause and microphone codes index 'ids' and 'id_names', chat codes
+    index 'pids' and 'pid_names'. 'end_of_class_time' is in recording time
+    and 'recording_start_time' is when the recording started in ftchat time,
+    both from the session header (see get_session_header)
+    '''
+    if session_header is None:
+        session_header = get_session_header(event_store)
+    camera_intervals, pause_intervals, camera_codes, camera_and_pause_codes = get_camera_intervals_vectorized(
+        event_store)
+    timelines = {
+        'ids': np.array(event_store['ids'], dtype=str),
+        'id_names': np.array([student_ids.get(student_id, '') for student_id in event_store['ids']], dtype=str),
+        'pids': np.array(event_store['pids'], dtype=str),
+        'pid_names': np.array([student_pids.get(student_pid, '') for student_pid in event_store['pids']], dtype=str)
+    }
+    for name, intervals in (('camera', camera_intervals), ('pause', pause_intervals),
+                            ('mic', get_microphone_bursts_vectorized(event_store, mic_merge_gap))):
+        timelines[name + '_code'], timelines[name + '_start'], timelines[name + '_stop'] = intervals
+    sent_after_start = get_chat_messages_sent_after_start(event_store, session_header)
+    timelines['chat_code'] = event_store['chat_pid'][sent_after_start]
+    timelines['chat_time'] = event_store['chat_time'][sent_after_start]
+    timelines['end_of_class_time'] = np.array(session_header['end_of_class_time'])
+    timelines['recording_start_time'] = np.array(session_header['recording_start_time'])
+    return timelines
+
+
+def get_binned_milliseconds(codes, start_times, stop_times, row_count, bin_count, bin_milliseconds):
+    '''
+    spreads (code, start, stop) intervals over a row_count by bin_count
+    matrix of how many milliseconds of each bin each code's intervals cover.
+    an interval adds its part of its first and last bins to them, and the
+    whole bins between are added as a step up at the bin after its first and
+    a step down at its last, which a cumulative sum along each row fills in,
+    so no interval is looped over bin by bin
+    '''
+    start_times = np.clip(start_times, 0, bin_count * bin_milliseconds)
+    stop_times = np.clip(stop_times, 0, bin_count * bin_milliseconds)
+    has_time = stop_times > start_times
+    codes, start_times, stop_times = codes[has_time], start_times[has_time], stop_times[has_time]
+    first_bins = start_times // bin_milliseconds
+    last_bins = (stop_times - 1) // bin_milliseconds
+    within_one_bin = first_bins == last_bins
+
+    # the steps are one column wider so a step down after the last bin has somewhere to go
+    step_size = row_count * (bin_count + 1)
+    row_starts = codes[~within_one_bin] * (bin_count + 1)
+    steps = (np.bincount(row_starts + first_bins[~within_one_bin] + 1, minlength=step_size) -
+             np.bincount(row_starts + last_bins[~within_one_bin], minlength=step_size)) * bin_milliseconds
+    binned_milliseconds = np.cumsum(steps.reshape(row_count, bin_count + 1), axis=1)[:, :bin_count].astype(float)
+
+    first_bin_milliseconds = np.where(within_one_bin, stop_times, (first_bins + 1) * bin_milliseconds) - start_times
+    last_bin_milliseconds = np.where(within_one_bin, 0, stop_times - last_bins * bin_milliseconds)
+    binned_milliseconds += np.bincount(np.concatenate([codes * bin_count + first_bins, codes * bin_count + last_bins]),
+                                       weights=np.concatenate([first_bin_milliseconds, last_bin_milliseconds]),
+                                       minlength=row_count * bin_count).reshape(row_count, bin_count)
+    return binned_milliseconds
+
+
+def get_binned_timelines(timelines, bin_seconds=60):
+    '''
+    per participant activity in bins of bin_seconds from the start of the
+    recording to the end of class, from get_participation_timelines. ids
+    and pids with the same name share a row, rows are in name order.
+    'camera_seconds' is camera on minus camera paused (like the report's
+    minutes on camera, so a row adds up to them), and 'paused_seconds',
+    'mic_seconds' and 'chat_count' are the other matrices. chat messages
+    sent before the recording started are not in any bin
+    '''
+    bin_milliseconds = int(bin_seconds * 1000)
+    end_of_class_time = int(timelines['end_of_class_time'])
+    bin_count = max(-(-end_of_class_time // bin_milliseconds), 1)
+
+    # a row for each name, with the row of every id and pid
+    participants, rows = np.unique(np.concatenate([timelines['id_names'], timelines['pid_names']]),
+                                   return_inverse=True)
+    id_rows, pid_rows = rows[:len(timelines['id_names'])], rows[len(timelines['id_names']):]
+    row_count = len(participants)
+
+    def get_binned_seconds(name):
+        return get_binned_milliseconds(id_rows[timelines[name + '_code']], timelines[name + '_start'],
+                                       timelines[name + '_stop'], row_count, bin_count, bin_milliseconds) / 1000
+
+    paused_seconds = get_binned_seconds('pause')
+    chat_times = timelines['chat_time'] - timelines['recording_start_time']
+    in_recording = (chat_times >= 0) & (chat_times < bin_count * bin_milliseconds)
+    chat_bins = pid_rows[timelines['chat_code'][in_recording]] * bin_count + (
+        chat_times[in_recording] // bin_milliseconds).astype(np.int64)
+    binned_timelines = {
+        'participants': participants,
+        'bin_start_seconds': np.arange(bin_count) * bin_seconds,
+        'camera_seconds': get_binned_seconds('camera') - paused_seconds,
+        'paused_seconds': paused_seconds,
+        'mic_seconds': get_binned_seconds('mic'),
+        'chat_count': np.bincount(chat_bins, minlength=row_count * bin_count).reshape(row_count, bin_count)
+    }
+    # ids that were never added to the class have no name and no row
+    named = participants != ''
+    for key in ('participants', 'camera_seconds', 'paused_seconds', 'mic_seconds', 'chat_count'):
+        binned_timelines[key] = binned_timelines[key][named]
+    return binned_timelines
+
+
+def save_participation_timelines(timelines, timelines_file_path):
+    # not compressed, so loading the arrays is only reading them
+    with open(timelines_file_path, 'wb') as outfile:
+        np.savez(outfile, **timelines)
+
+'''
+the camera, microphone and chat calculations all read from one event store
+rather than from lists of event tuples. every id and pid is given a small
+number (its code, the index of the id in 'ids') the first time it is seen,
+and the camera, pause and microphone events are kept in numpy arrays of
+event type codes (see EVENT_STORE_TYPES), id codes, int64 times and bool
+values, in the order they appear in the recording (indexstream.xml events
+before ftstage events). chat messages are kept the same way, with their
+texts in a list. an event then takes 14 bytes instead of a tuple, an int and
+a string of its own. the few events there is one of per participant or per
+session (userAdded, myID, startDate and __stop__) stay as tuples in
+event_store['index'], so get_student_ids_and_pids and the functions like it
+take event_store['index'] the way they took the index events
+'''
+EVENT_STORE_TYPES = ('streamAdded', 'streamRemoved', 'userDeleted', 'userVoipStatusChanged', 'updateVideoPauseStatus',
+                     'removeVideo')
+EVENT_STORE_TYPE_CODES = {event_type: code for code, event_type in enumerate(EVENT_STORE_TYPES)}
+EVENT_STORE_INDEX_TYPES = ('startDate', 'myID', 'userAdded', '__stop__')
+
+
+def get_empty_event_store():
+    # typed arrays that grow as events are read, get_finished_event_store turns them into numpy arrays
+    return {
+        'index': {event_type: [] for event_type in EVENT_STORE_INDEX_TYPES},
+        'ids': [],
+        'id_codes': {},
+        'type': array('b'),
+        'id': array('i'),
+        'time': array('q'),
+        'value': array('b'),
+        'pids': [],
+        'pid_codes': {},
+        'chat_pid': array('i'),
+        'chat_time': array('d'),
+        'chat_text': []
+    }
+
+
+def get_code(codes, values, value):
+    # the code of value, giving it the next code if it has not been seen before
+    code = codes.get(value)
+    if code is None:
+        code = codes[value] = len(values)
+        values.append(value)
+    return code
+
+
+def add_to_event_store(event_store, event):
+    if type(event) is ChatMessage:
+        event_store['chat_pid'].append(get_code(event_store['pid_codes'], event_store['pids'], event.pid))
+        event_store['chat_time'].append(event.time)
+        event_store['chat_text'].append(event.text)
+    elif event.type in EVENT_STORE_TYPE_CODES:
+        event_store['type'].append(EVENT_STORE_TYPE_CODES[event.type])
+        event_store['id'].append(get_code(event_store['id_codes'], event_store['ids'], event.id))
+        event_store['time'].append(event.time)
+        event_store['value'].append(bool(event.value))
+    else:
+        event_store['index'][event.type].append(event)
+
+
+def add_index_stream_to_event_store(event_store, recording_folder_file_path, parser=DEFAULT_XML_PARSER):
+    if parser == 'beautifulsoup':
+        index_events = get_index_stream_events(recording_folder_file_path, parser)
+        events = (event for events in index_events.values() for event in events)
+    else:
+        events = iter_index_stream_events(recording_folder_file_path, parser)
+    for event in events:
+        add_to_event_store(event_store, event)
+
+
+def add_ftstage_to_event_store(event_store, recording_folder_file_path, parser=DEFAULT_XML_PARSER):
+    if parser == 'beautifulsoup':
+        ftstage_events = get_ftstage_events(recording_folder_file_path, parser)
+        events = (event for events in ftstage_events.values() for event in events)
+    else:
+        events = iter_ftstage_events(recording_folder_file_path, parser)
+    for event in events:
+        add_to_event_store(event_store, event)
+
+
+def add_chat_to_event_store(event_store, recording_folder_file_path, parser=DEFAULT_XML_PARSER, chat_workers=None):
+    for chat_message in get_chat_messages(recording_folder_file_path, parser, chat_workers):
+        add_to_event_store(event_store, chat_message)
+
+
+def get_finished_event_store(event_store):
+    event_store['type'] = np.array(event_store['type'], dtype=np.int8)
+    event_store['id'] = np.array(event_store['id'], dtype=np.int32)
+    event_store['time'] = np.array(event_store['time'], dtype=np.int64)
+    event_store['value'] = np.array(event_store['value'], dtype=bool)
+    event_store['chat_pid'] = np.array(event_store['chat_pid'], dtype=np.int32)
+    event_store['chat_time'] = np.array(event_store['chat_time'], dtype=np.float64)
+    return event_store
+
+
+def run_stage_graph(stages, executor, profile=None):
+    '''
+    stages maps each stage name to (function, names of the stages it needs).
+    a stage is started on executor as soon as every stage it needs has
+    finished, and is given their results in that order. returns the result
+    of every stage by name. stages running at the same time can not be
+    profiled one by one, so with a profile (see start_profile) only the wall
+    time of each stage, from when it was started to when it finished, and
+    how long after the first stage it was started are kept. with no executor
+    the stages are run one after another, in the order they are given in
+    once they can be, and profiled in full
+    '''
+    results = {}
+    if executor is None:
+        waiting_stages = dict(stages)
+        while waiting_stages:
+            stage, (function, needed_stages) = next(
+                ((stage, waiting_stage) for stage, waiting_stage in waiting_stages.items()
+                 if all(needed_stage in results for needed_stage in waiting_stage[1])),
+                (None, (None, None)))
+            if stage is None:
+                raise ValueError("stages %s need stages that are not in the graph" % ", ".join(waiting_stages))
+            results[stage] = get_profiled_result(profile, stage, function,
+                                                 *[results[needed_stage] for needed_stage in needed_stages])
+            del waiting_stages[stage]
+        return results
+
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    waiting_stages = dict(stages)
+    running_stages = {}
+    start_times = {}
+    graph_start_time = time.perf_counter()
+    while waiting_stages or running_stages:
+        for stage, (function, needed_stages) in list(waiting_stages.items()):
+            if all(needed_stage in results for needed_stage in needed_stages):
+                start_times[stage] = time.perf_counter()
+                running_stages[executor.submit(function, *[results[needed_stage] for needed_stage in
+                                                            needed_stages])] = stage
+                del waiting_stages[stage]
+        if not running_stages:
+            raise ValueError("stages %s need stages that are not in the graph" % ", ".join(waiting_stages))
+        finished_stages = wait(running_stages, return_when=FIRST_COMPLETED)[0]
+        for future in finished_stages:
+            stage = running_stages.pop(future)
+            results[stage] = future.result()
+            if profile is not None:
+                profile['stages'][stage] = {
+                    'wall_seconds': round(time.perf_counter() - start_times[stage], 4),
+                    'started_after_seconds': round(start_times[stage] - graph_start_time, 4),
+                    'cpu_seconds': None,
+                    'peak_memory_mb': None,
+                    'events': None
+                }
+    return results
+
+
+def get_file_event_store(add_file_to_event_store, recording_folder_file_path, parser=DEFAULT_XML_PARSER):
+    # an event store of one of the recording's files, add_file_to_event_store is one of the add_..._to_event_store
+    event_store = get_empty_event_store()
+    add_file_to_event_store(event_store, recording_folder_file_path, parser)
+    return get_finished_event_store(event_store)
+
+
+def add_file_event_store(event_store, file_event_store):
+    '''
+    adds the events of a finished event store of one file onto the end of a
+    finished event store. the ids and pids are given codes in the order they
+    were first seen in the file, so adding the files one after another gives
+    the same codes as reading them one after another
+    '''
+    id_codes = np.array([get_code(event_store['id_codes'], event_store['ids'], student_id)
+                         for student_id in file_event_store['ids']], dtype=np.int32)
+    pid_codes = np.array([get_code(event_store['pid_codes'], event_store['pids'], student_pid)
+                          for student_pid in file_event_store['pids']], dtype=np.int32)
+    for event_type, events in file_event_store['index'].items():
+        event_store['index'][event_type].extend(events)
+    for column in ('type', 'time', 'value', 'chat_time'):
+        event_store[column] = np.concatenate([event_store[column], file_event_store[column]])
+    event_store['id'] = np.concatenate([event_store['id'], id_codes[file_event_store['id']]])
+    event_store['chat_pid'] = np.concatenate([event_store['chat_pid'], pid_codes[file_event_store['chat_pid']]])
+    event_store['chat_text'].extend(file_event_store['chat_text'])
+    return event_store
+
+
+def get_chat_file_event_store(ftchat_file_path, parser=DEFAULT_XML_PARSER):
+    event_store = get_empty_event_store()
+    for chat_message in get_chat_messages_from_file(ftchat_file_path, parser):
+        add_to_event_store(event_store, chat_message)
+    return get_finished_event_store(event_store)
+
+
+def get_event_store_concurrently(recording_folder_file_path, parser=DEFAULT_XML_PARSER, executor=None):
+    '''
+    the same event store as get_event_store, with indexstream.xml, the
+    ftstage file and each ftchat file read at the same time, one file per
+    process of executor (a process pool, parsing holds the gil so threads
+    would take turns). each process sends back the small numpy event store
+    of its file and they are added together in the order get_event_store
+    reads them
+    '''
+    read_stages = {
+        'read_indexstream': (partial(get_file_event_store, add_index_stream_to_event_store,
+                                     recording_folder_file_path, parser), []),
+        'read_ftstage': (partial(get_file_event_store, add_ftstage_to_event_store,
+                                 recording_folder_file_path, parser), [])
+    }
+    ftchat_file_paths = sorted(get_recording_file_names(recording_folder_file_path, "ftchat*.xml"))
+    for file_number, ftchat_file_path in enumerate(ftchat_file_paths):
+        read_stages['read_ftchat_%d' % file_number] = (partial(get_chat_file_event_store, ftchat_file_path,
+                                                               parser), [])
+    file_event_stores = run_stage_graph(read_stages, executor)
+
+    event_store = file_event_stores['read_indexstream']
+    add_file_event_store(event_store, file_event_stores['read_ftstage'])
+    for file_number in range(len(ftchat_file_paths)):
+        add_file_event_store(event_store, file_event_stores['read_ftchat_%d' % file_number])
+    return event_store
+
+
+def get_event_store(recording_folder_file_path, parser=DEFAULT_XML_PARSER, chat_workers=None, read_executor=None):
+    '''
+    reads every file of the recording straight into an event store, the
+    events are never all held as tuples. parser is one of XML_PARSERS and
+    chat_workers is passed on to get_chat_messages. with a process pool as
+    read_executor the files are read at the same time instead, see
+    get_event_store_concurrently
+    '''
+    if read_executor is not None:
+        return get_event_store_concurrently(recording_folder_file_path, parser, read_executor)
+    event_store = get_empty_event_store()
+    add_index_stream_to_event_store(event_store, recording_folder_file_path, parser)
+    add_ftstage_to_event_store(event_store, recording_folder_file_path, parser)
+    add_chat_to_event_store(event_store, recording_folder_file_path, parser, chat_workers)
+    return get_finished_event_store(event_store)
+
+
+def get_event_columns(event_store, *event_types):
+    '''
+    the id codes, times and values of the events of the given types, all of
+    the events of the first type (in recording order) and then the next
+    '''
+    type_codes = event_store['type']
+    indexes = np.concatenate([np.flatnonzero(type_codes == EVENT_STORE_TYPE_CODES[event_type])
+                              for event_type in event_types])
+    return event_store['id'][indexes].astype(np.int64), event_store['time'][indexes], event_store['value'][indexes]
+
+
+def get_event_count(event_store, *event_types):
+    return int(np.isin(event_store['type'], [EVENT_STORE_TYPE_CODES[event_type] for event_type in event_types]).sum())
+
+
+def get_recording_events_from_event_store(event_store):
+    '''
+    the events of the store as the named tuples get_index_stream_events,
+    get_ftstage_events and get_chat_messages read, for the loop versions of
+    the calculations that are kept as references
+    '''
+    index_events = get_empty_index_stream_events()
+    for event_type, events in event_store['index'].items():
+        index_events[event_type].extend(events)
+    ftstage_events = {'updateVideoPauseStatus': [], 'removeVideo': []}
+    ids = event_store['ids']
+    for type_code, id_code, event_time, value in zip(event_store['type'].tolist(), event_store['id'].tolist(),
+                                                     event_store['time'].tolist(), event_store['value'].tolist()):
+        event_type = EVENT_STORE_TYPES[type_code]
+        # only the microphone and pause events have a value, the rest have None like the readers give
+        if event_type not in ('userVoipStatusChanged', 'updateVideoPauseStatus'):
+            value = None
+        if event_type in ftstage_events:
+            ftstage_events[event_type].append(FtstageEvent(event_type, ids[id_code], event_time, value))
+        else:
+            index_events[event_type].append(IndexStreamEvent(event_type, ids[id_code], None, event_time, value))
+
+    pids = event_store['pids']
+    chat_messages = [ChatMessage(pids[pid_code], chat_time, chat_text) for pid_code, chat_time, chat_text
+                     in zip(event_store['chat_pid'].tolist(), event_store['chat_time'].tolist(),
+                            event_store['chat_text'])]
+    return {'index': index_events, 'ftstage': ftstage_events, 'chat': {'chatMessage': chat_messages}}
+
+
+'''
+parsing the xml files is by far the slowest part of making a report, so the
+event store of a recording is saved in a compressed .npz file in a cache
+folder and reused as long as the recording files have not changed. the cache
+is trimmed to RECORDING_CACHE_SIZE_LIMIT bytes by removing the least recently
+used recordings first. only files named like a cache entry (events_ and the
+recording's key) are counted and removed, the cache folder can be a report
+folder with other .npz files in it. RECORDING_CACHE_VERSION must be changed
+whenever the events that are read from the recording, or how they are
+stored, change
+'''
+RECORDING_CACHE_VERSION = 2
+RECORDING_CACHE_SIZE_LIMIT = 500 * 1024 * 1024
+RECORDING_CACHE_FILE_PREFIX = "events_"
+RECORDING_CACHE_FILE_PATTERN = re.compile(re.escape(RECORDING_CACHE_FILE_PREFIX) + r"[0-9a-f]{64}\.npz")
+
+
+def get_recording_file_paths(recording_folder_file_path):
+    return sorted(
+        [recording_folder_file_path + "indexstream.xml"] +
+        get_recording_file_names(recording_folder_file_path, "ftstage*.xml") +
+        get_recording_file_names(recording_folder_file_path, "ftchat*.xml")
+    )
+
+
+def get_recording_cache_key(recording_folder_file_path, cache_folder_path):
+    '''
+    the key is a hash of the contents of the recording files. hashing a long
+    recording takes a while, so the size and modification time of each file
+    are kept in cache_index.json and the hash is only worked out again when
+    one of them changes
+    '''
+    file_paths = get_recording_file_paths(recording_folder_file_path)
+    file_signatures = []
+    for file_path in file_paths:
+        file_signatures.append(get_recording_file_signature(file_path))
+
+    cache_index_path = cache_folder_path + "cache_index.json"
+    cache_index = {}
+    if os.path.exists(cache_index_path):
+        with open(cache_index_path) as infile:
+            cache_index = json.load(infile)
+    recording_path = os.path.abspath(recording_folder_file_path)
+    if (recording_path in cache_index and cache_index[recording_path]['files'] == file_signatures and
+            cache_index[recording_path].get('version') == RECORDING_CACHE_VERSION):
+        return cache_index[recording_path]['key']
+
+    content_hash = hashlib.sha256(str(RECORDING_CACHE_VERSION).encode())
+    for file_path in file_paths:
+        content_hash.update(os.path.basename(file_path).encode())
+        with open_recording_file(file_path) as infile:
+            for chunk in iter(lambda: infile.read(1024 * 1024), b''):
+                content_hash.update(chunk)
+    cache_key = content_hash.hexdigest()
+
+    cache_index[recording_path] = {'files': file_signatures, 'key': cache_key, 'version': RECORDING_CACHE_VERSION}
+    temporary_path = cache_index_path + ".%d.tmp" % os.getpid()
+    with open(temporary_path, "w") as outfile:
+        json.dump(cache_index, outfile)
+    os.replace(temporary_path, cache_index_path)
+    return cache_key
+
+
+def save_event_store(event_store, cache_file_path):
+    '''
+    the arrays of the event store are saved as they are. each field of the
+    event_store['index'] events is saved as one array, fields that are not
+    used by an event type (all None) are left out, and the chat texts are
+    saved as one utf-8 string and where each text ends in it
+    '''
+    columns = {column: event_store[column] for column in ('type', 'id', 'time', 'value', 'chat_pid', 'chat_time')}
+    columns['ids'] = np.array(event_store['ids'], dtype=str)
+    columns['pids'] = np.array(event_store['pids'], dtype=str)
+    chat_texts = [chat_text.encode('utf-8') for chat_text in event_store['chat_text']]
+    columns['chat_text'] = np.frombuffer(b''.join(chat_texts), dtype=np.uint8)
+    columns['chat_text_ends'] = np.cumsum([len(chat_text) for chat_text in chat_texts], dtype=np.int64)
+
+    for event_type, events in event_store['index'].items():
+        prefix = 'index.' + event_type
+        columns[prefix + '.count'] = np.array(len(events))
+        for field in IndexStreamEvent._fields:
+            values = [getattr(event, field) for event in events]
+            if any(value is not None for value in values):
+                columns[prefix + '.' + field] = np.array(values)
+
+    # write to a temporary file first so a half written file is never read
+    temporary_path = cache_file_path + ".%d.tmp" % os.getpid()
+    with open(temporary_path, 'wb') as outfile:
+        np.savez_compressed(outfile, **columns)
+    os.replace(temporary_path, cache_file_path)
+
+
+def load_event_store(cache_file_path):
+    event_store = get_empty_event_store()
+    with np.load(cache_file_path) as columns:
+        for column in ('type', 'id', 'time', 'value', 'chat_pid', 'chat_time'):
+            event_store[column] = columns[column]
+        event_store['ids'] = columns['ids'].tolist()
+        event_store['pids'] = columns['pids'].tolist()
+        event_store['id_codes'] = {student_id: code for code, student_id in enumerate(event_store['ids'])}
+        event_store['pid_codes'] = {student_pid: code for code, student_pid in enumerate(event_store['pids'])}
+        chat_text = columns['chat_text'].tobytes()
+        chat_text_starts = [0] + columns['chat_text_ends'].tolist()
+        event_store['chat_text'] = [chat_text[start:end].decode('utf-8')
+                                    for start, end in zip(chat_text_starts, chat_text_starts[1:])]
+
+        for event_type in EVENT_STORE_INDEX_TYPES:
+            prefix = 'index.' + event_type
+            count = int(columns[prefix + '.count'])
+            fields = []
+            for field in IndexStreamEvent._fields:
+                if prefix + '.' + field in columns.files:
+                    fields.append(columns[prefix + '.' + field].tolist())
+                else:
+                    fields.append([None] * count)
+            event_store['index'][event_type] = [IndexStreamEvent(*values) for values in zip(*fields)]
+    return event_store
+
+
+def evict_from_recording_cache(cache_folder_path, cache_size_limit):
+    # keep the most recently used recordings that fit in the size limit
+    cache_files = []
+    for file_name in os.listdir(cache_folder_path):
+        if not RECORDING_CACHE_FILE_PATTERN.fullmatch(file_name):
+            continue
+        cache_file_path = cache_folder_path + file_name
+        try:
+            file_stat = os.stat(cache_file_path)
+        except FileNotFoundError:
+            # another run evicted it first
+            continue
+        cache_files.append((file_stat.st_mtime, file_stat.st_size, cache_file_path))
+    cache_files.sort(reverse=True)
+
+    cache_size = 0
+    for last_used, file_size, cache_file_path in cache_files:
+        cache_size += file_size
+        if cache_size > cache_size_limit:
+            try:
+                os.remove(cache_file_path)
+            except FileNotFoundError:
+                pass
+
+
+def get_cached_event_store(recording_folder_file_path, cache_folder_path,
+                                cache_size_limit=RECORDING_CACHE_SIZE_LIMIT, parser=DEFAULT_XML_PARSER,
+                                chat_workers=None, read_executor=None):
+    os.makedirs(cache_folder_path, exist_ok=True)
+    cache_key = get_recording_cache_key(recording_folder_file_path, cache_folder_path)
+    cache_file_path = cache_folder_path + RECORDING_CACHE_FILE_PREFIX + cache_key + ".npz"
+    if os.path.exists(cache_file_path):
+        try:
+            event_store = load_event_store(cache_file_path)
+            # touch the file so it counts as recently used when evicting
+            os.utime(cache_file_path)
+            return event_store
+        except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+            # another run evicted it while it was being read, or it is cut short or corrupt, parse the recording
+            # again (which also saves it again)
+            pass
+
+    event_store = get_event_store(recording_folder_file_path, parser, chat_workers, read_executor)
+    save_event_store(event_store, cache_file_path)
+    evict_from_recording_cache(cache_folder_path, cache_size_limit)
+    return event_store
+
+'''
+with profile=True get_results_summary and get_summary_plots time each of
+their stages and save the wall time, cpu time, peak memory and number of
+events of each one to participation_profile.json in the report folder.
+memory is measured with tracemalloc, which makes the run itself slower, so
+profiles are only comparable with other profiles. the cpu time and memory of
+the processes reading ftchat files (see get_chat_messages) are not included
+'''
+PROFILE_FILE_NAME = "participation_profile.json"
+
+
+def start_profile(recording_folder_file_path, **settings):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return {
+        'recording': recording_folder_file_path,
+        'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'python': platform.python_version(),
+        'settings': settings,
+        'stages': {}
+    }
+
+
+def get_profiled_result(profile, stage, function, *args, **kwargs):
+    '''
+    returns function(*args, **kwargs). if profile is not None (see
+    start_profile) what the call cost is added to its stages
+    '''
+    if profile is None:
+        return function(*args, **kwargs)
+
+    tracemalloc.reset_peak()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    start_time, start_cpu_time = time.perf_counter(), time.process_time()
+    try:
+        result = function(*args, **kwargs)
+    except BaseException:
+        # the profile will never be saved, so nothing else will stop tracing
+        tracemalloc.stop()
+        raise
+    profile['stages'][stage] = {
+        'wall_seconds': round(time.perf_counter() - start_time, 4),
+        'cpu_seconds': round(time.process_time() - start_cpu_time, 4),
+        'peak_memory_mb': round((tracemalloc.get_traced_memory()[1] - memory_before) / 1024 / 1024, 2),
+        'events': None
+    }
+    return result
+
+
+def set_profile_event_count(profile, stage, count):
+    if profile is not None:
+        profile['stages'][stage]['events'] = count
+
+
+def save_profile(profile, report_folder_file_path, add_to_saved_profile=False):
+    '''
+    add_to_saved_profile adds the stages to the profile already saved in the
+    report folder (get_summary_plots uses it to go with the stages of
+    get_results_summary), otherwise the saved profile is replaced
+    '''
+    tracemalloc.stop()
+    profile_file_path = report_folder_file_path + PROFILE_FILE_NAME
+    if add_to_saved_profile and os.path.exists(profile_file_path):
+        with open(profile_file_path) as infile:
+            saved_profile = json.load(infile)
+        saved_profile['stages'].update(profile['stages'])
+        profile = saved_profile
+    with open(profile_file_path, "w") as outfile:
+        json.dump(profile, outfile, indent=2)
+
+
+def get_results_table(class_data):
+    '''
+    class_data is a list of the results by name in the order of the report
+    columns, starting with the participant names. returns the rows of the
+    report (headers first, then participants sorted by last name) and the
+    headers
+    '''
+    participant_names = class_data[0]
+    results = defaultdict(list)
+    for k in participant_names.keys():
+        for item in class_data:
+            results[k].append(item.get(k, 0))
+
+    # convert results to list for sorting
+    results = list(results.values())
+
+    # sort orders by student name
+    results.sort()
+    results.sort(key=lambda n: n[0].split()[1] if len(n[0].split()) > 1 else n[0])
+
+    # make headers for results.csv file
+    headers = [
+        "Participant",
+        "Participation Grades",
+        "Minutes on Camera",
+        "Minutes with Camera Paused",
+        "Fraction of Class Time on Camera",
+        "Fraction of Instructor Time on Camera",
+        "Minutes on Microphone",
+        "Fraction of Class Time on Microphone",
+        "Fraction of Instructor Time on Microphone",
+        "Chat Messages Sent",
+        "Fraction of Messages Sent"
+    ]
+
+    # add headers to results list
+    results.insert(0, headers)
+
+    return results, headers
+
+
+def get_metric_stages(event_store, roster_file_path=None, mic_merge_gap=None,
+                      source_timezone=DEFAULT_SOURCE_TIMEZONE, target_timezone=None, vectorized=True):
+    '''
+    the stages of get_results_summary after the recording has been read, as
+    a graph for run_stage_graph. camera, microphone and chat only need the
+    event store and the identities (and chat the session header), so they
+    can run at the same time, and the grades need all three. vectorized is
+    passed on to the camera and microphone calculations
+    '''
+    return {
+        'identities': (partial(get_identity_index, event_store['index'], roster_file_path), []),
+        'session_header': (partial(get_session_header, event_store, source_timezone, target_timezone), []),
+        'camera': (lambda identities: get_camera_contributions(event_store, identities['student_ids'],
+                                                               identities['instructor_id'], vectorized),
+                   ['identities']),
+        'microphone': (lambda identities: get_microphone_contributions(event_store, identities['student_ids'],
+                                                                       identities['instructor_id'], vectorized,
+                                                                       mic_merge_gap), ['identities']),
+        'chat': (lambda identities, session_header: get_chat_contributions(event_store, identities['student_pids'],
+                                                                           session_header),
+                 ['identities', 'session_header']),
+        'grades': (lambda identities, camera, microphone, chat: get_participation_grades(
+            camera[0], microphone[0], chat[2], identities['instructor_name']),
+                   ['identities', 'camera', 'microphone', 'chat'])
+    }
+
+
+def get_results_summary(recording_folder_file_path, report_folder_file_path, use_cache=True,
+                        cache_folder_path=None, cache_size_limit=RECORDING_CACHE_SIZE_LIMIT, mic_merge_gap=None,
+                        parser=DEFAULT_XML_PARSER, chat_workers=None, profile=False, columnar_format=None,
+                        timelines=False, timeline_bin_seconds=None, roster_file_path=None, chat_analytics=False,
+                        source_timezone=DEFAULT_SOURCE_TIMEZONE, target_timezone=None, concurrent=False,
+                        vectorized=True):
+    '''
+    by default the event store read from the recording is cached in a
+    participation_cache folder inside the report folder, cache_folder_path can
+    point somewhere else (for example a cache shared by several report
+    folders) and use_cache=False always parses the recording. mic_merge_gap
+    joins microphone bursts less than that many milliseconds apart, see
+    get_microphone_milliseconds_vectorized. parser is one of XML_PARSERS and
+    chat_workers is the number of processes reading ftchat files, see
+    get_chat_messages. profile=True saves the cost of each stage next to the
+    report, see PROFILE_FILE_NAME. columnar_format (one of COLUMNAR_FORMATS)
+    also saves the report as columns, see save_report_columns, and
+    timelines=True saves participation_timelines.npz, see
+    get_participation_timelines. timeline_bin_seconds saves
+    participation_timeline_bins.npz with the activity of each participant
+    in bins that long, see get_binned_timelines. roster_file_path names the
+    students as in a roster and gives absent students a row of zeroes, see
+    get_identity_index. chat_analytics=True saves
+    participation_chat_analytics.csv, see get_chat_analytics.
+    source_timezone is the timezone of the start date in indexstream.xml and
+    target_timezone the one whose midnight starts the class day for the chat
+    messages, see get_session_header. concurrent=True reads the recording
+    files at the same time in a pool of processes (see
+    get_event_store_concurrently) and runs camera, microphone and chat at
+    the same time in a pool of threads (see get_metric_stages), so a session
+    takes about as long as its slowest file and metric rather than all of
+    them added up. vectorized=False works camera and microphone out with the
+    loops the script started with, which are kept as the reference the
+    numpy versions are checked against
+    '''
+    if profile:
+        profile = start_profile(recording_folder_file_path, use_cache=use_cache, parser=parser,
+                                chat_workers=chat_workers, mic_merge_gap=mic_merge_gap, concurrent=concurrent,
+                                vectorized=vectorized)
+        start_time, start_cpu_time = time.perf_counter(), time.process_time()
+    else:
+        profile = None
+
+    read_executor = metric_executor = None
+    if concurrent:
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        # the processes are only started if the recording is not in the cache
+        read_executor = ProcessPoolExecutor()
+        metric_executor = ThreadPoolExecutor(max_workers=3)
+    try:
+        if use_cache:
+            if cache_folder_path is None:
+                cache_folder_path = report_folder_file_path + "participation_cache/"
+            event_store = get_profiled_result(profile, 'read_recording', get_cached_event_store,
+                                              recording_folder_file_path, cache_folder_path,
+                                              cache_size_limit, parser, chat_workers, read_executor)
+        else:
+            event_store = get_profiled_result(profile, 'read_recording', get_event_store,
+                                              recording_folder_file_path, parser, chat_workers, read_executor)
+        index_events = event_store['index']
+        set_profile_event_count(profile, 'read_recording',
+                                len(event_store['type']) + len(event_store['chat_time']) +
+                                sum(len(events) for events in index_events.values()))
+
+        metric_results = run_stage_graph(get_metric_stages(event_store, roster_file_path, mic_merge_gap,
+                                                           source_timezone, target_timezone, vectorized),
+                                         metric_executor, profile)
+    finally:
+        if concurrent:
+            read_executor.shutdown()
+            metric_executor.shutdown()
+
+    identities, session_header = metric_results['identities'], metric_results['session_header']
+    student_ids, student_pids = identities['student_ids'], identities['student_pids']
+    participant_names = identities['participant_names']
+    set_profile_event_count(profile, 'identities', len(index_events['userAdded']))
     (
         student_time_on_camera,
         student_minutes_with_camera_paused,
         student_fraction_of_class_on_camera,
         student_fraction_of_instructor_time_on_camera
-    ) = get_camera_contributions(index_stream, ftstage, student_ids, instructor_id)
-    
+    ) = metric_results['camera']
+    set_profile_event_count(profile, 'camera',
+                            get_event_count(event_store, 'streamAdded', 'streamRemoved', 'userDeleted',
+                                            'updateVideoPauseStatus', 'removeVideo'))
     (
         student_minutes_on_microphone,
         student_fraction_of_class_on_microphone,
         student_fraction_of_instructor_mic
-    ) = get_microphone_contributions(index_stream, student_ids, instructor_id)
-    
+    ) = metric_results['microphone']
+    set_profile_event_count(profile, 'microphone', get_event_count(event_store, 'userVoipStatusChanged'))
     (
         student_chat_times,
         student_chat_lengths,
         student_message_count,
         student_fraction_of_chats
-    ) = get_chat_contributions(index_stream, student_pids, recording_folder_file_path)
-    
-    student_participation_grades = get_participation_grades(student_time_on_camera,
-                                                            student_minutes_on_microphone,
-                                                            student_message_count,
-                                                            instructor_name)
+    ) = metric_results['chat']
+    set_profile_event_count(profile, 'chat', len(event_store['chat_time']))
+    student_participation_grades = metric_results['grades']
+    set_profile_event_count(profile, 'grades', len(student_participation_grades))
     
     class_data = [
         participant_names,
@@ -619,60 +2589,189 @@ def get_results_summary(recording_folder_file_path, report_folder_file_path):
         student_fraction_of_chats
     ]
     
-    results = defaultdict(list)
-    for k in participant_names.keys():
-        for item in class_data:
-            results[k].append(item.get(k, 0))
-    
-    # convert results to list for sorting
-    results = list(results.values())
-    
-    # sort orders by student name
-    results.sort()
-    results.sort(key=lambda n: n[0].split()[1])
-    
-    # make headers for results.csv file
-    headers = [
-        "Participant",
-        "Participation Grades",
-        "Minutes on Camera",
-        "Minutes with Camera Paused",
-        "Fraction of Class Time on Camera",
-        "Fraction of Instructor Time on Camera",
-        "Minutes on Microphone",
-        "Fraction of Class Time on Microphone",
-        "Fraction of Instructor Time on Microphone",
-        "Chat Messages Sent",
-        "Fraction of Messages Sent"
-    ]
-    
-    # add headers to results list
-    results.insert(0, headers)
+    results, headers = get_results_table(class_data)
     
     report_file_path = report_folder_file_path + "participation_report.csv"
     
-    save_report_csv(results, report_file_path)
+    get_profiled_result(profile, 'save_csv', save_report_csv, results, report_file_path)
+    set_profile_event_count(profile, 'save_csv', len(results) - 1)
+
+    if columnar_format is not None:
+        get_profiled_result(profile, 'save_columns', save_report_columns, results,
+                            report_folder_file_path + "participation_report." + columnar_format, columnar_format)
+        set_profile_event_count(profile, 'save_columns', len(results) - 1)
+
+    if timelines or timeline_bin_seconds:
+        participation_timelines = get_profiled_result(profile, 'timelines', get_participation_timelines, event_store,
+                                                      student_ids, student_pids, mic_merge_gap, session_header)
+        set_profile_event_count(profile, 'timelines', sum(len(participation_timelines[name + '_code'])
+                                                          for name in ('camera', 'pause', 'mic', 'chat')))
+    if timelines:
+        get_profiled_result(profile, 'save_timelines', save_participation_timelines, participation_timelines,
+                            report_folder_file_path + "participation_timelines.npz")
+    if timeline_bin_seconds:
+        binned_timelines = get_profiled_result(profile, 'timeline_bins', get_binned_timelines,
+                                               participation_timelines, timeline_bin_seconds)
+        set_profile_event_count(profile, 'timeline_bins', binned_timelines['camera_seconds'].size)
+        get_profiled_result(profile, 'save_timeline_bins', save_participation_timelines, binned_timelines,
+                            report_folder_file_path + "participation_timeline_bins.npz")
+
+    if chat_analytics:
+        chat_results = get_profiled_result(profile, 'chat_analytics', get_chat_analytics, event_store, identities,
+                                           session_header)
+        set_profile_event_count(profile, 'chat_analytics', len(event_store['chat_time']))
+        get_profiled_result(profile, 'save_chat_analytics', save_report_csv, chat_results,
+                            report_folder_file_path + "participation_chat_analytics.csv")
+
+    if profile is not None:
+        profile['wall_seconds'] = round(time.perf_counter() - start_time, 4)
+        profile['cpu_seconds'] = round(time.process_time() - start_cpu_time, 4)
+        save_profile(profile, report_folder_file_path)
     
     return results, headers
 
-def get_summary_plots(results,headers,report_folder_file_path):
-    output_file(report_folder_file_path + "participation_report_plots.html") 
-    plots = []
-    for result in range(len(results[0])):
-        students = list(reversed([item[0] for item in results]))[:-1]
-        participation_data = list(reversed([item[result] for item in results]))[:-1]
-    
-        p = figure(y_range=students, plot_width=400, plot_height=400, title=headers[result])
-        p.hbar(y=students, height=0.5, left=0,
-               right=participation_data, color="navy")
-        plots.append(p)
-    
-    g = gridplot([plots[1:2], plots[2:4], plots[6:7], plots[9:10]])
-    
-    save(g)
+# the report columns that are plotted, one list per row of plots
+PLOT_COLUMNS = [[1], [2, 3], [6], [9]]
+PLOT_PAGE_SIZE = 100
+
+
+def get_plot_pages(results, page_size=PLOT_PAGE_SIZE, top_count=None):
+    '''
+    the participant rows of each page of plots, in report order. top_count
+    keeps only that many participants with the highest participation grades
+    '''
+    rows = results[1:]
+    if top_count is not None:
+        top_rows = set(sorted(range(len(rows)), key=lambda row: rows[row][1], reverse=True)[:top_count])
+        rows = [row for index, row in enumerate(rows) if index in top_rows]
+    if not page_size:
+        page_size = max(len(rows), 1)
+    return [rows[first_row:first_row + page_size] for first_row in range(0, len(rows), page_size)] or [[]]
+
+
+def get_plot_file_path(report_folder_file_path, page, top_count=None):
+    # the first page keeps the original file name
+    file_name = "participation_report_plots"
+    if top_count is not None:
+        file_name += "_top_%d" % top_count
+    if page > 0:
+        file_name += "_page_%d" % (page + 1)
+    return report_folder_file_path + file_name + ".html"
+
+
+def get_summary_plots(results,headers,report_folder_file_path,profile=False,page_size=PLOT_PAGE_SIZE,top_count=None,
+                      webgl=False):
+    '''
+    saves bar charts of the grades, camera, microphone and chat columns of
+    the report. all of the charts on a page share one ColumnDataSource, so
+    each participant's numbers are written into the html once, and are drawn
+    with WebGL instead of the browser's canvas when webgl=True. large classes
+    are split into pages of page_size participants (a file each,
+    page_size=None puts everyone on one page), and top_count only plots the
+    participants with the highest grades. pages of the same plots left from
+    an earlier run are removed. returns the paths of the html files
+    '''
+    # profile=True adds the plots stage to the profile get_results_summary saved
+    if profile:
+        profile = start_profile(report_folder_file_path)
+        plot_file_paths = get_profiled_result(profile, 'plots', get_summary_plots, results, headers,
+                                              report_folder_file_path, page_size=page_size, top_count=top_count,
+                                              webgl=webgl)
+        set_profile_event_count(profile, 'plots', len(results) - 1)
+        save_profile(profile, report_folder_file_path, add_to_saved_profile=True)
+        return plot_file_paths
+
+    from bokeh.io import save
+    from bokeh.layouts import gridplot
+    from bokeh.models import ColumnDataSource
+    from bokeh.plotting import figure
+
+    # pages left from an earlier run that needed more of them would look like part of this report
+    # (only the file names get_plot_file_path gives, other files in the report folder are left alone)
+    first_plot_file_name = os.path.basename(get_plot_file_path(report_folder_file_path, 0, top_count))
+    page_file_name_pattern = re.compile(re.escape(first_plot_file_name[:-len(".html")]) + r"_page_\d+\.html")
+    for file_name in os.listdir(report_folder_file_path or "."):
+        if page_file_name_pattern.fullmatch(file_name):
+            os.remove(report_folder_file_path + file_name)
+
+    plot_file_paths = []
+    for page, rows in enumerate(get_plot_pages(results, page_size, top_count)):
+        # the first participant at the top of each chart
+        rows = list(reversed(rows))
+        students = [row[0] for row in rows]
+        # only the names and the plotted columns go into the html
+        plotted_columns = [0] + [column for columns in PLOT_COLUMNS for column in columns]
+        source = ColumnDataSource({headers[column]: [row[column] for row in rows] for column in plotted_columns})
+
+        plot_rows = []
+        for columns in PLOT_COLUMNS:
+            plot_row = []
+            for column in columns:
+                p = figure(y_range=students, width=400, height=max(400, 12 * len(students)), title=headers[column],
+                           output_backend="webgl" if webgl else "canvas")
+                p.hbar(y=headers[0], height=0.5, left=0, right=headers[column], color="navy", source=source)
+                plot_row.append(p)
+            plot_rows.append(plot_row)
+
+        g = gridplot(plot_rows)
+
+        plot_file_path = get_plot_file_path(report_folder_file_path, page, top_count)
+        save(g, filename=plot_file_path, resources="cdn", title="Participation Report")
+        plot_file_paths.append(plot_file_path)
+    return plot_file_paths
 
 if __name__ == '__main__':
-    recording_folder_file_path, report_folder_file_path = argv[1],argv[2]
-    results, headers = get_results_summary(recording_folder_file_path, report_folder_file_path)
-    get_summary_plots(results,headers,report_folder_file_path)
-    
+    parser = argparse.ArgumentParser(description="make the participation report of an adobe connect recording")
+    parser.add_argument("recording_folder_file_path", help="recording folder, or the zip it was downloaded as")
+    parser.add_argument("report_folder_file_path")
+
+    session_options = parser.add_argument_group("session")
+    session_options.add_argument("--roster", dest="roster_file_path", metavar="ROSTER_CSV", default=None,
+                                 help="name students as in this roster csv and add a row for each absent student")
+    session_options.add_argument("--timezone", dest="source_timezone", metavar="TIMEZONE",
+                                 default=DEFAULT_SOURCE_TIMEZONE,
+                                 help="timezone of the start date in indexstream.xml")
+    session_options.add_argument("--class-timezone", dest="target_timezone", metavar="TIMEZONE", default=None,
+                                 help="count chat messages from midnight here (default: the --timezone)")
+    session_options.add_argument("--concurrent", action="store_true",
+                                 help="read the files and work out camera, microphone and chat at the same time")
+    session_options.add_argument("--profile", action="store_true",
+                                 help="save the time and memory of each stage in participation_profile.json")
+
+    output_options = parser.add_argument_group("extra outputs")
+    columnar_options = output_options.add_mutually_exclusive_group()
+    for columnar_format in COLUMNAR_FORMATS:
+        columnar_options.add_argument("--" + columnar_format, dest="columnar_format", action="store_const",
+                                      const=columnar_format, help="also save the report as %s columns" %
+                                                                  columnar_format)
+    output_options.add_argument("--timelines", action="store_true",
+                                help="save the camera, pause, microphone and chat intervals behind the totals")
+    output_options.add_argument("--bin-seconds", dest="timeline_bin_seconds", metavar="SECONDS", type=float,
+                                default=None,
+                                help="save each participant's activity in bins this many seconds long")
+    output_options.add_argument("--chat-analytics", dest="chat_analytics", action="store_true",
+                                help="save the characters, words, answers and burstiness of each participant's chat")
+
+    plot_options = parser.add_argument_group("plots")
+    plot_options.add_argument("--no-plots", dest="make_plots", action="store_false", help="only write the csv report")
+    plot_options.add_argument("--plot-page-size", metavar="N", type=int, default=PLOT_PAGE_SIZE,
+                              help="participants on each page of plots, 0 for one page (default %d)" %
+                                   PLOT_PAGE_SIZE)
+    plot_options.add_argument("--top", dest="top_count", metavar="N", type=int, default=None,
+                              help="only plot the participants with the highest grades")
+    plot_options.add_argument("--webgl", action="store_true",
+                              help="draw the charts with WebGL, faster for large classes in browsers that have it")
+    args = parser.parse_args()
+
+    # the file names are added straight onto the folders, and a zipped recording is read as session.zip/
+    recording_folder_file_path = os.path.join(args.recording_folder_file_path, "")
+    report_folder_file_path = os.path.join(args.report_folder_file_path, "")
+    results, headers = get_results_summary(recording_folder_file_path, report_folder_file_path,
+                                           profile=args.profile, columnar_format=args.columnar_format,
+                                           timelines=args.timelines, timeline_bin_seconds=args.timeline_bin_seconds,
+                                           roster_file_path=args.roster_file_path,
+                                           chat_analytics=args.chat_analytics, source_timezone=args.source_timezone,
+                                           target_timezone=args.target_timezone, concurrent=args.concurrent)
+    if args.make_plots:
+        get_summary_plots(results, headers, report_folder_file_path, profile=args.profile,
+                          page_size=args.plot_page_size, top_count=args.top_count, webgl=args.webgl)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Checks the ways of making the participation report against the reference,
+the script as it was before any of them were added, kept unchanged in
+Adobe_Connect_Reference_Extractor.py. Every engine (see ENGINES) makes the
+report of every recording in a corpus folder (recording folders and zipped
+recordings, for example anonymized real recordings) and of synthetic
+recordings, and every cell of its report is compared with the reference
+report within a tolerance. The reference reads folders only, so it is given
+the xml files of a zipped recording copied into a temporary folder. For
+each recording and engine it also reports how many times faster than the
+reference the engine was and how its peak memory compares, so a change can
+be kept or dropped on the numbers. Exits with 1 when any engine's report
+differs from the reference.
+
+usage: Adobe_Connect_Regression_Harness.py [--corpus recordings/] [--sizes 10:30,50:60]
+                                           [--engines loops,etree,lxml,prefilter,concurrent,cached]
+                                           [--tolerance 1e-9] [--folder synthetic/] [--output regression.json]
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import importlib.util
+import json
+import math
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from Adobe_Connect_Batch_Reports import find_recording_folders
+from Adobe_Connect_Parser_Benchmark import get_memory_status, get_sizes, reset_peak_memory
+from Adobe_Connect_Participation_Extractor import (get_recording_archive_member, get_recording_file_paths,
+                                                   get_results_summary, open_recording_file)
+import Adobe_Connect_Reference_Extractor
+from Adobe_Connect_Synthetic_Recording import save_synthetic_recording
+
+
+def get_reference_results(recording_folder_path, report_folder_path):
+    # the report rows of the frozen reference script, headers first
+    if get_recording_archive_member(recording_folder_path) is None:
+        return Adobe_Connect_Reference_Extractor.get_results_summary(recording_folder_path, report_folder_path)[0]
+    with tempfile.TemporaryDirectory() as unzipped_folder_path:
+        for file_path in get_recording_file_paths(recording_folder_path):
+            with open_recording_file(file_path) as infile, \
+                    open(os.path.join(unzipped_folder_path, os.path.basename(file_path)), 'wb') as outfile:
+                shutil.copyfileobj(infile, outfile)
+        return Adobe_Connect_Reference_Extractor.get_results_summary(os.path.join(unzipped_folder_path, ""),
+                                                                     report_folder_path)[0]
+
+
+'''
+each engine is the settings get_results_summary is run with. 'warm_up'
+runs it once before it is measured (to fill the parsed event cache), and
+an engine can give its own 'function' instead, called with the recording
+and report folders and returning the report rows, headers first (it has to
+be a module level function, it is run in another process). an engine that
+'needs' an optional module is skipped when the module is not installed
+'''
+ENGINES = {
+    'reference': {'function': get_reference_results},
+    'loops': {'parser': 'beautifulsoup', 'vectorized': False, 'use_cache': False},
+    'etree': {'parser': 'etree', 'use_cache': False},
+    'lxml': {'parser': 'lxml', 'use_cache': False, 'needs': 'lxml'},
+    'prefilter': {'parser': 'prefilter', 'use_cache': False},
+    'concurrent': {'concurrent': True, 'use_cache': False},
+    'cached': {'use_cache': True, 'warm_up': True}
+}
+REFERENCE_ENGINE = 'reference'
+
+
+def get_missing_module(engine):
+    # the optional module an engine needs when it is not installed, otherwise None
+    module_name = ENGINES[engine].get('needs')
+    if module_name is None or importlib.util.find_spec(module_name) is not None:
+        return None
+    return module_name
+
+
+def get_engine_measurement(recording_folder_path, report_folder_path, engine):
+    '''
+    runs in a fresh process so that the peak memory (the most the process
+    ever used, less what it was using before) only counts this engine
+    '''
+    settings = dict(ENGINES[engine])
+    function = settings.pop('function', None)
+    warm_up = settings.pop('warm_up', False)
+    settings.pop('needs', None)
+
+    def make_report():
+        if function is not None:
+            return function(recording_folder_path, report_folder_path)
+        return get_results_summary(recording_folder_path, report_folder_path, chat_workers=1, **settings)[0]
+
+    if warm_up:
+        make_report()
+    peak_memory_was_reset = reset_peak_memory()
+    if peak_memory_was_reset:
+        memory_before = get_memory_status("VmRSS")
+    else:
+        # ru_maxrss is in kilobytes on linux, without the reset it includes the imports
+        memory_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start_time = time.perf_counter()
+    results = make_report()
+    seconds = time.perf_counter() - start_time
+
+    if peak_memory_was_reset:
+        peak_memory = get_memory_status("VmHWM") - memory_before
+    else:
+        peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - memory_before
+    return seconds, peak_memory / 1024, results
+
+
+def is_close(value, reference_value, tolerance):
+    # numbers within tolerance of each other, relative to the reference value once it is over 1
+    if isinstance(value, str) or isinstance(reference_value, str):
+        return value == reference_value
+    if math.isnan(value) or math.isnan(reference_value):
+        return math.isnan(value) and math.isnan(reference_value)
+    return abs(value - reference_value) <= tolerance * max(1, abs(reference_value))
+
+
+def get_report_differences(results, reference_results, tolerance=1e-9):
+    '''
+    the participants missing from or extra in results, and for each column
+    with differences the number of participants it differs for, the largest
+    difference and the participant with it. participants are matched by
+    name, so the order of the rows does not matter
+    '''
+    differences = {'headers': None, 'missing': [], 'extra': [], 'columns': {}}
+    headers, reference_headers = results[0], reference_results[0]
+    if list(headers) != list(reference_headers):
+        differences['headers'] = [list(headers), list(reference_headers)]
+        return differences
+
+    rows = {row[0]: row for row in results[1:]}
+    reference_rows = {row[0]: row for row in reference_results[1:]}
+    differences['missing'] = sorted(set(reference_rows) - set(rows))
+    differences['extra'] = sorted(set(rows) - set(reference_rows))
+    for participant_name, reference_row in reference_rows.items():
+        if participant_name not in rows:
+            continue
+        for header, value, reference_value in zip(headers[1:], rows[participant_name][1:], reference_row[1:]):
+            if is_close(value, reference_value, tolerance):
+                continue
+            column = differences['columns'].setdefault(header, {'participants': 0, 'largest_difference': 0,
+                                                                'participant': participant_name})
+            column['participants'] += 1
+            if isinstance(value, str) or isinstance(reference_value, str):
+                continue
+            difference = abs(value - reference_value)
+            if math.isnan(difference) or difference > column['largest_difference']:
+                column['largest_difference'] = difference
+                column['participant'] = participant_name
+    return differences
+
+
+def is_same_report(differences):
+    return (differences['headers'] is None and not differences['missing'] and not differences['extra'] and
+            not differences['columns'])
+
+
+def get_regression_results(recording_folder_paths, engines, tolerance=1e-9):
+    '''
+    runs the reference and then each engine on every recording, each in its
+    own process, and compares each engine's report with the reference's.
+    speedup is the reference's seconds over the engine's and memory_ratio
+    the engine's peak memory over the reference's. an engine whose optional
+    module is not installed is not run, its results only say it was skipped
+    '''
+    missing_modules = {engine: get_missing_module(engine) for engine in engines}
+    spawn_context = multiprocessing.get_context('spawn')
+    results = []
+    for recording_folder_path in recording_folder_paths:
+        measurements = {}
+        for engine in [REFERENCE_ENGINE] + [engine for engine in engines if engine != REFERENCE_ENGINE]:
+            if missing_modules.get(engine):
+                continue
+            with tempfile.TemporaryDirectory() as report_folder_path:
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn_context) as executor:
+                    measurements[engine] = executor.submit(get_engine_measurement, recording_folder_path,
+                                                           os.path.join(report_folder_path, ""), engine).result()
+
+        reference_seconds, reference_peak_memory, reference_results = measurements[REFERENCE_ENGINE]
+        for engine in engines:
+            if missing_modules[engine]:
+                results.append({'recording': recording_folder_path, 'engine': engine,
+                                'skipped': "%s is not installed" % missing_modules[engine]})
+                continue
+            seconds, peak_memory, engine_results = measurements[engine]
+            differences = get_report_differences(engine_results, reference_results, tolerance)
+            results.append({
+                'recording': recording_folder_path,
+                'participants': len(reference_results) - 1,
+                'engine': engine,
+                'same_report': is_same_report(differences),
+                'differences': differences,
+                'seconds': round(seconds, 4),
+                'peak_memory_mb': round(peak_memory, 1),
+                'speedup': round(reference_seconds / seconds, 2) if seconds else None,
+                'memory_ratio': round(peak_memory / reference_peak_memory, 2) if reference_peak_memory > 0 else None
+            })
+    return results
+
+
+def get_synthetic_recording_folders(sizes, recordings_folder_path):
+    recording_folder_paths = []
+    for participants, minutes in sizes:
+        recording_folder_path = os.path.join(recordings_folder_path, "%d_participants_%d_minutes" %
+                                             (participants, minutes), "")
+        if not os.path.exists(recording_folder_path + "indexstream.xml"):
+            save_synthetic_recording(recording_folder_path, participants, minutes)
+        recording_folder_paths.append(recording_folder_path)
+    return recording_folder_paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="check the report of every engine against the reference engine")
+    parser.add_argument("--corpus", default=None, help="folder of recordings (folders or zips) to check")
+    parser.add_argument("--sizes", default="10:30,50:60",
+                        help="comma separated participants:minutes of synthetic recordings to check, or none")
+    parser.add_argument("--engines", default=",".join(engine for engine in ENGINES if engine != REFERENCE_ENGINE))
+    parser.add_argument("--tolerance", type=float, default=1e-9,
+                        help="largest difference allowed, relative to the reference value once it is over 1")
+    parser.add_argument("--folder", default=None,
+                        help="where the synthetic recordings are written (default: a temporary folder)")
+    parser.add_argument("--output", default=None, help="also save the results to this json file")
+    args = parser.parse_args()
+    engines = args.engines.split(",")
+    for engine in engines:
+        if engine not in ENGINES:
+            parser.error("unknown engine %s, use some of %s" % (engine, ", ".join(ENGINES)))
+
+    with tempfile.TemporaryDirectory() as temporary_folder_path:
+        recording_folder_paths = find_recording_folders(args.corpus) if args.corpus else []
+        if args.sizes != "none":
+            recording_folder_paths += get_synthetic_recording_folders(get_sizes(args.sizes),
+                                                                      args.folder or temporary_folder_path)
+        results = get_regression_results(recording_folder_paths, engines, args.tolerance)
+
+    print("%-40s %-12s %6s %9s %8s %9s %8s" % ("recording", "engine", "same", "seconds", "speedup", "peak MB",
+                                              "memory"))
+    for result in results:
+        if 'skipped' in result:
+            print("%-40s %-12s skipped, %s" % (result['recording'][-40:], result['engine'], result['skipped']))
+            continue
+        print("%-40s %-12s %6s %9.3f %7.2fx %9.1f %7.2fx" % (
+            result['recording'][-40:], result['engine'], result['same_report'], result['seconds'],
+            result['speedup'] or 0, result['peak_memory_mb'], result['memory_ratio'] or 0))
+        differences = result['differences']
+        for participant_name in differences['missing']:
+            print("    missing %s" % participant_name)
+        for participant_name in differences['extra']:
+            print("    extra %s" % participant_name)
+        if differences['headers'] is not None:
+            print("    headers differ")
+        for header, column in differences['columns'].items():
+            print("    %s differs for %d participants, by up to %g (%s)" % (
+                header, column['participants'], column['largest_difference'], column['participant']))
+
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump(results, outfile, indent=2)
+
+    sys.exit(0 if all(result['same_report'] for result in results if 'skipped' not in result) else 1)
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A small HTTP service that keeps running and makes participation reports on
+request, so that a learning management system can ask for a report without
+starting python and reading the recording every time.
+
+    GET /report?recording=<folder or zip under recordings_root>[&format=json|csv]
+    GET /status
+
+Reports are made by get_results_summary in a pool of worker processes, with
+the parsed event cache shared by every recording. Requests for a recording
+whose report is already being made wait for that report rather than making
+it again. Finished reports are kept in memory and served again until one of
+the recording's files changes (its size or modification time). At most
+--workers reports are made at once, and once --max-pending reports are made
+or waiting new ones are turned away with 503 and a Retry-After header, so a
+burst of end of term requests queues up rather than overloading the machine.
+Reports already kept in memory are still served during a burst. If a
+worker process dies (killed, or out of memory) the reports it was making
+fail with 500 and the pool of workers is replaced, so later requests are
+made as usual.
+
+Only the python standard library is used for the service. Each connection
+takes one request and is then closed. A client that has not sent its whole
+request within --request-timeout seconds gets 408 and is disconnected.
+
+usage: Adobe_Connect_Report_Service.py recordings_root/ reports_root/ [--host 127.0.0.1] [--port 8080]
+                                       [--workers N] [--max-pending 32] [--cached-reports 256]
+                                       [--cache-folder cache/] [--request-timeout 30]
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import csv
+import io
+import json
+import os
+import time
+import traceback
+from urllib.parse import parse_qs, urlsplit
+
+from Adobe_Connect_Batch_Reports import get_report_folder_path
+from Adobe_Connect_Participation_Extractor import (RECORDING_ARCHIVE_EXTENSION, get_recording_file_paths,
+                                                   get_recording_file_signature, get_results_summary)
+
+REPORT_FORMATS = ('json', 'csv')
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    500: "Internal Server Error",
+    503: "Service Unavailable"
+}
+
+
+def get_service_report(recording_folder_path, report_folder_path, cache_folder_path):
+    '''
+    runs in a worker process. the reports are already spread across the
+    workers, so each one reads its chat files one after another
+    '''
+    os.makedirs(report_folder_path, exist_ok=True)
+    start_time = time.time()
+    results, headers = get_results_summary(recording_folder_path, report_folder_path,
+                                           cache_folder_path=cache_folder_path, chat_workers=1)
+    return results, round(time.time() - start_time, 3)
+
+
+def get_recording_signature(recording_folder_path):
+    # a report is out of date once any file of its recording has a new size or modification time
+    return tuple(tuple(get_recording_file_signature(file_path))
+                 for file_path in get_recording_file_paths(recording_folder_path))
+
+
+async def get_recording_signature_in_thread(recording_folder_path):
+    # listing the files (or reading the zip's directory) can be slow, so it is kept off the event loop
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, get_recording_signature, recording_folder_path)
+
+
+def get_empty_service_state(recordings_root_path, reports_root_path, workers=None, max_pending=32,
+                            cached_reports=256, cache_folder_path=None, request_timeout=30):
+    '''
+    the state shared by every request. reports holds the finished reports by
+    recording folder, oldest first, and running holds the task making each
+    report that is being made or waiting for a worker. request_timeout is
+    the seconds a client has to send its request line and headers
+    '''
+    if cache_folder_path is None:
+        cache_folder_path = os.path.join(reports_root_path, "participation_cache", "")
+    return {
+        'recordings_root': os.path.realpath(recordings_root_path),
+        'reports_root': reports_root_path,
+        'cache_folder': cache_folder_path,
+        'workers': workers,
+        'executor': ProcessPoolExecutor(max_workers=workers),
+        'request_timeout': request_timeout,
+        'max_pending': max_pending,
+        'cached_reports': cached_reports,
+        'reports': {},
+        'running': {},
+        'counts': {'requests': 0, 'cached': 0, 'joined': 0, 'made': 0, 'failed': 0, 'turned_away': 0}
+    }
+
+
+def get_recording_folder_path(service_state, recording):
+    '''
+    the recording (a folder or a zipped recording) is given relative to the
+    recordings root, and anything that points outside of it or is not a
+    recording is refused. returns None for those
+    '''
+    recording_folder_path = os.path.realpath(os.path.join(service_state['recordings_root'], recording))
+    if os.path.commonpath([recording_folder_path, service_state['recordings_root']]) != \
+            service_state['recordings_root']:
+        return None
+    if recording_folder_path.lower().endswith(RECORDING_ARCHIVE_EXTENSION) and os.path.isfile(recording_folder_path):
+        return os.path.join(recording_folder_path, "")
+    if not os.path.isfile(os.path.join(recording_folder_path, "indexstream.xml")):
+        return None
+    return os.path.join(recording_folder_path, "")
+
+
+def keep_report(service_state, recording_folder_path, report):
+    # reports are kept oldest first, so the first one is dropped when there are too many
+    reports = service_state['reports']
+    reports.pop(recording_folder_path, None)
+    reports[recording_folder_path] = report
+    while len(reports) > service_state['cached_reports']:
+        del reports[next(iter(reports))]
+
+
+def replace_broken_executor(service_state, executor):
+    '''
+    a worker process that dies breaks its pool, and every later report
+    would fail with it, so a new pool takes its place. all of the reports
+    that were using the broken pool get here, only the first replaces it
+    '''
+    if service_state['executor'] is executor:
+        service_state['executor'] = ProcessPoolExecutor(max_workers=service_state['workers'])
+        executor.shutdown(wait=False)
+
+
+async def make_report(service_state, recording_folder_path, signature):
+    report_folder_path = get_report_folder_path(recording_folder_path, service_state['recordings_root'],
+                                                service_state['reports_root'])
+    loop = asyncio.get_running_loop()
+    executor = service_state['executor']
+    try:
+        results, seconds = await loop.run_in_executor(executor, get_service_report, recording_folder_path,
+                                                      report_folder_path, service_state['cache_folder'])
+    except BrokenProcessPool:
+        replace_broken_executor(service_state, executor)
+        service_state['counts']['failed'] += 1
+        raise
+    except Exception:
+        service_state['counts']['failed'] += 1
+        raise
+    finally:
+        # a recording that changed while this report was made already has a newer task in running
+        running = service_state['running']
+        if running.get(recording_folder_path, (None, None))[1] is asyncio.current_task():
+            del running[recording_folder_path]
+    service_state['counts']['made'] += 1
+    report = {'signature': signature, 'results': results, 'seconds': seconds}
+    # a recording that changed while it was being read is made again by the next request
+    if await get_recording_signature_in_thread(recording_folder_path) == signature:
+        keep_report(service_state, recording_folder_path, report)
+    return report
+
+
+async def get_report(service_state, recording_folder_path):
+    '''
+    returns the report of a recording and where it came from (cached, joined
+    or made), or None when there are already max_pending reports being made
+    or waiting for a worker
+    '''
+    counts = service_state['counts']
+    signature = await get_recording_signature_in_thread(recording_folder_path)
+    report = service_state['reports'].get(recording_folder_path)
+    if report is not None and report['signature'] == signature:
+        counts['cached'] += 1
+        return report, 'cached'
+
+    running = service_state['running'].get(recording_folder_path)
+    if running is not None and running[0] == signature:
+        counts['joined'] += 1
+        # shielded, so a client that hangs up does not cancel the report for everyone else waiting on it
+        return await asyncio.shield(running[1]), 'joined'
+
+    if len(service_state['running']) >= service_state['max_pending']:
+        counts['turned_away'] += 1
+        return None, 'turned_away'
+    task = asyncio.ensure_future(make_report(service_state, recording_folder_path, signature))
+    service_state['running'][recording_folder_path] = (signature, task)
+    return await asyncio.shield(task), 'made'
+
+
+def get_report_csv(results):
+    report_file = io.StringIO()
+    csv.writer(report_file).writerows(results)
+    return report_file.getvalue()
+
+
+def get_status(service_state):
+    return {
+        'running': sorted(os.path.relpath(recording_folder_path, service_state['recordings_root'])
+                          for recording_folder_path in service_state['running']),
+        'cached_reports': len(service_state['reports']),
+        'max_pending': service_state['max_pending'],
+        'counts': service_state['counts']
+    }
+
+
+async def get_response(service_state, method, target):
+    '''
+    returns the status code, content type, extra headers and body of the
+    response to one request
+    '''
+    json_type = "application/json"
+    if method != "GET":
+        return 405, json_type, {'Allow': "GET"}, {'error': "only GET is supported"}
+    url = urlsplit(target)
+    query = parse_qs(url.query)
+    if url.path == "/status":
+        return 200, json_type, {}, get_status(service_state)
+    if url.path != "/report":
+        return 404, json_type, {}, {'error': "unknown path %s, use /report or /status" % url.path}
+
+    service_state['counts']['requests'] += 1
+    report_format = query.get('format', ['json'])[0]
+    if report_format not in REPORT_FORMATS:
+        return 400, json_type, {}, {'error': "unknown format %s, use json or csv" % report_format}
+    if 'recording' not in query:
+        return 400, json_type, {}, {'error': "give the recording folder as ?recording="}
+    recording = query['recording'][0]
+    recording_folder_path = get_recording_folder_path(service_state, recording)
+    if recording_folder_path is None:
+        return 404, json_type, {}, {'error': "no recording at %s" % recording}
+
+    try:
+        report, source = await get_report(service_state, recording_folder_path)
+    except Exception as exception:
+        return 500, json_type, {}, {'error': traceback.format_exception_only(type(exception), exception)[-1].strip()}
+    if report is None:
+        return 503, json_type, {'Retry-After': "30"}, {'error': "too many reports are being made, try again later"}
+
+    extra_headers = {'X-Report-Source': source, 'X-Report-Seconds': str(report['seconds'])}
+    if report_format == 'csv':
+        return 200, "text/csv; charset=utf-8", extra_headers, get_report_csv(report['results'])
+    results = report['results']
+    return 200, json_type, extra_headers, {'recording': recording, 'source': source, 'seconds': report['seconds'],
+                                           'headers': results[0], 'rows': results[1:]}
+
+
+async def read_request_line(reader):
+    request_line = (await reader.readline()).decode('latin-1').split()
+    # the request headers are not needed, they are read to the blank line that ends them
+    while (await reader.readline()).strip():
+        pass
+    return request_line
+
+
+async def handle_connection(service_state, reader, writer):
+    try:
+        try:
+            request_line = await asyncio.wait_for(read_request_line(reader), service_state['request_timeout'])
+        except asyncio.TimeoutError:
+            # a client that connects and sends nothing (or very slowly) would otherwise hold its connection open
+            request_line = None
+        if request_line is None:
+            status, content_type, extra_headers, body = 408, "application/json", {}, {
+                'error': "the request was not sent within %g seconds" % service_state['request_timeout']}
+        elif len(request_line) != 3:
+            status, content_type, extra_headers, body = 400, "application/json", {}, {'error': "bad request line"}
+        else:
+            status, content_type, extra_headers, body = await get_response(service_state, request_line[0],
+                                                                           request_line[1])
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        body = body.encode('utf-8')
+        response_headers = ["HTTP/1.1 %d %s" % (status, HTTP_REASONS[status]),
+                            "Content-Type: " + content_type,
+                            "Content-Length: %d" % len(body),
+                            "Connection: close"]
+        response_headers += ["%s: %s" % header for header in extra_headers.items()]
+        writer.write(("\r\n".join(response_headers) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_reports(service_state, host="127.0.0.1", port=8080):
+    server = await asyncio.start_server(lambda reader, writer: handle_connection(service_state, reader, writer),
+                                        host, port)
+    print("serving reports of %s on http://%s:%d" % (service_state['recordings_root'], host, port))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service_state['executor'].shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="serve participation reports over HTTP")
+    parser.add_argument("recordings_root_path")
+    parser.add_argument("reports_root_path")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="reports made at once, one per worker process (default: one per CPU)")
+    parser.add_argument("--max-pending", type=int, default=32,
+                        help="reports being made or waiting before new ones are turned away")
+    parser.add_argument("--cached-reports", type=int, default=256, help="finished reports kept in memory")
+    parser.add_argument("--cache-folder", dest="cache_folder_path", default=None,
+                        help="parsed event cache (default: participation_cache inside reports_root)")
+    parser.add_argument("--request-timeout", type=float, default=30,
+                        help="seconds a client has to send its request (default 30)")
+    args = parser.parse_args()
+    if args.cache_folder_path is not None:
+        args.cache_folder_path = os.path.join(args.cache_folder_path, "")
+
+    service_state = get_empty_service_state(args.recordings_root_path, args.reports_root_path, args.workers,
+                                            args.max_pending, args.cached_reports, args.cache_folder_path,
+                                            args.request_timeout)
+    try:
+        asyncio.run(serve_reports(service_state, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Times each stage of making a participation report (reading the recording
+files, camera, microphone and chat contributions, grades, the csv report and
+the plots) on synthetic recordings from 10 to 500 participants and 1 to 6
+hours, and saves the timings to a json file. Passing an earlier json file as
+--baseline prints how much slower or faster each stage has become.
+
+usage: Adobe_Connect_Stage_Benchmark.py [--sizes 10:60,50:120,100:180,250:240,500:360] [--repeat 3]
+                                        [--folder recordings/] [--output stage_benchmark.json]
+                                        [--baseline old_stage_benchmark.json] [--no-plots]
+"""
+
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+
+from Adobe_Connect_Participation_Extractor import (DEFAULT_XML_PARSER, add_chat_to_event_store,
+                                                   add_ftstage_to_event_store, add_index_stream_to_event_store,
+                                                   get_camera_contributions, get_chat_contributions,
+                                                   get_empty_event_store, get_finished_event_store,
+                                                   get_identity_index, get_microphone_contributions,
+                                                   get_participation_grades, get_results_summary,
+                                                   get_summary_plots)
+from Adobe_Connect_Parser_Benchmark import get_sizes
+from Adobe_Connect_Synthetic_Recording import save_synthetic_recording
+
+DEFAULT_SIZES = "10:60,50:120,100:180,250:240,500:360"
+
+
+def get_stage_timings(recording_folder_path, report_folder_path, parser=DEFAULT_XML_PARSER, make_plots=True):
+    '''
+    runs the stages of get_results_summary one at a time, in the same order
+    and with the same arguments, then get_results_summary itself without and
+    with the parsed event cache, then get_summary_plots. returns the seconds
+    each stage took, the number of events it worked on and the error of the
+    plots stage if it failed (the rest of the timings are still worth having
+    without it)
+    '''
+    seconds = {}
+    counts = {}
+    errors = {}
+
+    def run_stage(stage, function, *args, **kwargs):
+        start_time = time.perf_counter()
+        stage_result = function(*args, **kwargs)
+        seconds[stage] = time.perf_counter() - start_time
+        return stage_result
+
+    event_store = get_empty_event_store()
+    run_stage('read_indexstream', add_index_stream_to_event_store, event_store, recording_folder_path, parser)
+    indexstream_event_count = len(event_store['type']) + sum(len(events) for events in event_store['index'].values())
+    run_stage('read_ftstage', add_ftstage_to_event_store, event_store, recording_folder_path, parser)
+    counts['ftstage_events'] = len(event_store['type']) + sum(len(events) for events in
+                                                              event_store['index'].values()) - indexstream_event_count
+    counts['indexstream_events'] = indexstream_event_count
+    run_stage('read_ftchat', add_chat_to_event_store, event_store, recording_folder_path, parser, 1)
+    counts['chat_messages'] = len(event_store['chat_text'])
+    event_store = run_stage('finish_event_store', get_finished_event_store, event_store)
+
+    identities = run_stage('identities', get_identity_index, event_store['index'])
+    student_ids, student_pids = identities['student_ids'], identities['student_pids']
+    instructor_id, instructor_name = identities['instructor_id'], identities['instructor_name']
+    counts['ids'] = len(student_ids)
+
+    student_time_on_camera = run_stage('camera', get_camera_contributions, event_store, student_ids,
+                                       instructor_id)[0]
+    student_minutes_on_microphone = run_stage('microphone', get_microphone_contributions, event_store,
+                                              student_ids, instructor_id)[0]
+    student_message_count = run_stage('chat', get_chat_contributions, event_store, student_pids)[2]
+    run_stage('grades', get_participation_grades, student_time_on_camera, student_minutes_on_microphone,
+              student_message_count, instructor_name)
+
+    results, headers = run_stage('results_summary', get_results_summary, recording_folder_path,
+                                 report_folder_path, use_cache=False, parser=parser, chat_workers=1)
+    counts['participants'] = len(results) - 1
+    # the first run fills the cache, the second one is what a rerun of an unchanged recording costs
+    get_results_summary(recording_folder_path, report_folder_path, parser=parser, chat_workers=1)
+    run_stage('cached_results_summary', get_results_summary, recording_folder_path, report_folder_path,
+              parser=parser, chat_workers=1)
+
+    if make_plots:
+        try:
+            run_stage('plots', get_summary_plots, results, headers, report_folder_path)
+        except Exception as exception:
+            errors['plots'] = "%s: %s" % (type(exception).__name__, exception)
+
+    return seconds, counts, errors
+
+
+def get_file_sizes(recording_folder_path):
+    return {file_name: round(os.path.getsize(recording_folder_path + file_name) / 1024 / 1024, 2)
+            for file_name in sorted(os.listdir(recording_folder_path)) if file_name.endswith(".xml")}
+
+
+def get_stage_benchmark(sizes, recordings_folder_path, repeat=3, parser=DEFAULT_XML_PARSER, make_plots=True):
+    '''
+    sizes is a list of (participants, minutes). each recording is timed
+    repeat times and the fastest time of each stage is kept, which is the
+    least affected by whatever else the machine is doing
+    '''
+    results = []
+    for participants, minutes in sizes:
+        recording_folder_path = os.path.join(recordings_folder_path, "%d_participants_%d_minutes" %
+                                             (participants, minutes), "")
+        report_folder_path = os.path.join(recording_folder_path, "report", "")
+        if not os.path.exists(recording_folder_path + "indexstream.xml"):
+            save_synthetic_recording(recording_folder_path, participants, minutes)
+        os.makedirs(report_folder_path, exist_ok=True)
+
+        fastest_seconds = {}
+        for run in range(repeat):
+            seconds, counts, errors = get_stage_timings(recording_folder_path, report_folder_path, parser, make_plots)
+            for stage in seconds:
+                fastest_seconds[stage] = min(seconds[stage], fastest_seconds.get(stage, seconds[stage]))
+
+        results.append({
+            'participants': participants,
+            'minutes': minutes,
+            'file_sizes_mb': get_file_sizes(recording_folder_path),
+            'counts': counts,
+            'seconds': {stage: round(stage_seconds, 4) for stage, stage_seconds in fastest_seconds.items()},
+            'errors': errors
+        })
+    return results
+
+
+def get_changes_from_baseline(results, baseline_results):
+    '''
+    for every size and stage in both runs, the new time divided by the
+    baseline time, so above 1 is slower than before
+    '''
+    baseline_seconds = {(result['participants'], result['minutes']): result['seconds']
+                        for result in baseline_results}
+    changes = []
+    for result in results:
+        size = (result['participants'], result['minutes'])
+        if size not in baseline_seconds:
+            continue
+        for stage, stage_seconds in result['seconds'].items():
+            if baseline_seconds[size].get(stage):
+                changes.append((size, stage, baseline_seconds[size][stage], stage_seconds,
+                                stage_seconds / baseline_seconds[size][stage]))
+    return changes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="time each stage of a participation report")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help="comma separated participants:minutes of the synthetic recordings")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per recording, the fastest is kept")
+    parser.add_argument("--parser", default=DEFAULT_XML_PARSER)
+    parser.add_argument("--folder", default=None,
+                        help="where the synthetic recordings are written and kept (default: a temporary folder)")
+    parser.add_argument("--output", default="stage_benchmark.json")
+    parser.add_argument("--baseline", default=None, help="an earlier --output file to compare with")
+    parser.add_argument("--no-plots", dest="make_plots", action="store_false")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary_folder_path:
+        results = get_stage_benchmark(get_sizes(args.sizes), args.folder or temporary_folder_path, args.repeat,
+                                      args.parser, args.make_plots)
+
+    for result in results:
+        print("%d participants %d min %s" % (result['participants'], result['minutes'],
+                                             json.dumps(result['counts'])))
+        for stage, stage_seconds in result['seconds'].items():
+            print("    %-24s %9.3f s" % (stage, stage_seconds))
+        for stage, error in result['errors'].items():
+            print("    %-24s failed: %s" % (stage, error))
+
+    benchmark = {
+        'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'cpus': os.cpu_count(),
+        'parser': args.parser,
+        'repeat': args.repeat,
+        'results': results
+    }
+    with open(args.output, "w") as outfile:
+        json.dump(benchmark, outfile, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as infile:
+            baseline_results = json.load(infile)['results']
+        print("\n%-24s %-24s %10s %10s %8s" % ("recording", "stage", "baseline", "now", "ratio"))
+        for size, stage, baseline_stage_seconds, stage_seconds, ratio in get_changes_from_baseline(
+                results, baseline_results):
+            print("%-24s %-24s %10.3f %10.3f %7.2fx" % ("%d participants %d min" % size, stage,
+                                                        baseline_stage_seconds, stage_seconds, ratio))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Measures how long a fresh python process takes to import the participation
+extractor and to make a csv only report of a small synthetic recording, with
+the extractor's imports as they are (bokeh, BeautifulSoup, lxml and the
+process pool only imported when they are used) and with all of them imported
+up front, the way the extractor used to import them.
+
+usage: Adobe_Connect_Startup_Benchmark.py [--participants 10] [--minutes 30] [--repeat 5]
+                                          [--output startup_benchmark.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from Adobe_Connect_Synthetic_Recording import save_synthetic_recording
+
+EXTRACTOR_FOLDER_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# what the extractor imported at the top of the module before its imports were deferred
+EAGER_IMPORTS = "import bokeh.io, bokeh.plotting, bokeh.layouts, bs4, concurrent.futures, lxml.etree\n"
+
+IMPORT_ONLY = "import Adobe_Connect_Participation_Extractor\n"
+
+CSV_ONLY_REPORT = ("from Adobe_Connect_Participation_Extractor import get_results_summary\n"
+                   "get_results_summary(%r, %r, use_cache=False)\n")
+
+LOADED_MODULES = ("import sys\n"
+                  "print(' '.join(module for module in ('bokeh', 'bs4', 'lxml', 'concurrent.futures', 'numpy')\n"
+                  "               if module in sys.modules))\n")
+
+
+def get_process_seconds(code, repeat):
+    '''
+    runs code in a new python process repeat times and returns the fastest
+    wall time, which includes starting python, and what the process printed
+    '''
+    fastest_seconds = None
+    for run in range(repeat):
+        start_time = time.perf_counter()
+        finished_process = subprocess.run([sys.executable, "-c", code], cwd=EXTRACTOR_FOLDER_PATH, check=True,
+                                          stdout=subprocess.PIPE, universal_newlines=True)
+        seconds = time.perf_counter() - start_time
+        if fastest_seconds is None or seconds < fastest_seconds:
+            fastest_seconds = seconds
+    return fastest_seconds, finished_process.stdout.strip()
+
+
+def get_startup_benchmark(recording_folder_path, report_folder_path, repeat=5):
+    csv_only_report = CSV_ONLY_REPORT % (recording_folder_path, report_folder_path)
+    runs = [
+        ('python', ""),
+        ('import', IMPORT_ONLY),
+        ('import with eager imports', EAGER_IMPORTS + IMPORT_ONLY),
+        ('csv only report', csv_only_report),
+        ('csv only report with eager imports', EAGER_IMPORTS + csv_only_report)
+    ]
+    results = []
+    for name, code in runs:
+        seconds, loaded_modules = get_process_seconds(code + LOADED_MODULES, repeat)
+        results.append({'run': name, 'seconds': round(seconds, 3), 'loaded_modules': loaded_modules.split()})
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="time starting the extractor with and without eager imports")
+    parser.add_argument("--participants", type=int, default=10)
+    parser.add_argument("--minutes", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each, the fastest is kept")
+    parser.add_argument("--output", default=None, help="also save the results to this json file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary_folder_path:
+        recording_folder_path = os.path.join(temporary_folder_path, "recording", "")
+        report_folder_path = os.path.join(temporary_folder_path, "report", "")
+        save_synthetic_recording(recording_folder_path, args.participants, args.minutes)
+        os.makedirs(report_folder_path)
+        results = get_startup_benchmark(recording_folder_path, report_folder_path, args.repeat)
+
+    print("%-36s %9s  %s" % ("run", "seconds", "modules loaded"))
+    for result in results:
+        print("%-36s %9.3f  %s" % (result['run'], result['seconds'], " ".join(result['loaded_modules'])))
+
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump(results, outfile, indent=2)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Writes synthetic Adobe Connect recordings (indexstream.xml, ftstage1.xml and
+ftchat*.xml) for benchmarking the participation extractor. The messages are
+laid out so that the extractor finds names, ids, camera, pause, microphone
+and chat events in them the same way it does in real recordings.
+
+usage: Adobe_Connect_Synthetic_Recording.py recording_folder/ participants minutes [seed]
+           [--reconnect-rate 0.1] [--mic-toggles-per-minute 2] [--chats-per-minute 1]
+           [--camera-rate 0.7] [--chat-pods 1] [--other-messages-per-minute 0]
+"""
+
+import argparse
+import os
+import random
+import time
+from xml.sax.saxutils import escape
+
+FIRST_NAMES = ["Ana", "Ben", "Cara", "Dev", "Eli", "Fay", "Gus", "Hana", "Ivo", "Jo", "Kai", "Lea", "Max", "Nia"]
+LAST_NAMES = ["Smith", "Lee", "Ortiz", "Kim", "Ng", "Brown", "Diaz", "Hall", "Khan", "Moss", "Rao", "Vale"]
+CHAT_WORDS = ["ok", "yes", "I think so", "question", "thanks!", "can you repeat that", "a < b & c"]
+# messages real recordings are full of that the extractor has no use for
+OTHER_MESSAGE_TYPES = ["wbShapeAdded", "podLayoutChanged", "shareDocumentPage", "noteTextChanged"]
+
+# the recording starts at this unix time (a Tuesday afternoon, Greenwich time)
+RECORDING_START_TIME = 1563300000
+
+# how often things happen by default, per participant
+RECONNECT_RATE = 0.1
+MIC_TOGGLES_PER_MINUTE = 2.0
+CHATS_PER_MINUTE = 1.0
+CAMERA_RATE = 0.7
+# and for the whole session
+CHAT_PODS = 1
+OTHER_MESSAGES_PER_MINUTE = 0.0
+
+
+def get_message(message_time, body):
+    return '<Message time="%d" type="1">\n%s\n</Message>\n' % (message_time, body)
+
+
+def get_user_added(message_time, full_name, student_id, student_pid):
+    return get_message(message_time, "<Array>\n<String>userAdded</String>\n<Object>\n<fullName>%s</fullName>\n"
+                                     "<id>%s</id>\n<pID>%s</pID>\n</Object>\n</Array>"
+                       % (escape(full_name), student_id, student_pid))
+
+
+def get_stream_added(message_time, student_id, stream_id):
+    return get_message(message_time, "<Array>\n<String>streamAdded</String>\n<Object>\n<streamID>%d</streamID>\n"
+                                     "<streamPublisherID>%s</streamPublisherID>\n<startTime>%d</startTime>\n"
+                                     "</Object>\n</Array>" % (stream_id, student_id, message_time))
+
+
+def get_stream_removed(message_time, student_id):
+    return get_message(message_time, "<Array>\n<String>streamRemoved</String>\n<Object>\n"
+                                     "<streamPublisherID>%s</streamPublisherID>\n<time>%d</time>\n</Object>\n"
+                                     "</Array>" % (student_id, message_time))
+
+
+def get_user_deleted(message_time, student_id):
+    return get_message(message_time, "<Array>\n<Object>\n<method>userDeleted</method>\n</Object>\n"
+                                     "<Number>%s</Number>\n<Object>\n<time>%d</time>\n</Object>\n</Array>"
+                       % (student_id, message_time))
+
+
+def get_voip_status_changed(message_time, student_id, talking):
+    return get_message(message_time, "<Array>\n<Object>\n<method>userVoipStatusChanged</method>\n"
+                                     "<time>%d</time>\n</Object>\n<String>%s</String>\n<String>%s</String>\n"
+                                     "</Array>" % (message_time, student_id, "true" if talking else "false"))
+
+
+def get_pause_status_changed(message_time, student_id, paused):
+    return get_message(message_time, "<Array>\n<String>updateVideoPauseStatus</String>\n<Number>%s</Number>\n"
+                                     "<String>%s</String>\n<Object>\n<time>%d</time>\n</Object>\n</Array>"
+                       % (student_id, "true" if paused else "false", message_time))
+
+
+def get_video_removed(message_time, student_id):
+    return get_message(message_time, "<Array>\n<String>removeVideo</String>\n<Number>%s</Number>\n<Object>\n"
+                                     "<time>%d</time>\n</Object>\n</Array>" % (student_id, message_time))
+
+
+def get_chat_message(message_time, student_pid, text):
+    return get_message(message_time, "<Array>\n<String>chatMessage</String>\n<Object>\n<fromPID>%s</fromPID>\n"
+                                     "<text>%s</text>\n<when>%d</when>\n</Object>\n</Array>"
+                       % (student_pid, escape(text), RECORDING_START_TIME * 1000 + message_time))
+
+
+def get_other_message(message_time, random_numbers):
+    return get_message(message_time, "<Array>\n<String>%s</String>\n<Object>\n<data>%s</data>\n"
+                                     "<time>%d</time>\n</Object>\n</Array>"
+                       % (random_numbers.choice(OTHER_MESSAGE_TYPES), "x" * random_numbers.randint(20, 400),
+                          message_time))
+
+
+def get_session_events(random_numbers, student_id, student_pid, start, end, on_camera,
+                       mic_toggles_per_minute=MIC_TOGGLES_PER_MINUTE, chats_per_minute=CHATS_PER_MINUTE):
+    '''
+    the indexstream, ftstage and ftchat messages for one login of one
+    participant, from when they join (start) to when they leave (end)
+    '''
+    index_messages = []
+    ftstage_messages = []
+    chat_messages = []
+
+    if on_camera and start + 5000 < end:
+        camera_start = start + random_numbers.randint(100, 5000)
+        index_messages.append((camera_start, get_stream_added(camera_start, student_id,
+                                                              random_numbers.randint(1, 10 ** 6))))
+        # a pause stop is always recorded just after the camera starts
+        first_stop = camera_start + random_numbers.randint(1, 90)
+        ftstage_messages.append((first_stop, get_pause_status_changed(first_stop, student_id, False)))
+        pause_time = camera_start + 1000
+        while True:
+            pause_time += random_numbers.randint(20000, 600000)
+            pause_length = random_numbers.randint(1000, 60000)
+            if pause_time + pause_length >= end - 2000:
+                break
+            ftstage_messages.append((pause_time, get_pause_status_changed(pause_time, student_id, True)))
+            pause_time += pause_length
+            ftstage_messages.append((pause_time, get_pause_status_changed(pause_time, student_id, False)))
+        # some participants turn their camera off before they leave, the rest just lose it when they leave
+        if random_numbers.random() < 0.5:
+            camera_stop = end - 100
+            index_messages.append((camera_stop, get_stream_removed(camera_stop, student_id)))
+            ftstage_messages.append((camera_stop, get_video_removed(camera_stop, student_id)))
+
+    talk_time = start
+    while mic_toggles_per_minute > 0:
+        talk_time += int(random_numbers.expovariate(mic_toggles_per_minute / 60000.0)) + 1
+        if talk_time >= end - 1000:
+            break
+        index_messages.append((talk_time, get_voip_status_changed(talk_time, student_id, True)))
+        talk_time = min(talk_time + random_numbers.randint(200, 20000), end - 1)
+        index_messages.append((talk_time, get_voip_status_changed(talk_time, student_id, False)))
+
+    chat_time = start
+    while chats_per_minute > 0:
+        chat_time += int(random_numbers.expovariate(chats_per_minute / 60000.0)) + 1
+        if chat_time >= end:
+            break
+        text = " ".join(random_numbers.choice(CHAT_WORDS) for word in range(random_numbers.randint(1, 6)))
+        chat_messages.append((chat_time, get_chat_message(chat_time, student_pid, text)))
+
+    index_messages.append((end, get_user_deleted(end, student_id)))
+    return index_messages, ftstage_messages, chat_messages
+
+
+def save_xml_file(file_path, messages):
+    with open(file_path, "w") as outfile:
+        outfile.write('<?xml version="1.0" encoding="utf-8"?>\n<root>\n')
+        for message_time, message in messages:
+            outfile.write(message)
+        outfile.write("</root>\n")
+
+
+def save_synthetic_recording(recording_folder_path, participants=20, minutes=60, seed=0,
+                             reconnect_rate=RECONNECT_RATE, mic_toggles_per_minute=MIC_TOGGLES_PER_MINUTE,
+                             chats_per_minute=CHATS_PER_MINUTE, camera_rate=CAMERA_RATE, chat_pods=CHAT_PODS,
+                             other_messages_per_minute=OTHER_MESSAGES_PER_MINUTE):
+    '''
+    writes a recording with an instructor and the given number of
+    participants, each of whom joins near the start of class and sometimes
+    loses their connection and logs back in under a new id.
+
+    reconnect_rate is the chance a participant logs back in (again),
+    mic_toggles_per_minute and chats_per_minute are per participant and
+    camera_rate is the chance a participant turns their camera on. the chat
+    messages are dealt out over chat_pods ftchat files, and
+    other_messages_per_minute adds messages the extractor ignores (whiteboard,
+    pod layout...) to indexstream.xml. returns the number of messages written
+    to each file
+    '''
+    random_numbers = random.Random(seed)
+    os.makedirs(recording_folder_path, exist_ok=True)
+    end_of_class_time = minutes * 60 * 1000
+
+    index_messages = []
+    ftstage_messages = []
+    chat_messages = []
+    next_id = 1
+    instructor_id = None
+    for participant in range(participants + 1):
+        # letters on the end keep every name different, names can't have numbers in them
+        name = "%s %s%s%s" % (random_numbers.choice(FIRST_NAMES), random_numbers.choice(LAST_NAMES),
+                              chr(65 + participant % 26), chr(97 + participant // 26 % 26))
+        join_times = [0 if participant == 0 else random_numbers.randint(0, end_of_class_time // 10)]
+        while random_numbers.random() < reconnect_rate and join_times[-1] < end_of_class_time * 0.8:
+            join_times.append(random_numbers.randint(join_times[-1] + 1000, int(end_of_class_time * 0.9)))
+
+        for login, start in enumerate(join_times):
+            end = join_times[login + 1] - 500 if login + 1 < len(join_times) else end_of_class_time - 10
+            student_id, student_pid = str(next_id), str(1000 + next_id)
+            next_id += 1
+            if instructor_id is None:
+                instructor_id = student_id
+            # logging back in adds a number to the name
+            full_name = name if login == 0 else "%s %d" % (name, login)
+            index_messages.append((start, get_user_added(start, full_name, student_id, student_pid)))
+            on_camera = participant == 0 or random_numbers.random() < camera_rate
+            session_messages = get_session_events(random_numbers, student_id, student_pid, start, end, on_camera,
+                                                  mic_toggles_per_minute, chats_per_minute)
+            index_messages.extend(session_messages[0])
+            ftstage_messages.extend(session_messages[1])
+            chat_messages.extend(session_messages[2])
+
+    for other_message in range(int(other_messages_per_minute * minutes)):
+        message_time = random_numbers.randint(0, end_of_class_time)
+        index_messages.append((message_time, get_other_message(message_time, random_numbers)))
+
+    start_date = time.strftime("%a %b %d %H:%M:%S %Y", time.gmtime(RECORDING_START_TIME))
+    header_messages = [
+        (0, get_message(0, "<Array>\n<String>setStartTime</String>\n<Number>0</Number>\n<String>%s</String>\n"
+                           "</Array>" % start_date)),
+        (0, get_message(0, "<Object>\n<myID>%s</myID>\n</Object>" % instructor_id))
+    ]
+    stop_message = (end_of_class_time, get_message(end_of_class_time, "<Array>\n<String>__stop__</String>\n"
+                                                                      "<Number>%d</Number>\n</Array>"
+                                                   % end_of_class_time))
+    index_messages.sort(key=lambda message: message[0])
+    ftstage_messages.sort(key=lambda message: message[0])
+    chat_messages.sort(key=lambda message: message[0])
+
+    save_xml_file(recording_folder_path + "indexstream.xml", header_messages + index_messages + [stop_message])
+    save_xml_file(recording_folder_path + "ftstage1.xml", ftstage_messages)
+    for chat_pod in range(chat_pods):
+        save_xml_file(recording_folder_path + "ftchat%d.xml" % (chat_pod + 1), chat_messages[chat_pod::chat_pods])
+
+    return {
+        'indexstream': len(header_messages) + len(index_messages) + 1,
+        'ftstage': len(ftstage_messages),
+        'ftchat': len(chat_messages)
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="write a synthetic Adobe Connect recording")
+    parser.add_argument("recording_folder_path")
+    parser.add_argument("participants", type=int)
+    parser.add_argument("minutes", type=int)
+    parser.add_argument("seed", type=int, nargs="?", default=0)
+    parser.add_argument("--reconnect-rate", type=float, default=RECONNECT_RATE)
+    parser.add_argument("--mic-toggles-per-minute", type=float, default=MIC_TOGGLES_PER_MINUTE)
+    parser.add_argument("--chats-per-minute", type=float, default=CHATS_PER_MINUTE)
+    parser.add_argument("--camera-rate", type=float, default=CAMERA_RATE)
+    parser.add_argument("--chat-pods", type=int, default=CHAT_PODS)
+    parser.add_argument("--other-messages-per-minute", type=float, default=OTHER_MESSAGES_PER_MINUTE)
+    args = parser.parse_args()
+    save_synthetic_recording(os.path.join(args.recording_folder_path, ""), args.participants, args.minutes,
+                             args.seed, args.reconnect_rate, args.mic_toggles_per_minute, args.chats_per_minute,
+                             args.camera_rate, args.chat_pods, args.other_messages_per_minute)
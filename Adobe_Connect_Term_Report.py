@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Adds up the participation reports of every session of a class into one term
+report. Participants are matched across sessions by their name with any
+numbers, doubled spaces and capitals taken out, so "Ana Brown2" in one
+session and "ana brown" in another are the same student. For each student
+the term report has the number of sessions they took part in, their total
+minutes on camera, paused and on microphone, their total chat messages, the
+average of their session grades and the fractions of class averaged over
+every session of the term (a missed session counts as 0), and a term grade
+worked out by get_participation_grades from the term totals.
+
+--policies regrades every session with other grading policies (see
+GRADING_POLICIES) and saves each student's mean session grade under each of
+them side by side in term_policy_grades.csv. The students' camera,
+microphone and chat numbers of every session are kept as one (sessions,
+metrics, students) matrix, so every session of the term is graded by every
+policy at once. This matrix is only kept with --policies, and it grows
+with the number of sessions.
+
+Sessions are read one at a time and added onto running totals, so without
+--policies memory only grows with the number of students, not the number of
+sessions. The sessions can be made by get_results_summary (from the parsed
+event cache when it has the recording already) or read from
+participation_report.csv files made earlier, for example by
+Adobe_Connect_Batch_Reports.py.
+
+A session only counts as attended by a student whose row has some camera,
+paused camera, microphone or chat time in it. With a roster the session
+reports have a row of zeroes for every student who missed the session, and
+those rows are not counted as attending it.
+
+usage: Adobe_Connect_Term_Report.py recordings_root/ reports_root/ [--cache-folder cache/]
+                                    [--policies zscore,percentile,capped_linear,weighted]
+       Adobe_Connect_Term_Report.py --from-reports reports_root/ [--policies ...]
+"""
+
+import argparse
+import csv
+import os
+
+import numpy as np
+
+from Adobe_Connect_Batch_Reports import find_recording_folders, get_report_folder_path
+from Adobe_Connect_Participation_Extractor import (GRADING_POLICIES, INSTRUCTOR_TITLE, get_code, get_name_key,
+                                                   get_normalized_name, get_participation_grades, get_policy_grades,
+                                                   get_results_summary, save_report_csv)
+
+# the columns of a session report that are added up, and their place in the report rows
+TERM_TOTAL_COLUMNS = {
+    'grade': 1,
+    'camera_minutes': 2,
+    'paused_minutes': 3,
+    'fraction_of_class_on_camera': 4,
+    'microphone_minutes': 6,
+    'fraction_of_class_on_microphone': 7,
+    'messages': 9,
+    'fraction_of_messages': 10
+}
+
+# the columns graded, in GRADE_METRICS order
+GRADED_COLUMNS = (2, 6, 9)
+
+# a session counts as attended when any of these columns (camera, paused, microphone, chat) is over 0
+ACTIVITY_COLUMNS = (2, 3, 6, 9)
+
+
+def get_empty_term_totals(keep_session_metrics=False):
+    '''
+    every participant gets a code (their place in 'names') the first time
+    they are seen, and the totals are numpy arrays indexed by code that grow
+    when there are more participants than room for them. the graded numbers
+    of each session are only kept with keep_session_metrics, for regrading
+    with other policies
+    '''
+    term_totals = {
+        'name_codes': {},
+        'names': [],
+        'is_instructor': [],
+        'sessions': 0,
+        'session_metrics': [] if keep_session_metrics else None,
+        'sessions_attended': np.zeros(64, dtype=np.int64)
+    }
+    for column in TERM_TOTAL_COLUMNS:
+        term_totals[column] = np.zeros(64)
+    return term_totals
+
+
+def add_session_to_term_totals(term_totals, session_results):
+    '''
+    session_results are the rows of a session report, headers first, as
+    returned by get_results_summary. the session's columns are added onto
+    the totals of all of its participants at once. the session and its grade
+    only count towards the sessions attended and mean session grade of
+    participants with some activity in it (see ACTIVITY_COLUMNS)
+    '''
+    rows = session_results[1:]
+    names = term_totals['names']
+    codes = []
+    for row in rows:
+        participant_name = row[0]
+        is_instructor = participant_name.startswith(INSTRUCTOR_TITLE)
+        if is_instructor:
+            participant_name = participant_name[len(INSTRUCTOR_TITLE):]
+        name_count = len(names)
+        code = get_code(term_totals['name_codes'], names, get_name_key(participant_name))
+        if code == name_count:
+            # the name as first seen is the one shown in the report
+            names[code] = get_normalized_name(participant_name)
+            term_totals['is_instructor'].append(is_instructor)
+        elif is_instructor:
+            term_totals['is_instructor'][code] = True
+        codes.append(code)
+    codes = np.array(codes, dtype=np.int64)
+    attended = np.array([any(float(row[index]) > 0 for index in ACTIVITY_COLUMNS) for row in rows], dtype=bool)
+
+    # the graded numbers of the session's students who attended it, for regrading with other policies
+    if term_totals['session_metrics'] is not None:
+        students = np.array([not row[0].startswith(INSTRUCTOR_TITLE) for row in rows], dtype=bool) & attended
+        term_totals['session_metrics'].append(
+            (codes[students], np.array([[float(row[index]) for index in GRADED_COLUMNS] for row in rows],
+                                       dtype=np.float64).reshape(-1, len(GRADED_COLUMNS))[students].T))
+
+    if len(names) > len(term_totals['sessions_attended']):
+        size = max(len(names), 2 * len(term_totals['sessions_attended']))
+        for column in ['sessions_attended'] + list(TERM_TOTAL_COLUMNS):
+            grown_totals = np.zeros(size, dtype=term_totals[column].dtype)
+            grown_totals[:len(term_totals[column])] = term_totals[column]
+            term_totals[column] = grown_totals
+
+    term_totals['sessions'] += 1
+    np.add.at(term_totals['sessions_attended'], codes[attended], 1)
+    for column, index in TERM_TOTAL_COLUMNS.items():
+        values = np.array([float(row[index]) for row in rows])
+        if column == 'grade':
+            values = values * attended
+        np.add.at(term_totals[column], codes, values)
+
+
+def get_term_results(term_totals):
+    '''
+    the rows of the term report, headers first, then participants sorted the
+    same way as the session reports. instructors are not graded, like in the
+    session reports. a roster student who never attended has a mean session
+    grade of 0
+    '''
+    participant_count = len(term_totals['names'])
+    is_instructor = np.array(term_totals['is_instructor'], dtype=bool)
+    display_names = [INSTRUCTOR_TITLE + name if instructor else name
+                     for name, instructor in zip(term_totals['names'], is_instructor)]
+    totals = {column: term_totals[column][:participant_count] for column in
+              ['sessions_attended'] + list(TERM_TOTAL_COLUMNS)}
+    sessions = max(term_totals['sessions'], 1)
+
+    # get_participation_grades takes out one instructor, so any others are taken out before it
+    students = np.flatnonzero(~is_instructor)
+    graded = students.tolist() + np.flatnonzero(is_instructor)[:1].tolist()
+    instructor_name = display_names[graded[-1]] if is_instructor.any() else None
+    graded_totals = [{display_names[code]: totals[column][code] for code in graded}
+                     for column in ('camera_minutes', 'microphone_minutes', 'messages')]
+    if instructor_name is None:
+        # a term without an instructor is graded with a placeholder that is taken out again
+        instructor_name = INSTRUCTOR_TITLE
+        for column_totals in graded_totals:
+            column_totals[instructor_name] = 0
+    term_grades = get_participation_grades(*graded_totals, instructor_name) if len(students) else {}
+
+    results = []
+    for code, participant_name in enumerate(display_names):
+        results.append([
+            participant_name,
+            int(totals['sessions_attended'][code]),
+            term_grades.get(participant_name, 0),
+            totals['grade'][code] / max(totals['sessions_attended'][code], 1),
+            totals['camera_minutes'][code],
+            totals['paused_minutes'][code],
+            totals['fraction_of_class_on_camera'][code] / sessions,
+            totals['microphone_minutes'][code],
+            totals['fraction_of_class_on_microphone'][code] / sessions,
+            int(totals['messages'][code]),
+            totals['fraction_of_messages'][code] / sessions
+        ])
+
+    # sort orders by student name
+    results.sort()
+    results.sort(key=lambda n: n[0].split()[1] if len(n[0].split()) > 1 else n[0])
+
+    headers = [
+        "Participant",
+        "Sessions Attended",
+        "Term Participation Grade",
+        "Mean Session Grade",
+        "Minutes on Camera",
+        "Minutes with Camera Paused",
+        "Mean Fraction of Class Time on Camera",
+        "Minutes on Microphone",
+        "Mean Fraction of Class Time on Microphone",
+        "Chat Messages Sent",
+        "Mean Fraction of Messages Sent"
+    ]
+    results.insert(0, headers)
+    return results
+
+
+def get_term_policy_results(term_totals, policies):
+    '''
+    the rows of term_policy_grades.csv, headers first: each student's mean
+    session grade under each policy, over the sessions they attended. a
+    student missing from a session is nan in that session's metrics, which
+    keeps them out of its class means
+    '''
+    participant_count = len(term_totals['names'])
+    metrics = np.full((len(term_totals['session_metrics']), len(GRADED_COLUMNS), participant_count), np.nan)
+    for session, (codes, session_metrics) in enumerate(term_totals['session_metrics']):
+        metrics[session][:, codes] = session_metrics
+    policy_grades = get_policy_grades(metrics, policies)
+
+    attended = ~np.isnan(metrics[:, 0])
+    sessions_attended = attended.sum(axis=0)
+    results = []
+    for code in np.flatnonzero(sessions_attended):
+        row = [term_totals['names'][code], int(sessions_attended[code])]
+        for policy in policies:
+            row.append(float(policy_grades[policy][attended[:, code], code].mean()))
+        results.append(row)
+
+    # sort orders by student name
+    results.sort()
+    results.sort(key=lambda n: n[0].split()[1] if len(n[0].split()) > 1 else n[0])
+    results.insert(0, ["Participant", "Sessions Attended"] +
+                   ["Mean Session Grade (%s)" % policy for policy in policies])
+    return results
+
+
+def iter_session_results(recordings_root_path, reports_root_path, cache_folder_path=None):
+    # makes (or reads from the cache) the report of each recording under the root, one at a time
+    for recording_folder_path in find_recording_folders(recordings_root_path, [reports_root_path, cache_folder_path]):
+        report_folder_path = get_report_folder_path(recording_folder_path, recordings_root_path, reports_root_path)
+        os.makedirs(report_folder_path, exist_ok=True)
+        yield get_results_summary(recording_folder_path, report_folder_path, cache_folder_path=cache_folder_path)[0]
+
+
+def iter_saved_session_results(reports_root_path):
+    # reads every participation_report.csv under the root, one at a time
+    for folder_path, folder_names, file_names in os.walk(reports_root_path):
+        folder_names.sort()
+        if "participation_report.csv" in file_names:
+            with open(os.path.join(folder_path, "participation_report.csv"), newline="") as infile:
+                yield list(csv.reader(infile))
+
+
+def get_term_report(session_results, report_file_path=None, policies=None, policy_report_file_path=None):
+    '''
+    session_results is any iterable of session reports (see
+    iter_session_results and iter_saved_session_results). the term report is
+    saved to report_file_path if one is given. with a list of policies the
+    rows of get_term_policy_results are returned too, and saved to
+    policy_report_file_path if one is given
+    '''
+    term_totals = get_empty_term_totals(keep_session_metrics=bool(policies))
+    for results in session_results:
+        add_session_to_term_totals(term_totals, results)
+    term_results = get_term_results(term_totals)
+    if report_file_path is not None:
+        save_report_csv(term_results, report_file_path)
+    if not policies:
+        return term_results
+    policy_results = get_term_policy_results(term_totals, policies)
+    if policy_report_file_path is not None:
+        save_report_csv(policy_results, policy_report_file_path)
+    return term_results, policy_results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="add up the participation reports of every session of a class")
+    parser.add_argument("recordings_root_path", nargs="?", default=None,
+                        help="folder of recordings (not needed with --from-reports)")
+    parser.add_argument("reports_root_path")
+    parser.add_argument("--cache-folder", dest="cache_folder_path", default=None,
+                        help="parsed event cache shared by all sessions (default: one inside each report folder)")
+    parser.add_argument("--from-reports", action="store_true",
+                        help="use the participation_report.csv files already under reports_root_path")
+    parser.add_argument("--policies", default=None,
+                        help="comma separated grading policies to compare in term_policy_grades.csv (from %s)" %
+                             ", ".join(GRADING_POLICIES))
+    args = parser.parse_args()
+    if args.recordings_root_path is None and not args.from_reports:
+        parser.error("recordings_root_path is needed unless --from-reports is given")
+    if args.cache_folder_path is not None:
+        args.cache_folder_path = os.path.join(args.cache_folder_path, "")
+
+    if args.from_reports:
+        session_results = iter_saved_session_results(args.reports_root_path)
+    else:
+        session_results = iter_session_results(args.recordings_root_path, args.reports_root_path,
+                                               args.cache_folder_path)
+    os.makedirs(args.reports_root_path, exist_ok=True)
+    term_report_file_path = os.path.join(args.reports_root_path, "term_report.csv")
+    if args.policies:
+        term_results = get_term_report(session_results, term_report_file_path, args.policies.split(","),
+                                       os.path.join(args.reports_root_path, "term_policy_grades.csv"))[0]
+    else:
+        term_results = get_term_report(session_results, term_report_file_path)
+    print("%d participants" % (len(term_results) - 1))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of Adobe_Connect_Batch_Reports.py on a root folder of synthetic
+recordings.
+
+usage: python -m unittest test_Adobe_Connect_Batch_Reports   (or python -m pytest)
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import zipfile
+
+import Adobe_Connect_Batch_Reports as batch
+from test_Adobe_Connect_Participation_Extractor import RecordingTestCase
+
+DYING_SESSION_NAME = "dies"
+get_session_report = batch.get_session_report
+
+
+def get_dying_session_report(recording_folder_path, *args):
+    # stands in for get_session_report, killing the worker process on one session
+    if recording_folder_path.rstrip("/").endswith(DYING_SESSION_NAME):
+        os._exit(1)
+    return get_session_report(recording_folder_path, *args)
+
+
+class BatchReportsTest(RecordingTestCase):
+    participants = 5
+    minutes = 10
+
+    def setUp(self):
+        self.recordings_root_path = os.path.join(tempfile.mkdtemp(dir=self.temporary_folder_path), "")
+        self.reports_root_path = os.path.join(self.recordings_root_path, "reports", "")
+
+    def add_recording(self, relative_path):
+        shutil.copytree(self.recording_folder_path, os.path.join(self.recordings_root_path, relative_path))
+
+    def add_recording_archive(self, relative_path):
+        with zipfile.ZipFile(os.path.join(self.recordings_root_path, relative_path), "w") as archive:
+            for file_name in os.listdir(self.recording_folder_path):
+                archive.write(self.recording_folder_path + file_name, "session/" + file_name)
+
+    def get_manifest_rows(self, **kwargs):
+        kwargs.setdefault('workers', 2)
+        kwargs.setdefault('make_plots', False)
+        manifest = batch.get_batch_reports(self.recordings_root_path, self.reports_root_path, **kwargs)
+        return {os.path.relpath(row[0], self.recordings_root_path): row for row in manifest[1:]}
+
+    def test_every_recording_gets_a_report(self):
+        self.add_recording("week1/monday")
+        self.add_recording("week2")
+        self.add_recording_archive("week3.zip")
+        rows = self.get_manifest_rows()
+        self.assertEqual(sorted(rows), ["week1/monday", "week2", "week3.zip"])
+        for relative_path, row in rows.items():
+            self.assertEqual(row[2], "ok", row[5])
+            self.assertEqual(row[3], self.participants + 1)
+            self.assertTrue(os.path.exists(row[1] + "participation_report.csv"))
+        self.assertEqual(rows["week3.zip"][1], os.path.join(self.reports_root_path, "week3", ""))
+        self.assertTrue(os.path.exists(self.reports_root_path + "batch_manifest.csv"))
+
+    def test_failed_session_does_not_stop_the_batch(self):
+        self.add_recording("good")
+        os.makedirs(self.recordings_root_path + "bad")
+        with open(self.recordings_root_path + "bad/indexstream.xml", "w") as outfile:
+            outfile.write("<root><Message")
+        rows = self.get_manifest_rows()
+        self.assertEqual(rows["good"][2], "ok")
+        self.assertEqual(rows["bad"][2], "failed")
+        self.assertTrue(rows["bad"][5])
+
+    def test_sessions_are_run_again_when_a_worker_dies(self):
+        for relative_path in ("a", DYING_SESSION_NAME, "c", "d"):
+            self.add_recording(relative_path)
+        with mock.patch.object(batch, 'get_session_report', get_dying_session_report):
+            rows = self.get_manifest_rows()
+        self.assertEqual({relative_path: row[2] for relative_path, row in rows.items()},
+                         {"a": "ok", DYING_SESSION_NAME: "failed", "c": "ok", "d": "ok"})
+        self.assertIn("BrokenProcessPool", rows[DYING_SESSION_NAME][5])
+
+    def test_reports_and_cache_folders_are_not_searched(self):
+        self.add_recording("session")
+        cache_folder_path = os.path.join(self.recordings_root_path, "cache", "")
+        # a copy of a recording left in each of them would otherwise be reported as a session
+        shutil.copytree(self.recording_folder_path, self.reports_root_path + "copy")
+        shutil.copytree(self.recording_folder_path, cache_folder_path + "copy")
+        rows = self.get_manifest_rows(cache_folder_path=cache_folder_path)
+        self.assertEqual(list(rows), ["session"])
+        self.assertEqual(batch.find_recording_folders(self.recordings_root_path),
+                         [self.recordings_root_path + relative_path + "/"
+                          for relative_path in ("cache/copy", "reports/copy", "session")])
+
+    def test_roster_is_used_for_every_session(self):
+        self.add_recording("monday")
+        self.add_recording("tuesday")
+        roster_file_path = self.recordings_root_path + "roster.csv"
+        with open(roster_file_path, "w") as outfile:
+            outfile.write("Name\nNever Joined\n")
+        rows = self.get_manifest_rows(roster_file_path=roster_file_path)
+        for row in rows.values():
+            self.assertEqual(row[2], "ok", row[5])
+            # the participants, the instructor and the student who never joined
+            self.assertEqual(row[3], self.participants + 2)
+            with open(row[1] + "participation_report.csv") as infile:
+                self.assertIn("Never Joined", infile.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
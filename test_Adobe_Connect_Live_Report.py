@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of Adobe_Connect_Live_Report.py on a synthetic recording written a
+little at a time, as adobe connect writes it during a class.
+
+usage: python -m unittest test_Adobe_Connect_Live_Report   (or python -m pytest)
+"""
+
+import glob
+import os
+import random
+import shutil
+import unittest
+
+import Adobe_Connect_Live_Report as live
+import Adobe_Connect_Participation_Extractor as extractor
+from test_Adobe_Connect_Participation_Extractor import RecordingTestCase
+
+
+class LiveReportTest(RecordingTestCase):
+
+    def get_file_contents(self):
+        file_contents = {}
+        for file_path in sorted(glob.glob(self.recording_folder_path + "*.xml")):
+            with open(file_path, 'rb') as infile:
+                file_contents[os.path.basename(file_path)] = infile.read()
+        return file_contents
+
+    def get_live_folder_path(self):
+        live_folder_path = os.path.join(self.get_report_folder_path(), "live", "")
+        os.makedirs(live_folder_path)
+        return live_folder_path
+
+    def test_live_report_in_random_chunks_matches_batch(self):
+        live_folder_path = self.get_live_folder_path()
+        file_contents = self.get_file_contents()
+        written = dict.fromkeys(file_contents, 0)
+
+        # every file grows by a random number of bytes between checks, so messages are cut off anywhere
+        live_state = live.get_empty_live_state(live_folder_path)
+        random_numbers = random.Random(1)
+        while any(written[file_name] < len(contents) for file_name, contents in file_contents.items()):
+            for file_name, contents in file_contents.items():
+                end = min(len(contents), written[file_name] + random_numbers.randint(0, len(contents) // 20 + 1))
+                with open(live_folder_path + file_name, 'ab') as outfile:
+                    outfile.write(contents[written[file_name]:end])
+                written[file_name] = end
+            live.update_live_state(live_state)
+            live.get_live_results(live_state)
+        live.update_live_state(live_state)
+
+        self.assert_same_report(live.get_live_results(live_state)[0], self.get_results())
+
+    def test_identities_are_only_worked_out_again_after_identity_events(self):
+        live_folder_path = self.get_live_folder_path()
+        for file_name, contents in self.get_file_contents().items():
+            with open(live_folder_path + file_name, 'wb') as outfile:
+                outfile.write(contents)
+        live_state = live.get_empty_live_state(live_folder_path)
+        live.update_live_state(live_state)
+        identities = live.get_live_identities(live_state)
+        self.assertIsNotNone(identities)
+
+        live.get_live_results(live_state)
+        self.assertIs(live.get_live_identities(live_state), identities)
+        # a camera event leaves them as they were, a participant joining does not
+        live.add_index_stream_event(live_state, extractor.IndexStreamEvent('streamAdded', '1', None, 1, None))
+        self.assertIs(live.get_live_identities(live_state), identities)
+        user_added = live_state['index']['userAdded'][-1]
+        live.add_index_stream_event(live_state, user_added._replace(id='new', pid='new', value='New Student'))
+        new_identities = live.get_live_identities(live_state)
+        self.assertIsNot(new_identities, identities)
+        self.assertEqual(new_identities['student_ids']['new'], 'New Student')
+
+    def test_live_report_reads_the_same_ftstage_file_as_the_extractor(self):
+        live_folder_path = self.get_live_folder_path()
+        self.assertEqual(live.get_live_file_paths(live_folder_path), [live_folder_path + "indexstream.xml"])
+
+        ftstage_file_path = extractor.get_ftstage_file_path(self.recording_folder_path)
+        for file_name in ("ftstage9.xml", "ftstage1.xml", "ftstage5.xml"):
+            shutil.copyfile(ftstage_file_path, live_folder_path + file_name)
+        self.assertEqual(extractor.get_ftstage_file_path(live_folder_path), live_folder_path + "ftstage1.xml")
+        self.assertEqual(live.get_live_file_paths(live_folder_path),
+                         [live_folder_path + "indexstream.xml", live_folder_path + "ftstage1.xml"])
+
+
+if __name__ == '__main__':
+    unittest.main()
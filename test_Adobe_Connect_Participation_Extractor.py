@@ -0,0 +1,791 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of Adobe_Connect_Participation_Extractor.py on small recordings made by
+Adobe_Connect_Synthetic_Recording.py. The faster ways of reading a recording
+and working out a report are checked against the slower ones they replaced,
+and the extra outputs against the report they come from.
+
+usage: python -m unittest test_Adobe_Connect_Participation_Extractor   (or python -m pytest)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+import unittest
+import zipfile
+
+import numpy as np
+
+import Adobe_Connect_Participation_Extractor as extractor
+from Adobe_Connect_Synthetic_Recording import save_synthetic_recording
+
+# the random event sets the numpy calculations are checked on
+RANDOM_EVENT_SETS = 3000
+
+
+def get_event_store_from_events(*event_groups):
+    # an event store holding the events of index or ftstage event dicts, as the readers would add them
+    event_store = extractor.get_empty_event_store()
+    for events_by_type in event_groups:
+        for events in events_by_type.values():
+            for event in events:
+                extractor.add_to_event_store(event_store, event)
+    return extractor.get_finished_event_store(event_store)
+
+
+def get_random_camera_events(random_numbers):
+    # a few ids starting and stopping cameras and pauses at random, often at the same or nearly the same times
+    ids = [str(student_id) for student_id in range(random_numbers.randint(1, 5))]
+    time_span = random_numbers.choice([50, 300, 5000, 10 ** 12])
+    first_time = random_numbers.choice([0, 0, 10 ** 12])
+
+    def get_events(event_type, count):
+        return [extractor.IndexStreamEvent(event_type, random_numbers.choice(ids), None,
+                                           first_time + random_numbers.randint(0, time_span), None)
+                for _ in range(count)]
+
+    index_events = extractor.get_empty_index_stream_events()
+    index_events['streamAdded'] = get_events('streamAdded', random_numbers.randint(0, 6))
+    index_events['streamRemoved'] = get_events('streamRemoved', random_numbers.randint(0, 4))
+    index_events['userDeleted'] = get_events('userDeleted', random_numbers.randint(0, 4))
+    ftstage_events = {
+        'updateVideoPauseStatus': [extractor.FtstageEvent('updateVideoPauseStatus', random_numbers.choice(ids),
+                                                          first_time + random_numbers.randint(0, time_span),
+                                                          random_numbers.random() < 0.5)
+                                   for _ in range(random_numbers.randint(0, 10))],
+        'removeVideo': [extractor.FtstageEvent('removeVideo', random_numbers.choice(ids),
+                                               first_time + random_numbers.randint(0, time_span), None)
+                        for _ in range(random_numbers.randint(0, 3))]
+    }
+    # pause stops right around a camera start are where the camera rules are most particular
+    if index_events['streamAdded'] and random_numbers.random() < 0.5:
+        for _ in range(3):
+            camera_start = random_numbers.choice(index_events['streamAdded'])
+            ftstage_events['updateVideoPauseStatus'].append(extractor.FtstageEvent(
+                'updateVideoPauseStatus', camera_start.id, camera_start.time + random_numbers.randint(-2, 102),
+                False))
+    return index_events, ftstage_events
+
+
+def get_random_microphone_events(random_numbers):
+    ids = [str(student_id) for student_id in range(random_numbers.randint(1, 5))]
+    time_span = random_numbers.choice([20, 300, 10 ** 12])
+    first_time = random_numbers.choice([0, 10 ** 12])
+    index_events = extractor.get_empty_index_stream_events()
+    index_events['userVoipStatusChanged'] = [
+        extractor.IndexStreamEvent('userVoipStatusChanged', random_numbers.choice(ids), None,
+                                   first_time + random_numbers.randint(0, time_span), random_numbers.random() < 0.5)
+        for _ in range(random_numbers.randint(0, 15))]
+    if random_numbers.random() < 0.5:
+        index_events['userVoipStatusChanged'].sort(key=lambda event: event.time)
+    student_ids = {student_id: "Student " + student_id for student_id in ids if random_numbers.random() < 0.7}
+    return index_events, student_ids
+
+
+def get_merged_milliseconds(intervals, merge_gap):
+    # the length of the union of the intervals, joining ones less than merge_gap apart
+    total_milliseconds = 0
+    merged_interval = None
+    for start_time, stop_time in sorted(intervals):
+        if merged_interval and start_time - merged_interval[1] < merge_gap:
+            merged_interval[1] = max(merged_interval[1], stop_time)
+            continue
+        if merged_interval:
+            total_milliseconds += merged_interval[1] - merged_interval[0]
+        merged_interval = [start_time, stop_time]
+    if merged_interval:
+        total_milliseconds += merged_interval[1] - merged_interval[0]
+    return total_milliseconds
+
+
+def get_result_or_error(function, *args):
+    try:
+        return function(*args)
+    except Exception as exception:
+        return type(exception)
+
+
+class RecordingTestCase(unittest.TestCase):
+    '''
+    makes a synthetic recording once for the tests of a class, with two chat
+    pods and messages the extractor ignores
+    '''
+    participants = 12
+    minutes = 20
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temporary_folder_path = tempfile.mkdtemp()
+        cls.recording_folder_path = os.path.join(cls.temporary_folder_path, "recording", "")
+        save_synthetic_recording(cls.recording_folder_path, participants=cls.participants, minutes=cls.minutes,
+                                 seed=1, chat_pods=2, other_messages_per_minute=100)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.temporary_folder_path)
+
+    def get_report_folder_path(self):
+        return os.path.join(tempfile.mkdtemp(dir=self.temporary_folder_path), "")
+
+    def get_results(self, recording_folder_path=None, **kwargs):
+        kwargs.setdefault('use_cache', False)
+        kwargs.setdefault('chat_workers', 1)
+        kwargs.setdefault('report_folder_file_path', self.get_report_folder_path())
+        return extractor.get_results_summary(recording_folder_path or self.recording_folder_path, **kwargs)[0]
+
+    def assert_same_event_store(self, event_store, expected_event_store):
+        self.assertEqual(sorted(event_store), sorted(expected_event_store))
+        for field, expected_values in expected_event_store.items():
+            if isinstance(expected_values, np.ndarray):
+                self.assertEqual(event_store[field].dtype, expected_values.dtype, field)
+                self.assertTrue(np.array_equal(event_store[field], expected_values), field)
+            else:
+                self.assertEqual(event_store[field], expected_values, field)
+
+    def assert_same_report(self, results, expected_results, tolerance=1e-9):
+        # the same rows in the same order, with every number within tolerance (relative once it is over 1)
+        self.assertEqual(results[0], expected_results[0])
+        self.assertEqual([row[0] for row in results[1:]], [row[0] for row in expected_results[1:]])
+        for row, expected_row in zip(results[1:], expected_results[1:]):
+            for header, value, expected_value in zip(results[0][1:], row[1:], expected_row[1:]):
+                self.assertAlmostEqual(value, expected_value, delta=tolerance * max(1, abs(expected_value)),
+                                       msg="%s %s" % (row[0], header))
+
+
+class IndexStreamTest(RecordingTestCase):
+
+    def test_streaming_read_matches_beautifulsoup(self):
+        self.assertEqual(extractor.get_index_stream_events(self.recording_folder_path, 'etree'),
+                         extractor.get_index_stream_events(self.recording_folder_path, 'beautifulsoup'))
+
+    def test_every_participant_is_in_the_report(self):
+        results = self.get_results()
+        self.assertEqual(results[0][0], "Participant")
+        # the participants and the instructor
+        self.assertEqual(len(results) - 1, self.participants + 1)
+        self.assertEqual(sum(row[0].startswith(extractor.INSTRUCTOR_TITLE) for row in results[1:]), 1)
+
+
+class ParserTest(RecordingTestCase):
+
+    def test_parsers_read_the_same_events(self):
+        expected_event_store = extractor.get_event_store(self.recording_folder_path, 'etree', chat_workers=1)
+        for parser in extractor.XML_PARSERS:
+            with self.subTest(parser=parser):
+                if parser == 'lxml':
+                    try:
+                        import lxml
+                    except ImportError:
+                        self.skipTest("lxml is not installed")
+                event_store = extractor.get_event_store(self.recording_folder_path, parser, chat_workers=1)
+                if parser == 'beautifulsoup':
+                    # it adds the events a type at a time, so the ids get their codes in another order
+                    self.assertEqual(extractor.get_recording_events_from_event_store(event_store),
+                                     extractor.get_recording_events_from_event_store(expected_event_store))
+                else:
+                    self.assert_same_event_store(event_store, expected_event_store)
+
+    def test_prefilter_keeps_only_messages_with_the_strings(self):
+        recording = (b'<root><Message time="0"><String>startDate</String></Message>'
+                     b'<Message time="1"><String>whiteboard</String></Message>'
+                     b'<Message time="2"><String>userAdded</String><String>userAdded</String></Message>'
+                     b'<Message/> userAdded between messages '
+                     b'<Message time="3"><Array><String>userAdded</String></Array></Message></root>')
+        spans = extractor.get_prefiltered_message_spans(recording, [b'userAdded'])
+        self.assertEqual([recording[start:end].split(b'"')[1] for start, end in spans], [b'0', b'2', b'3'])
+        self.assertEqual(extractor.get_prefiltered_message_spans(b'<root></root>', [b'userAdded']), [])
+
+    def test_prefilter_report_matches_etree(self):
+        self.assertEqual(self.get_results(parser='prefilter'), self.get_results(parser='etree'))
+
+    def test_unknown_parser_is_refused(self):
+        with self.assertRaises(ValueError):
+            extractor.get_index_stream_events(self.recording_folder_path, 'sax')
+
+
+class VectorizedCameraTest(RecordingTestCase):
+
+    def test_vectorized_camera_matches_loops(self):
+        event_store = extractor.get_event_store(self.recording_folder_path, chat_workers=1)
+        recording_events = extractor.get_recording_events_from_event_store(event_store)
+        self.assertEqual(extractor.get_camera_minutes_vectorized(event_store),
+                         extractor.get_camera_minutes_with_loops(recording_events['index'],
+                                                                 recording_events['ftstage']))
+
+        for seed in range(RANDOM_EVENT_SETS):
+            index_events, ftstage_events = get_random_camera_events(random.Random(seed))
+            expected_minutes = get_result_or_error(extractor.get_camera_minutes_with_loops, index_events,
+                                                   ftstage_events)
+            minutes = get_result_or_error(extractor.get_camera_minutes_vectorized,
+                                          get_event_store_from_events(index_events, ftstage_events))
+            if not isinstance(expected_minutes, tuple):
+                self.assertEqual(minutes, expected_minutes, seed)
+                continue
+            # the same ids in the same order, with the same types of numbers
+            for totals, expected_totals in zip(minutes, expected_minutes):
+                self.assertEqual(list(totals.items()), list(expected_totals.items()), seed)
+                self.assertEqual([type(total) for total in totals.values()],
+                                 [type(total) for total in expected_totals.values()], seed)
+
+    def test_vectorized_report_matches_loops(self):
+        self.assert_same_report(self.get_results(),
+                                self.get_results(parser='beautifulsoup',
+                                                 vectorized=False))
+
+
+class VectorizedMicrophoneTest(RecordingTestCase):
+
+    def test_vectorized_microphone_matches_loops(self):
+        event_store = extractor.get_event_store(self.recording_folder_path, chat_workers=1)
+        student_ids = extractor.get_identity_index(event_store['index'])['student_ids']
+        self.assertEqual(extractor.get_microphone_milliseconds_vectorized(event_store, student_ids),
+                         extractor.get_microphone_milliseconds_with_loops(
+                             extractor.get_recording_events_from_event_store(event_store)['index'], student_ids))
+
+        for seed in range(RANDOM_EVENT_SETS):
+            random_numbers = random.Random(seed)
+            index_events, student_ids = get_random_microphone_events(random_numbers)
+            event_store = get_event_store_from_events(index_events)
+            milliseconds = extractor.get_microphone_milliseconds_vectorized(event_store, student_ids)
+            expected_milliseconds = extractor.get_microphone_milliseconds_with_loops(index_events, student_ids)
+            self.assertEqual(list(milliseconds.items()), list(expected_milliseconds.items()), seed)
+            self.assertEqual([type(total) for total in milliseconds.values()],
+                             [type(total) for total in expected_milliseconds.values()], seed)
+
+            # bursts are merged like the union of each start paired with the next later stop of the same id
+            merge_gap = random_numbers.choice([0, 5, 100])
+            merged_milliseconds = extractor.get_microphone_milliseconds_vectorized(event_store, student_ids,
+                                                                                   merge_gap)
+            microphone_events = index_events['userVoipStatusChanged']
+            intervals = {}
+            for event in microphone_events:
+                if event.value:
+                    stop_time = next((stop.time for stop in microphone_events
+                                      if not stop.value and stop.id == event.id and stop.time > event.time),
+                                     event.time)
+                    intervals.setdefault(event.id, []).append((event.time, stop_time))
+            for student_id, total_milliseconds in merged_milliseconds.items():
+                self.assertEqual(total_milliseconds, get_merged_milliseconds(intervals.get(student_id, []),
+                                                                             merge_gap), seed)
+
+
+class EventStoreTest(RecordingTestCase):
+
+    def test_event_store_holds_what_the_readers_read(self):
+        event_store = extractor.get_event_store(self.recording_folder_path, chat_workers=1)
+        recording_events = extractor.get_recording_events_from_event_store(event_store)
+        self.assertEqual(recording_events['index'],
+                         extractor.get_index_stream_events(self.recording_folder_path, 'beautifulsoup'))
+        self.assertEqual(recording_events['ftstage'],
+                         extractor.get_ftstage_events(self.recording_folder_path, 'beautifulsoup'))
+        self.assertEqual(recording_events['chat']['chatMessage'],
+                         extractor.get_chat_messages(self.recording_folder_path, 'beautifulsoup', workers=1))
+        self.assertEqual(extractor.get_event_count(event_store, 'userVoipStatusChanged'),
+                         len(recording_events['index']['userVoipStatusChanged']))
+
+    def test_event_store_columns_are_compact(self):
+        event_store = extractor.get_event_store(self.recording_folder_path, chat_workers=1)
+        self.assertEqual({column: event_store[column].dtype.name for column in
+                          ('type', 'id', 'time', 'value', 'chat_pid', 'chat_time')},
+                         {'type': 'int8', 'id': 'int32', 'time': 'int64', 'value': 'bool', 'chat_pid': 'int32',
+                          'chat_time': 'float64'})
+        # each id is kept once and the events refer to it by code
+        self.assertEqual(len(event_store['ids']), len(set(event_store['ids'])))
+        self.assertEqual([event_store['id_codes'][student_id] for student_id in event_store['ids']],
+                         list(range(len(event_store['ids']))))
+        self.assertEqual(len(event_store['chat_text']), len(event_store['chat_time']))
+
+
+class ZipArchiveTest(RecordingTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # the files are in a folder inside the zip, as some downloads have them
+        cls.archive_path = os.path.join(cls.temporary_folder_path, "recording.zip")
+        with zipfile.ZipFile(cls.archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for file_name in sorted(os.listdir(cls.recording_folder_path)):
+                archive.write(cls.recording_folder_path + file_name, "session/" + file_name)
+
+    def test_zipped_recording_reads_like_its_folder(self):
+        for parser in ('etree', 'prefilter'):
+            with self.subTest(parser=parser):
+                self.assert_same_event_store(
+                    extractor.get_event_store(self.archive_path + "/", parser, chat_workers=1),
+                    extractor.get_event_store(self.recording_folder_path, parser, chat_workers=1))
+                self.assertEqual(self.get_results(self.archive_path + "/", parser=parser),
+                                 self.get_results(parser=parser))
+
+    def test_cache_key_follows_the_zip(self):
+        cache_folder_path = self.get_report_folder_path()
+        cache_key = extractor.get_recording_cache_key(self.archive_path + "/", cache_folder_path)
+        self.assertEqual(extractor.get_recording_cache_key(self.archive_path + "/", cache_folder_path), cache_key)
+        self.assertEqual([os.path.basename(file_path) for file_path in
+                          extractor.get_recording_file_paths(self.archive_path + "/")],
+                         [os.path.basename(file_path) for file_path in
+                          extractor.get_recording_file_paths(self.recording_folder_path)])
+
+    def test_zip_without_a_recording(self):
+        archive_path = os.path.join(self.get_report_folder_path(), "empty.zip")
+        with zipfile.ZipFile(archive_path, "w") as archive:
+            archive.writestr("notes.txt", "no recording here")
+        # there is no indexstream.xml in it
+        with self.assertRaises(KeyError):
+            self.get_results(archive_path + "/")
+
+
+class ConcurrentStagesTest(RecordingTestCase):
+
+    def test_concurrent_stages_match_sequential(self):
+        self.assert_same_event_store(extractor.get_event_store_concurrently(self.recording_folder_path),
+                                     extractor.get_event_store(self.recording_folder_path, chat_workers=1))
+        self.assertEqual(self.get_results(concurrent=True),
+                         self.get_results())
+
+    def test_stage_graph_gives_each_stage_what_it_needs(self):
+        stages = {
+            'total': (lambda double, square: double + square, ('double', 'square')),
+            'double': (lambda number: 2 * number, ('number',)),
+            'square': (lambda number: number * number, ('number',)),
+            'number': (lambda: 3, ())
+        }
+        expected_results = {'number': 3, 'double': 6, 'square': 9, 'total': 15}
+        self.assertEqual(extractor.run_stage_graph(stages, None), expected_results)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            profile = {'stages': {}}
+            self.assertEqual(extractor.run_stage_graph(stages, executor, profile), expected_results)
+            self.assertEqual(sorted(profile['stages']), sorted(stages))
+            with self.assertRaises(ValueError):
+                extractor.run_stage_graph({'total': (lambda missing: missing, ('missing',))}, executor)
+        with self.assertRaises(ValueError):
+            extractor.run_stage_graph({'total': (lambda missing: missing, ('missing',))}, None)
+
+
+class TimezoneTest(RecordingTestCase):
+
+    def test_class_timezone_moves_the_start_of_the_class_day(self):
+        event_store = extractor.get_event_store(self.recording_folder_path, chat_workers=1)
+        header = extractor.get_session_header(event_store)
+        class_header = extractor.get_session_header(event_store, target_timezone="America/Los_Angeles")
+        self.assertEqual(header['utc_offset'], 0)
+        self.assertEqual(class_header['utc_offset'], -7 * 3600 * 1000)
+        # the recording starts at the same moment, the class day starts at midnight in los angeles
+        self.assertEqual(class_header['recording_start_time'], header['recording_start_time'])
+        self.assertEqual(class_header['chat_start_time'] - header['chat_start_time'], 7 * 3600 * 1000)
+        self.assertEqual(class_header['target_timezone'], "America/Los_Angeles")
+        self.assertEqual(extractor.get_chat_start_timestamp(header['start_date'], "Greenwich", "America/Los_Angeles"),
+                         class_header['chat_start_time'])
+
+    def test_start_times_cache_is_bounded(self):
+        for day in range(1, 29):
+            for hour in range(24):
+                extractor.get_session_start_times("Tue Feb %2d %02d:00:00 2022" % (day, hour))
+        self.assertEqual(extractor.get_session_start_times.cache_info().currsize, extractor.SESSION_CACHE_SIZE)
+
+
+class EventCacheTest(RecordingTestCase):
+
+    def get_cache_file_paths(self, cache_folder_path):
+        return [cache_folder_path + file_name for file_name in os.listdir(cache_folder_path)
+                if extractor.RECORDING_CACHE_FILE_PATTERN.fullmatch(file_name)]
+
+    def test_cached_event_store_is_the_same(self):
+        cache_folder_path = self.get_report_folder_path()
+        expected_event_store = extractor.get_event_store(self.recording_folder_path, chat_workers=1)
+        # the first call parses the recording and saves it, the second loads what was saved
+        for run in ('parsed', 'loaded'):
+            with self.subTest(run=run):
+                self.assert_same_event_store(
+                    extractor.get_cached_event_store(self.recording_folder_path, cache_folder_path, chat_workers=1),
+                    expected_event_store)
+        expected_results = self.get_results()
+        for run in ('parsed', 'loaded'):
+            with self.subTest(run=run):
+                self.assertEqual(self.get_results(use_cache=True, cache_folder_path=cache_folder_path),
+                                 expected_results)
+
+    def test_eviction_only_removes_cache_files(self):
+        # a report folder used as the cache folder, with the report's own npz files in it
+        report_folder_path = self.get_report_folder_path()
+        self.get_results(report_folder_file_path=report_folder_path, use_cache=True,
+                         cache_folder_path=report_folder_path, columnar_format='npz', timelines=True)
+        with open(report_folder_path + "notes.npz", "wb") as outfile:
+            outfile.write(b"not a cache file")
+        cache_file_paths = self.get_cache_file_paths(report_folder_path)
+        self.assertEqual(len(cache_file_paths), 1)
+
+        extractor.evict_from_recording_cache(report_folder_path, 0)
+        self.assertEqual(self.get_cache_file_paths(report_folder_path), [])
+        for file_name in ("participation_report.npz", "participation_timelines.npz", "notes.npz",
+                          "cache_index.json"):
+            self.assertTrue(os.path.exists(report_folder_path + file_name), file_name)
+
+    def test_corrupt_cache_file_is_parsed_again(self):
+        cache_folder_path = self.get_report_folder_path()
+        expected_event_store = extractor.get_cached_event_store(self.recording_folder_path, cache_folder_path,
+                                                                chat_workers=1)
+        cache_file_path = self.get_cache_file_paths(cache_folder_path)[0]
+        with open(cache_file_path, "rb") as infile:
+            contents = infile.read()
+        for damage, damaged_contents in (('empty', b""), ('cut short', contents[:len(contents) // 2]),
+                                         ('not a zip', b"x" * 1000)):
+            with self.subTest(damage=damage):
+                with open(cache_file_path, "wb") as outfile:
+                    outfile.write(damaged_contents)
+                self.assert_same_event_store(
+                    extractor.get_cached_event_store(self.recording_folder_path, cache_folder_path, chat_workers=1),
+                    expected_event_store)
+                # and it was saved again
+                with open(cache_file_path, "rb") as infile:
+                    self.assertEqual(len(infile.read()), len(contents))
+
+
+class GradingTest(unittest.TestCase):
+
+    def test_metrics_with_different_participants(self):
+        instructor_name = extractor.INSTRUCTOR_TITLE + "Pat Lee"
+        camera_minutes = {"Ana": 10, "Bo": 5, instructor_name: 50}
+        microphone_minutes = {"Ana": 1, "Cy": 2}
+        message_counts = {"Ana": 3, "Bo": 1, instructor_name: 5}
+        grades = extractor.get_participation_grades(camera_minutes, microphone_minutes, message_counts,
+                                                    instructor_name)
+        self.assertEqual(sorted(grades), ["Ana", "Bo", "Cy"])
+        # the same as every participant having every metric, with 0 for the ones they were missing
+        expected_grades = extractor.get_participation_grades({"Ana": 10, "Bo": 5, "Cy": 0},
+                                                             {"Ana": 1, "Bo": 0, "Cy": 2},
+                                                             {"Ana": 3, "Bo": 1, "Cy": 0}, instructor_name)
+        self.assertEqual(grades, expected_grades)
+
+    def test_percentile_scores(self):
+        scores = extractor.get_percentile_scores(np.array([[1, 2, 2, 4], [5, np.nan, 3, 3], [7, 7, 7, 7]]))
+        # ties count as half, a missing participant is left out of the others
+        expected_scores = np.array([[0, 50, 50, 100], [100, np.nan, 25, 25], [50, 50, 50, 50]])
+        self.assertTrue(np.allclose(scores, expected_scores, equal_nan=True), scores)
+
+    def test_capped_linear_scores(self):
+        scores = extractor.get_capped_linear_scores(np.array([[0, 10, 30, 40], [0, 0, 0, 0]]))
+        self.assertTrue(np.allclose(scores, [[0, 50, 105, 105], [100, 100, 100, 100]]), scores)
+
+    def test_weighted_policy_counts_camera_twice(self):
+        metrics = np.array([[10, 20, 30, 5], [1, 0, 3, 2], [4, 4, 1, 0]], dtype=np.float64)
+        zscores = extractor.get_zscore_scores(metrics)
+        grades = extractor.get_policy_grades(metrics, ('weighted', 'zscore'))
+        self.assertTrue(np.allclose(grades['weighted'],
+                                    np.minimum((2 * zscores[0] + zscores[1] + zscores[2]) / 4, extractor.GRADE_CAP)))
+        self.assertTrue(np.allclose(grades['zscore'], np.minimum(zscores.mean(axis=0), extractor.GRADE_CAP)))
+
+    def test_policies_grade_many_sessions_at_once(self):
+        random_numbers = np.random.default_rng(1)
+        term_metrics = random_numbers.integers(0, 60, size=(4, 3, 10)).astype(np.float64)
+        term_metrics[1, :, 3] = np.nan
+        policies = tuple(extractor.GRADING_POLICIES)
+        term_grades = extractor.get_policy_grades(term_metrics, policies)
+        for session, metrics in enumerate(term_metrics):
+            attended = ~np.isnan(metrics[0])
+            session_grades = extractor.get_policy_grades(metrics[:, attended], policies)
+            for policy in policies:
+                self.assertTrue(np.allclose(term_grades[policy][session][attended], session_grades[policy]),
+                                (policy, session))
+        self.assertTrue(np.isnan(term_grades['zscore'][1, 3]))
+        with self.assertRaises(ValueError):
+            extractor.get_policy_grades(term_metrics, ('median',))
+
+
+class ColumnarReportTest(RecordingTestCase):
+
+    def test_npz_columns_match_the_report(self):
+        report_folder_path = self.get_report_folder_path()
+        results = self.get_results(report_folder_file_path=report_folder_path, columnar_format='npz')
+        with np.load(report_folder_path + "participation_report.npz") as columns:
+            self.assertEqual(sorted(columns.files), sorted(results[0]))
+            self.assertEqual(columns["Participant"].tolist(), [row[0] for row in results[1:]])
+            for index, header in enumerate(results[0][1:], 1):
+                self.assertTrue(np.array_equal(columns[header], [row[index] for row in results[1:]]), header)
+
+    def test_parquet_columns_match_the_report(self):
+        report_folder_path = self.get_report_folder_path()
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            with self.assertRaises(ValueError):
+                self.get_results(report_folder_file_path=report_folder_path, columnar_format='parquet')
+            self.skipTest("pyarrow is not installed")
+        results = self.get_results(report_folder_file_path=report_folder_path, columnar_format='parquet')
+        columns = pyarrow.parquet.read_table(report_folder_path + "participation_report.parquet").to_pydict()
+        self.assertEqual(list(columns), results[0])
+        for index, header in enumerate(results[0]):
+            self.assertEqual(columns[header], [row[index] for row in results[1:]], header)
+
+    def test_unknown_format_is_refused(self):
+        with self.assertRaises(ValueError):
+            extractor.save_report_columns([["Participant"]], self.get_report_folder_path() + "report", 'feather')
+
+
+class TimelineBinsTest(RecordingTestCase):
+
+    def test_bins_add_up_to_the_report(self):
+        report_folder_path = self.get_report_folder_path()
+        results = self.get_results(report_folder_file_path=report_folder_path, timeline_bin_seconds=60)
+        rows = {row[0]: dict(zip(results[0], row)) for row in results[1:]}
+        with np.load(report_folder_path + "participation_timeline_bins.npz") as bins:
+            self.assertEqual(sorted(bins['participants'].tolist()), sorted(rows))
+            self.assertEqual(bins['camera_seconds'].shape, (len(rows), len(bins['bin_start_seconds'])))
+            for row_number, participant_name in enumerate(bins['participants'].tolist()):
+                with self.subTest(participant=participant_name):
+                    row = rows[participant_name]
+                    self.assertAlmostEqual(bins['camera_seconds'][row_number].sum() / 60, row["Minutes on Camera"],
+                                           delta=1e-6)
+                    self.assertAlmostEqual(bins['paused_seconds'][row_number].sum() / 60,
+                                           row["Minutes with Camera Paused"], delta=1e-6)
+                    self.assertAlmostEqual(bins['mic_seconds'][row_number].sum() / 60,
+                                           row["Minutes on Microphone"], delta=1e-6)
+                    self.assertEqual(bins['chat_count'][row_number].sum(), row["Chat Messages Sent"])
+
+    def test_bins_add_up_whatever_their_size(self):
+        event_store = extractor.get_event_store(self.recording_folder_path, chat_workers=1)
+        identities = extractor.get_identity_index(event_store['index'])
+        timelines = extractor.get_participation_timelines(event_store, identities['student_ids'],
+                                                          identities['student_pids'])
+        expected_bins = extractor.get_binned_timelines(timelines, 60)
+        for bin_seconds in (1, 7.5, 600, 10 ** 6):
+            with self.subTest(bin_seconds=bin_seconds):
+                bins = extractor.get_binned_timelines(timelines, bin_seconds)
+                for key in ('camera_seconds', 'paused_seconds', 'mic_seconds', 'chat_count'):
+                    self.assertTrue(np.allclose(bins[key].sum(axis=1), expected_bins[key].sum(axis=1)), key)
+
+
+class RosterTest(RecordingTestCase):
+
+    def save_roster(self, roster_names):
+        roster_file_path = self.get_report_folder_path() + "roster.csv"
+        with open(roster_file_path, "w") as outfile:
+            outfile.write("Participant\n" + "".join(roster_name + ",extra column\n" for roster_name in roster_names))
+        return roster_file_path
+
+    def test_students_are_named_as_in_the_roster(self):
+        results = self.get_results()
+        student_names = [row[0] for row in results[1:] if not row[0].startswith(extractor.INSTRUCTOR_TITLE)]
+        # the roster writes the names with other capitals and spaces, and one student never joined
+        roster_names = [student_name.upper().replace(" ", "  ") for student_name in student_names[:3]]
+        roster_file_path = self.save_roster(roster_names + ["Never Joined"])
+
+        roster_results = self.get_results(roster_file_path=roster_file_path)
+        rows = {row[0]: row for row in roster_results[1:]}
+        self.assertEqual(len(roster_results), len(results) + 1)
+        for student_name, roster_name in zip(student_names, roster_names):
+            self.assertNotIn(student_name, rows)
+            self.assertEqual(rows[extractor.get_normalized_name(roster_name)][1:],
+                             next(row for row in results if row[0] == student_name)[1:])
+        self.assertEqual(rows["Never Joined"][1:], [0] * (len(results[0]) - 1))
+
+    def test_names_match_on_their_key(self):
+        self.assertEqual(extractor.get_name_key(" Ana  Brown2 "), extractor.get_name_key("ana brown"))
+        self.assertNotEqual(extractor.get_name_key("Ana Brown"), extractor.get_name_key("Ana Browne"))
+        roster_file_path = self.save_roster(["Ana  Brown", "", "Bo Lee"])
+        self.assertEqual(extractor.get_roster_names(roster_file_path), ["Ana Brown", "Bo Lee"])
+
+
+class PlotTest(RecordingTestCase):
+
+    def get_plot_file_names(self, report_folder_path):
+        return sorted(file_name for file_name in os.listdir(report_folder_path) if file_name.endswith(".html"))
+
+    def test_pages_and_top_participants(self):
+        results = self.get_results()
+        pages = extractor.get_plot_pages(results, page_size=5)
+        self.assertEqual([len(rows) for rows in pages], [5, 5, 3])
+        self.assertEqual([row for rows in pages for row in rows], results[1:])
+        self.assertEqual(extractor.get_plot_pages(results, page_size=0), [results[1:]])
+
+        top_rows = extractor.get_plot_pages(results, top_count=3)[0]
+        self.assertEqual(sorted(row[1] for row in top_rows), sorted(row[1] for row in results[1:])[-3:])
+        # still in report order
+        self.assertEqual(top_rows, [row for row in results[1:] if row in top_rows])
+
+    def test_stale_pages_are_removed(self):
+        report_folder_path = self.get_report_folder_path()
+        results, headers = extractor.get_results_summary(self.recording_folder_path, report_folder_path,
+                                                         use_cache=False, chat_workers=1)
+        extractor.get_summary_plots(results, headers, report_folder_path, page_size=4)
+        self.assertEqual(len(self.get_plot_file_names(report_folder_path)), 4)
+        # files that only look a little like pages are not this run's
+        unrelated_file_names = ["participation_report_plots_page_old.html",
+                                "participation_report_plots_top_3_page_2.html", "notes_page_2.html"]
+        for file_name in unrelated_file_names:
+            with open(report_folder_path + file_name, "w") as outfile:
+                outfile.write("kept")
+
+        plot_file_paths = extractor.get_summary_plots(results, headers, report_folder_path, page_size=7)
+        self.assertEqual([os.path.basename(plot_file_path) for plot_file_path in plot_file_paths],
+                         ["participation_report_plots.html", "participation_report_plots_page_2.html"])
+        self.assertEqual(self.get_plot_file_names(report_folder_path),
+                         sorted(unrelated_file_names + ["participation_report_plots.html",
+                                                        "participation_report_plots_page_2.html"]))
+
+        top_file_paths = extractor.get_summary_plots(results, headers, report_folder_path, top_count=3)
+        self.assertEqual(top_file_paths, [report_folder_path + "participation_report_plots_top_3.html"])
+
+    def test_webgl_only_when_asked_for(self):
+        results = self.get_results()
+        for webgl in (False, True):
+            with self.subTest(webgl=webgl):
+                report_folder_path = self.get_report_folder_path()
+                plot_file_path = extractor.get_summary_plots(results, results[0], report_folder_path, webgl=webgl)[0]
+                with open(plot_file_path) as infile:
+                    self.assertEqual('"webgl"' in infile.read(), webgl)
+
+
+class ChatAnalyticsTest(RecordingTestCase):
+
+    def test_chat_analytics_match_a_plain_loop(self):
+        event_store = extractor.get_event_store(self.recording_folder_path, chat_workers=1)
+        identities = extractor.get_identity_index(event_store['index'])
+        analytics = {row[0]: row for row in extractor.get_chat_analytics(event_store, identities)[1:]}
+
+        messages = []
+        for message in extractor.get_chat_messages_sent_after_start(event_store).tolist():
+            participant_name = identities['student_pids'].get(event_store['pids'][event_store['chat_pid'][message]])
+            if participant_name is not None:
+                messages.append((event_store['chat_time'][message], participant_name,
+                                 event_store['chat_text'][message]))
+        messages.sort(key=lambda message: message[0])
+
+        instructor_name = identities['instructor_name']
+        for participant_name in identities['participant_names']:
+            with self.subTest(participant=participant_name):
+                own_messages = [message for message in messages if message[1] == participant_name]
+                # the first message after each instructor message answers it
+                answer_seconds = {}
+                instructor_message_time = None
+                for message_time, sender_name, chat_text in messages:
+                    if sender_name == instructor_name:
+                        instructor_message_time = message_time
+                    elif (sender_name == participant_name and instructor_message_time is not None and
+                          instructor_message_time < message_time and instructor_message_time not in answer_seconds):
+                        answer_seconds[instructor_message_time] = (message_time - instructor_message_time) / 1000
+                gaps = [(later[0] - earlier[0]) / 1000 for earlier, later in zip(own_messages, own_messages[1:])]
+                burstiness = math.nan
+                if len(gaps) >= 2 and np.std(gaps) + np.mean(gaps) > 0:
+                    burstiness = (np.std(gaps) - np.mean(gaps)) / (np.std(gaps) + np.mean(gaps))
+                expected_values = [len(own_messages), sum(len(message[2]) for message in own_messages),
+                                   sum(len(message[2].split()) for message in own_messages), len(answer_seconds),
+                                   np.mean(list(answer_seconds.values())) if answer_seconds else math.nan,
+                                   burstiness]
+                row = analytics[participant_name]
+                for value, expected_value in zip([row[1], row[2], row[4], row[6], row[7], row[8]],
+                                                 expected_values):
+                    if math.isnan(expected_value):
+                        self.assertTrue(math.isnan(value))
+                    else:
+                        self.assertAlmostEqual(value, expected_value, delta=1e-7 * max(1, abs(expected_value)))
+
+    def test_chat_analytics_are_saved_with_the_report(self):
+        report_folder_path = self.get_report_folder_path()
+        results = self.get_results(report_folder_file_path=report_folder_path, chat_analytics=True)
+        with open(report_folder_path + "participation_chat_analytics.csv") as infile:
+            rows = list(csv.reader(infile))
+        self.assertEqual(sorted(row[0] for row in rows[1:]), sorted(row[0] for row in results[1:]))
+        # the messages column counts the same messages as the report
+        messages = {row[0]: row[9] for row in results[1:]}
+        for row in rows[1:]:
+            self.assertEqual(int(row[1]), messages[row[0]], row[0])
+
+
+class ProfileTest(RecordingTestCase):
+
+    def test_profile_lists_every_stage(self):
+        report_folder_path = self.get_report_folder_path()
+        results, headers = extractor.get_results_summary(self.recording_folder_path, report_folder_path,
+                                                         use_cache=False, chat_workers=1, profile=True)
+        extractor.get_summary_plots(results, headers, report_folder_path, profile=True)
+        # the plots add their stage to the profile saved with the report, and tracing is stopped after each
+        self.assertFalse(tracemalloc.is_tracing())
+        with open(report_folder_path + extractor.PROFILE_FILE_NAME) as infile:
+            profile = json.load(infile)
+
+        self.assertEqual(profile['recording'], self.recording_folder_path)
+        self.assertEqual(profile['settings']['parser'], extractor.DEFAULT_XML_PARSER)
+        for stage in ('read_recording', 'identities', 'camera', 'microphone', 'chat', 'grades', 'save_csv',
+                      'plots'):
+            with self.subTest(stage=stage):
+                self.assertIn(stage, profile['stages'])
+                measurement = profile['stages'][stage]
+                self.assertEqual(sorted(measurement), ['cpu_seconds', 'events', 'peak_memory_mb', 'wall_seconds'])
+                self.assertGreaterEqual(measurement['wall_seconds'], 0)
+                self.assertGreaterEqual(measurement['peak_memory_mb'], 0)
+        self.assertEqual(profile['stages']['save_csv']['events'], len(results) - 1)
+        self.assertGreater(profile['stages']['read_recording']['events'], 0)
+
+    def test_no_profile_without_the_flag(self):
+        report_folder_path = self.get_report_folder_path()
+        self.get_results(report_folder_file_path=report_folder_path)
+        self.assertFalse(os.path.exists(report_folder_path + extractor.PROFILE_FILE_NAME))
+
+
+class LazyImportTest(RecordingTestCase):
+
+    def get_imported_modules(self, code):
+        # the optional modules imported once code has run in a fresh python
+        completed = subprocess.run(
+            [sys.executable, "-c", "import sys\nimport Adobe_Connect_Participation_Extractor as extractor\n" + code +
+             "\nprint(' '.join(sorted(name for name in ('bokeh', 'bs4', 'lxml', 'pyarrow') if name in sys.modules)))"],
+            cwd=os.path.dirname(os.path.abspath(extractor.__file__)), capture_output=True, text=True)
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        return completed.stdout.split()
+
+    def test_csv_report_imports_no_optional_modules(self):
+        self.assertEqual(self.get_imported_modules(
+            "extractor.get_results_summary(%r, %r, use_cache=False, chat_workers=1)" %
+            (self.recording_folder_path, self.get_report_folder_path())), [])
+
+    def test_each_optional_module_is_imported_when_it_is_used(self):
+        self.assertEqual(self.get_imported_modules(
+            "results, headers = extractor.get_results_summary(%r, %r, use_cache=False, chat_workers=1)\n"
+            "extractor.get_summary_plots(results, headers, %r)" %
+            (self.recording_folder_path, self.get_report_folder_path(), self.get_report_folder_path())), ['bokeh'])
+        # bs4 imports lxml itself when it is installed
+        imported_modules = self.get_imported_modules(
+            "extractor.get_event_store(%r, 'beautifulsoup', chat_workers=1)" % self.recording_folder_path)
+        self.assertIn('bs4', imported_modules)
+        self.assertNotIn('bokeh', imported_modules)
+
+
+class CommandLineTest(RecordingTestCase):
+
+    def run_script(self, *args):
+        return subprocess.run([sys.executable, extractor.__file__] + list(args), capture_output=True, text=True)
+
+    def test_help_lists_the_options(self):
+        completed = self.run_script("--help")
+        self.assertEqual(completed.returncode, 0)
+        for option in ("--roster", "--timezone", "--npz", "--bin-seconds", "--no-plots", "--top"):
+            self.assertIn(option, completed.stdout)
+
+    def test_bad_option_values_are_refused(self):
+        for args in (["--bin-seconds", "minute"], ["--top", "ten"], ["--npz", "--parquet"]):
+            completed = self.run_script(self.recording_folder_path, self.get_report_folder_path(), *args)
+            self.assertEqual(completed.returncode, 2, args)
+
+    def test_report_matches_get_results_summary(self):
+        # the folders are given without the slash the functions need
+        report_folder_path = self.get_report_folder_path()
+        completed = self.run_script(self.recording_folder_path.rstrip("/"), report_folder_path.rstrip("/"),
+                                    "--no-plots")
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        with open(report_folder_path + "participation_report.csv") as infile:
+            report_lines = infile.read().splitlines()
+        self.assertEqual(len(report_lines), len(self.get_results()))
+        self.assertFalse(any(file_name.endswith(".html") for file_name in os.listdir(report_folder_path)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of Adobe_Connect_Regression_Harness.py: the report of a synthetic
+recording (and its zip) against the frozen original script, and how the
+differences between two reports are found.
+
+usage: python -m unittest test_Adobe_Connect_Regression_Harness   (or python -m pytest)
+"""
+
+import glob
+import os
+import unittest
+from unittest import mock
+import zipfile
+
+import Adobe_Connect_Regression_Harness as harness
+from test_Adobe_Connect_Participation_Extractor import RecordingTestCase
+
+
+class RegressionHarnessTest(RecordingTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # the files are in a folder inside the zip, as some downloads have them
+        cls.archive_path = os.path.join(cls.temporary_folder_path, "recording.zip")
+        with zipfile.ZipFile(cls.archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for file_path in glob.glob(cls.recording_folder_path + "*.xml"):
+                archive.write(file_path, "session/" + os.path.basename(file_path))
+
+    def assert_same_as_reference(self, results, reference_results):
+        differences = harness.get_report_differences(results, reference_results)
+        self.assertTrue(harness.is_same_report(differences), differences)
+
+    def test_reports_match_the_original_script(self):
+        reference_results = harness.get_reference_results(self.recording_folder_path, self.get_report_folder_path())
+        for parser in ('etree', 'prefilter'):
+            with self.subTest(parser=parser):
+                self.assert_same_as_reference(self.get_results(parser=parser), reference_results)
+        self.assert_same_as_reference(self.get_results(self.archive_path + "/"),
+                                      harness.get_reference_results(self.archive_path + "/",
+                                                                    self.get_report_folder_path()))
+
+    def test_differences_are_found_by_participant_and_column(self):
+        headers = ["Participant", "Grade", "Minutes"]
+        reference_results = [headers, ["Ana", 100.0, 10.0], ["Bob", 90.0, 2.0], ["Cy", 80.0, float("nan")]]
+        self.assertTrue(harness.is_same_report(harness.get_report_differences(
+            [headers, ["Cy", 80.0, float("nan")], ["Bob", 90.0, 2.0], ["Ana", 100.0 + 1e-8, 10.0]],
+            reference_results)))
+
+        differences = harness.get_report_differences(
+            [headers, ["Ana", 100.0, 13.0], ["Bob", 90.0, 2.5], ["Di", 70.0, 1.0]], reference_results)
+        self.assertFalse(harness.is_same_report(differences))
+        self.assertEqual(differences['missing'], ["Cy"])
+        self.assertEqual(differences['extra'], ["Di"])
+        self.assertEqual(differences['columns'], {'Minutes': {'participants': 2, 'largest_difference': 3.0,
+                                                              'participant': "Ana"}})
+        self.assertIsNotNone(harness.get_report_differences([["Participant", "Grade"]],
+                                                            reference_results)['headers'])
+
+    def test_engine_without_its_module_is_skipped(self):
+        missing_engine = {'parser': 'lxml', 'use_cache': False, 'needs': 'no_such_module'}
+        with mock.patch.dict(harness.ENGINES, {'missing': missing_engine}):
+            self.assertEqual(harness.get_missing_module('missing'), 'no_such_module')
+            self.assertIsNone(harness.get_missing_module('etree'))
+            results = harness.get_regression_results([self.recording_folder_path], ['missing'])
+        self.assertEqual(results, [{'recording': self.recording_folder_path, 'engine': 'missing',
+                                    'skipped': "no_such_module is not installed"}])
+
+
+if __name__ == '__main__':
+    unittest.main()
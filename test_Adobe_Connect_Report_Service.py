@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of Adobe_Connect_Report_Service.py on a synthetic recording, calling
+the request handling directly and over a local connection.
+
+usage: python -m unittest test_Adobe_Connect_Report_Service   (or python -m pytest)
+"""
+
+import asyncio
+import json
+import os
+import unittest
+from unittest import mock
+
+import Adobe_Connect_Report_Service as service
+from test_Adobe_Connect_Participation_Extractor import RecordingTestCase
+
+
+def get_dying_service_report(*args):
+    # stands in for get_service_report, killing the worker process
+    os._exit(1)
+
+
+class ReportServiceTest(RecordingTestCase):
+    participants = 5
+    minutes = 10
+
+    def get_service_state(self, **kwargs):
+        kwargs.setdefault('workers', 1)
+        service_state = service.get_empty_service_state(self.temporary_folder_path, self.get_report_folder_path(),
+                                                        **kwargs)
+        self.addCleanup(lambda: service_state['executor'].shutdown())
+        return service_state
+
+    def get_responses(self, service_state, *targets):
+        # the responses to requests made at the same time
+        async def get_all_responses():
+            return await asyncio.gather(*[service.get_response(service_state, "GET", target) for target in targets])
+        return asyncio.run(get_all_responses())
+
+    def test_report_is_made_then_served_from_memory(self):
+        service_state = self.get_service_state()
+        first_response, = self.get_responses(service_state, "/report?recording=recording")
+        second_response, = self.get_responses(service_state, "/report?recording=recording&format=csv")
+        self.assertEqual(first_response[0], 200)
+        self.assertEqual(first_response[2]['X-Report-Source'], 'made')
+        self.assertEqual(first_response[3]['rows'], self.get_results()[1:])
+        self.assertEqual(second_response[0], 200)
+        self.assertEqual(second_response[2]['X-Report-Source'], 'cached')
+        self.assertEqual(len(second_response[3].splitlines()), len(self.get_results()))
+
+    def test_requests_at_the_same_time_share_one_report(self):
+        service_state = self.get_service_state()
+        responses = self.get_responses(service_state, *["/report?recording=recording"] * 3)
+        self.assertEqual(sorted(response[2]['X-Report-Source'] for response in responses),
+                         ['joined', 'joined', 'made'])
+        self.assertEqual(service_state['counts']['made'], 1)
+        self.assertEqual(service_state['running'], {})
+
+    def test_requests_are_turned_away_when_too_many_are_pending(self):
+        service_state = self.get_service_state(max_pending=0)
+        response, = self.get_responses(service_state, "/report?recording=recording")
+        self.assertEqual(response[0], 503)
+        self.assertEqual(response[2], {'Retry-After': "30"})
+        self.assertEqual(service_state['counts']['turned_away'], 1)
+
+    def test_bad_requests(self):
+        service_state = self.get_service_state()
+        responses = self.get_responses(service_state, "/report?recording=../..", "/report?recording=nothing",
+                                       "/report?recording=recording&format=xml", "/report", "/other")
+        self.assertEqual([response[0] for response in responses], [404, 404, 400, 400, 404])
+
+    def test_pool_is_replaced_after_a_worker_dies(self):
+        service_state = self.get_service_state()
+        broken_executor = service_state['executor']
+        with mock.patch.object(service, 'get_service_report', get_dying_service_report):
+            response, = self.get_responses(service_state, "/report?recording=recording")
+        self.assertEqual(response[0], 500)
+        self.assertIn("BrokenProcessPool", response[3]['error'])
+        self.assertIsNot(service_state['executor'], broken_executor)
+
+        response, = self.get_responses(service_state, "/report?recording=recording")
+        self.assertEqual(response[0], 200)
+        self.assertEqual(response[2]['X-Report-Source'], 'made')
+
+    def test_client_that_sends_nothing_is_timed_out(self):
+        service_state = self.get_service_state(request_timeout=0.2)
+
+        async def get_raw_responses():
+            server = await asyncio.start_server(
+                lambda reader, writer: service.handle_connection(service_state, reader, writer), "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                responses = []
+                for request in (b"", b"GET /status HTTP/1.1\r\nHost: localhost\r\n\r\n"):
+                    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                    writer.write(request)
+                    responses.append(await asyncio.wait_for(reader.read(), 5))
+                    writer.close()
+                return responses
+
+        silent_response, status_response = asyncio.run(get_raw_responses())
+        self.assertTrue(silent_response.startswith(b"HTTP/1.1 408 Request Timeout\r\n"))
+        self.assertTrue(status_response.startswith(b"HTTP/1.1 200 OK\r\n"))
+        self.assertEqual(json.loads(status_response.split(b"\r\n\r\n", 1)[1])['running'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of Adobe_Connect_Term_Report.py on small session reports.
+
+usage: python -m unittest test_Adobe_Connect_Term_Report   (or python -m pytest)
+"""
+
+import csv
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import Adobe_Connect_Participation_Extractor as extractor
+import Adobe_Connect_Term_Report as term
+
+SESSION_HEADERS = [
+    "Participant",
+    "Participation Grades",
+    "Minutes on Camera",
+    "Minutes with Camera Paused",
+    "Fraction of Class Time on Camera",
+    "Fraction of Instructor Time on Camera",
+    "Minutes on Microphone",
+    "Fraction of Class Time on Microphone",
+    "Fraction of Instructor Time on Microphone",
+    "Chat Messages Sent",
+    "Fraction of Messages Sent"
+]
+
+
+def get_session_row(participant_name, grade, camera_minutes, microphone_minutes, messages):
+    return [participant_name, grade, camera_minutes, 0, camera_minutes / 60, camera_minutes / 60,
+            microphone_minutes, microphone_minutes / 60, microphone_minutes / 60, messages, messages / 100]
+
+
+def get_term_rows(term_results):
+    return {row[0]: dict(zip(term_results[0], row)) for row in term_results[1:]}
+
+
+class TermReportTest(unittest.TestCase):
+
+    def setUp(self):
+        instructor_name = extractor.INSTRUCTOR_TITLE + "Pat Lee"
+        # Bob missed the first session, the roster gave him a row of zeroes
+        self.session_results = [
+            [SESSION_HEADERS,
+             get_session_row(instructor_name, 0, 60, 30, 20),
+             get_session_row("Ana Brown2", 90, 50, 5, 10),
+             get_session_row("Bob Stone", 0, 0, 0, 0),
+             get_session_row("Cy Dunn", 80, 40, 2, 6)],
+            [SESSION_HEADERS,
+             get_session_row(instructor_name, 0, 60, 30, 20),
+             get_session_row("ana  brown", 100, 55, 6, 12),
+             get_session_row("Bob Stone", 70, 30, 1, 4),
+             get_session_row("Cy Dunn", 60, 20, 1, 2)]
+        ]
+
+    def test_sessions_are_added_up_by_name(self):
+        rows = get_term_rows(term.get_term_report(self.session_results))
+        self.assertEqual(sorted(rows), sorted([extractor.INSTRUCTOR_TITLE + "Pat Lee", "Ana Brown", "Bob Stone",
+                                               "Cy Dunn"]))
+        ana = rows["Ana Brown"]
+        self.assertEqual(ana["Sessions Attended"], 2)
+        self.assertEqual(ana["Minutes on Camera"], 105)
+        self.assertEqual(ana["Chat Messages Sent"], 22)
+        self.assertEqual(ana["Mean Session Grade"], 95)
+
+    def test_row_of_zeroes_is_not_an_attended_session(self):
+        rows = get_term_rows(term.get_term_report(self.session_results))
+        bob = rows["Bob Stone"]
+        self.assertEqual(bob["Sessions Attended"], 1)
+        self.assertEqual(bob["Mean Session Grade"], 70)
+        # the fractions of class are still averaged over every session of the term
+        self.assertAlmostEqual(bob["Mean Fraction of Class Time on Camera"], 30 / 60 / 2)
+
+        # a roster student who never came
+        self.session_results[1].append(get_session_row("Di Moss", 0, 0, 0, 0))
+        never_attended = get_term_rows(term.get_term_report(self.session_results))["Di Moss"]
+        self.assertEqual(never_attended["Sessions Attended"], 0)
+        self.assertEqual(never_attended["Mean Session Grade"], 0)
+
+    def test_policy_grades_leave_out_sessions_not_attended(self):
+        term_results, policy_results = term.get_term_report(self.session_results, policies=['zscore'])
+        policy_rows = get_term_rows(policy_results)
+        self.assertEqual(policy_rows["Bob Stone"]["Sessions Attended"], 1)
+        self.assertEqual(policy_rows["Ana Brown"]["Sessions Attended"], 2)
+
+        # regrading the second session on its own gives Bob the same zscore grade
+        second_session = term.get_empty_term_totals(keep_session_metrics=True)
+        term.add_session_to_term_totals(second_session, self.session_results[1])
+        self.assertAlmostEqual(policy_rows["Bob Stone"]["Mean Session Grade (zscore)"],
+                               get_term_rows(term.get_term_policy_results(second_session, ['zscore']))[
+                                   "Bob Stone"]["Mean Session Grade (zscore)"])
+
+    def test_saved_reports_need_no_recordings_folder(self):
+        reports_root_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, reports_root_path)
+        for session, results in enumerate(self.session_results):
+            os.makedirs(os.path.join(reports_root_path, "session%d" % session))
+            extractor.save_report_csv(results, os.path.join(reports_root_path, "session%d" % session,
+                                                            "participation_report.csv"))
+        script_path = os.path.abspath(term.__file__)
+        completed = subprocess.run([sys.executable, script_path, "--from-reports", reports_root_path],
+                                   capture_output=True, text=True)
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        with open(os.path.join(reports_root_path, "term_report.csv"), newline="") as infile:
+            saved_rows = get_term_rows([row for row in csv.reader(infile)])
+        self.assertEqual(saved_rows["Bob Stone"]["Sessions Attended"], "1")
+
+        # without --from-reports the recordings folder is needed
+        completed = subprocess.run([sys.executable, script_path, reports_root_path], capture_output=True, text=True)
+        self.assertEqual(completed.returncode, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()